@@ -47,15 +47,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.throttling.LoadSheddingMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.lean.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
+    'core.lean.CsrfViewMiddleware',
+    'core.lean.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.idempotency.IdempotencyMiddleware',
+    'core.lean.MessageMiddleware',
+    'core.lean.XFrameOptionsMiddleware',
 ]
 
+# Paths served by token-authenticated views, which skip the session, CSRF,
+# authentication, messages and clickjacking middleware (see core.lean).
+LEAN_PATH_PREFIXES = ['/api/']
+# HTML pages under those prefixes, which keep the full stack, above all the
+# clickjacking protection.
+LEAN_EXCLUDED_PREFIXES = ['/api/docs/', '/api/schema/redoc/']
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -90,6 +103,45 @@ DATABASES = {
     }
 }
 
+# Read replicas, given as a comma separated list of hosts. Under test each
+# replica mirrors the default database.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+        h for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+
+# Cache shared by every worker process, e.g. 'memcached:11211'. Without it
+# each process keeps a private cache, which the core.E001 check refuses
+# outside DEBUG as features relying on the cache then break across workers.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+REQUIRE_SHARED_CACHE = not DEBUG
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -142,8 +194,72 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_RATE_USER', '1000/min'),
+        'anon': os.environ.get('THROTTLE_RATE_ANON', '100/min'),
+    },
 }
 
+# In-flight requests allowed per process before shedding load; None disables.
+LOAD_SHED_MAX_CONCURRENCY = int(os.environ.get('LOAD_SHED_MAX_CONCURRENCY', 0)) or None
+LOAD_SHED_QUEUE_TIMEOUT = 1.0
+LOAD_SHED_RETRY_AFTER = 1
+
+# Bearer token required to scrape /metrics; only staff may read it when unset.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Let staff profile a request with the X-Profile header or ?profile=1.
+REQUEST_PROFILING = os.environ.get(
+    'REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+# Statements slower than this are logged to the admin; None, set by an
+# empty value or 'off', disables it.
+SLOW_QUERY_THRESHOLD_MS = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200')
+SLOW_QUERY_THRESHOLD_MS = None \
+    if SLOW_QUERY_THRESHOLD_MS.lower() in ('', 'off') \
+    else float(SLOW_QUERY_THRESHOLD_MS)
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', 0.1))
+SLOW_QUERY_LOG_SIZE = 1000
+
+# POST routes that honour the Idempotency-Key header.
+IDEMPOTENT_ROUTES = [
+    'recipe:recipe-list',
+    'recipe:recipe-upload-image',
+    'user:create',
+]
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_WAIT_SECONDS = 30
+
+# Delta sync page sizes, and how long recent changes are held back so rows
+# from transactions still in flight cannot slip behind a client's cursor.
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 1000
+SYNC_SETTLE_SECONDS = 2
+
+# Lowest pg_trgm word similarity of a fuzzy autocomplete suggestion.
+AUTOCOMPLETE_SIMILARITY = 0.4
+
+# Tag and ingredient names stored as their canonical name, matched ignoring
+# case and whitespace, e.g. {'tomatoes': 'Tomato'}.
+NAME_SYNONYMS = {}
+
+# URL namespaces reachable through /api/batch/ and its limits.
+BATCH_NAMESPACES = ['recipe', 'user']
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Hash partitions of the recipe and link tables, keyed by user.
+RECIPE_PARTITIONS = int(os.environ.get('RECIPE_PARTITIONS', 16))
+
+# Admin changelists estimate their row count above this many rows.
+ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Release the OpenAPI schema is cached for, e.g. the git revision; a hash of
+# the sources when unset. generate_schema stores it in SCHEMA_FILE.
+CODE_VERSION = os.environ.get('CODE_VERSION')
+SCHEMA_FILE = os.environ.get('SCHEMA_FILE', 'vol/schema.json')
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Recipe App API',
     'DESCRIPTION': 'Recipe app API documentation',
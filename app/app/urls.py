@@ -3,16 +3,22 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+from core.batch import BatchView
+from core.metrics import metrics_view
+from core.schema import schema_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls') , name='user'),
     path('api/recipe/', include('recipe.urls'), name='recipe'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
 
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', schema_view, name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
 
@@ -1,14 +1,95 @@
 """
 Admin customisatio
 """
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelectMultiple
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Func, Q, TextField, Value
+from django.utils.functional import cached_property
+
 from core import models
+from recipe import bulk, names, similarity
+
+# Rows of a table and its partitions according to the last ANALYZE.
+ESTIMATE_SQL = '''
+    SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint FROM pg_class c
+    WHERE c.relkind <> 'p' AND (c.oid = %(table)s::regclass OR c.oid IN (
+        SELECT inhrelid FROM pg_inherits WHERE inhparent = %(table)s::regclass))
+'''
+
+
+class NormalizedName(Func):
+    """Text as compared by the name indexes: lower case, no accents."""
+    function = 'core_normalize_name'
+    output_field = TextField()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates, rather than counts, large result sets.
+
+    Unfiltered lists take the row count from the table statistics, filtered
+    ones from the planner's estimate. Below ADMIN_EXACT_COUNT_LIMIT rows the
+    exact count is cheap enough and used instead.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        with connections[queryset.db].cursor() as cursor:
+            if queryset.query.where:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = int(plan[0]['Plan']['Plan Rows'])
+            else:
+                cursor.execute(
+                    ESTIMATE_SQL, {'table': queryset.model._meta.db_table})
+                estimate = cursor.fetchone()[0]
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return queryset.count()
+        return estimate
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist that stays fast on tables with tens of millions of rows.
+
+    Counts are estimated, rows are listed newest first along the primary
+    key, and search_fields are matched through core_normalize_name() so
+    the trigram indexes on it serve the search.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-id']
+    sortable_by = ['id']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        fields = self.get_search_fields(request)
+        queryset = queryset.alias(**{
+            f'normalized_{field}': NormalizedName(field) for field in fields})
+        pattern = NormalizedName(Value(term))
+        query = Q()
+        for field in fields:
+            query |= Q(**{f'normalized_{field}__contains': pattern})
+        return queryset.filter(query), False
+
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users."""
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['email', 'name']
     fieldsets = [
         (None, {'fields': ('email', 'password')}),
         ('Personal Info', {'fields': ('name',)}),
@@ -30,6 +111,119 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Read-only view of the slow query log."""
+    list_display = ['__str__', 'created_at', 'route', 'user', 'alias']
+    list_filter = ['route', 'alias']
+    list_select_related = ['user']
+    search_fields = ['sql', 'route']
+    readonly_fields = [
+        'created_at', 'duration_ms', 'alias', 'route', 'user',
+        'sql', 'params', 'plan',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class PurgeJobAdmin(admin.ModelAdmin):
+    """Progress of background user purges."""
+    list_display = [
+        'email', 'status', 'phase', 'recipes_deleted', 'tags_deleted',
+        'ingredients_deleted', 'links_deleted', 'updated_at',
+    ]
+    list_filter = ['status']
+    readonly_fields = list_display + ['user_id', 'error', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class RecipeAdmin(ScalableAdmin):
+    """Recipes, deleted in bulk and linked through autocomplete widgets."""
+    list_display = ['id', 'title', 'user', 'time_minutes', 'price',
+                    'updated_at']
+    search_fields = ['title']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+    actions = ['delete_recipes']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        # The admin leaves out relations with their own through model; the
+        # field's set() still stores the links with their owner.
+        if db_field.name in self.autocomplete_fields:
+            return db_field.formfield(widget=AutocompleteSelectMultiple(
+                db_field, self.admin_site, using=kwargs.get('using')))
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def get_actions(self, request):
+        # The stock action collects and lists every link before deleting.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_model(self, request, obj):
+        bulk.delete_recipes(models.Recipe.objects.filter(pk=obj.pk))
+
+    @admin.action(description='Delete selected recipes',
+                  permissions=['delete'])
+    def delete_recipes(self, request, queryset):
+        counts = bulk.delete_recipes(queryset)
+        self.message_user(request, (
+            f'Deleted {counts["deleted"]} recipe(s) and '
+            f'{counts["links_deleted"]} link(s).'))
+
+
+class NameAdmin(ScalableAdmin):
+    """Tags or ingredients, whose duplicates can be merged per owner."""
+    list_display = ['id', 'name', 'user', 'updated_at']
+    search_fields = ['name']
+    actions = ['merge_duplicates']
+    relation = None
+
+    def delete_model(self, request, obj):
+        # Links go first so the owner's stats drop the name's count.
+        with transaction.atomic():
+            recipe_ids = bulk.unlink(self.relation, obj.pk, obj.user_id)
+            obj.delete()
+        similarity.schedule(recipe_ids)
+
+    def delete_queryset(self, request, queryset):
+        objects = list(queryset.order_by('id').values_list('id', 'user_id'))
+        with transaction.atomic():
+            recipe_ids = bulk.unlink_many(self.relation, objects)
+            queryset.model.objects.filter(
+                id__in=[pk for pk, _ in objects]).delete()
+        similarity.schedule(recipe_ids)
+
+    @admin.action(description="Merge duplicates within the owners' names",
+                  permissions=['change'])
+    def merge_duplicates(self, request, queryset):
+        user_ids = list(
+            queryset.order_by().values_list('user_id', flat=True).distinct())
+        merged = sum(names.merge_duplicates(self.relation, user_id)
+                     for user_id in user_ids)
+        self.message_user(request, (
+            f'Merged {merged} duplicate(s) of {len(user_ids)} user(s).'))
+
+
+class TagAdmin(NameAdmin):
+    relation = 'tags'
+
+
+class IngredientAdmin(NameAdmin):
+    relation = 'ingredients'
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Ingredient)
\ No newline at end of file
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
+admin.site.register(models.PurgeJob, PurgeJobAdmin)
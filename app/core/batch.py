@@ -0,0 +1,127 @@
+"""
+Batch endpoint running several API requests in one round trip.
+
+The batch request is authenticated once and every sub-request is dispatched
+straight to its view with that user, skipping the middleware stack. Reads
+can optionally run in parallel threads, each on its own connection.
+"""
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import resolve, Resolver404
+
+from rest_framework import serializers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import db_router
+
+METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+# Request headers a sub-request never inherits from the batch request.
+DROPPED_HEADERS = ['HTTP_IDEMPOTENCY_KEY', 'HTTP_X_PROFILE']
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """One request of a batch."""
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of API requests."""
+    requests = SubRequestSerializer(many=True)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if not value:
+            raise serializers.ValidationError('Provide at least one request.')
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.')
+        return value
+
+
+def _not_found():
+    return {'status': 404, 'body': {'detail': 'Not found.'}}
+
+
+def _build_request(request, item):
+    """Build a WSGI request for one sub-request, forcing the batch user."""
+    url = urlsplit(item['path'])
+    body = json.dumps(item['body']).encode() if 'body' in item else b''
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in DROPPED_HEADERS
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    sub = WSGIRequest(environ)
+    # DRF authenticates requests carrying these with ForcedAuthentication.
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def dispatch(request, item):
+    """Run one sub-request and return its status and body."""
+    try:
+        match = resolve(urlsplit(item['path']).path)
+    except Resolver404:
+        return _not_found()
+    if match.namespace not in settings.BATCH_NAMESPACES:
+        return _not_found()
+
+    sub = _build_request(request, item)
+    sub.resolver_match = match
+    response = match.func(sub, *match.args, **match.kwargs)
+    if hasattr(response, 'data'):
+        # Use the view's data as is rather than rendering and parsing it.
+        body = response.data
+    else:
+        body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': body}
+
+
+def _dispatch_in_thread(request, item):
+    try:
+        return dispatch(request, item)
+    finally:
+        connections.close_all()
+
+
+class BatchView(APIView):
+    """Run several recipe and user API requests in one round trip."""
+    serializer_class = BatchSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+        reads_only = all(item['method'] == 'GET' for item in items)
+        if reads_only:
+            db_router.read_only(request._request)
+
+        if serializer.validated_data['parallel'] and reads_only:
+            workers = min(len(items), settings.BATCH_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda item: _dispatch_in_thread(request, item), items))
+        else:
+            results = [dispatch(request, item) for item in items]
+        return Response({'responses': results})
@@ -0,0 +1,43 @@
+"""
+System checks for the deployment settings the application relies on.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries only the writing process can see.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shared_cache_users():
+    """Return the enabled features that need a cache shared by workers."""
+    users = []
+    if settings.DATABASE_REPLICAS:
+        users.append('read-your-writes pinning to the primary database')
+    throttles = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_CLASSES', [])
+    if 'core.throttling.TokenBucketThrottle' in throttles:
+        users.append('API rate limits')
+    if apps.is_installed('recipe'):
+        users.append('invalidation of the recipe matching index')
+    return users
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Refuse a process-local cache where workers must share state."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.REQUIRE_SHARED_CACHE or \
+            backend not in PROCESS_LOCAL_CACHES:
+        return []
+    users = shared_cache_users()
+    if not users:
+        return []
+    return [Error(
+        f'The default cache ({backend}) is private to each process, which '
+        f'breaks {", ".join(users)}.',
+        hint='Set CACHE_LOCATION to a memcached server all workers share.',
+        id='core.E001',
+    )]
@@ -0,0 +1,189 @@
+"""
+Database router that sends safe-method reads to read replicas.
+"""
+import hashlib
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DatabaseError
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_CACHE_PREFIX = 'db-router:pin:'
+
+# Seconds a replica is behind the primary: zero once it replayed all the WAL
+# it received, so an idle primary does not look like growing lag, and NULL
+# when the database is not a replica at all.
+REPLICA_LAG_SQL = (
+    'SELECT CASE '
+    'WHEN NOT pg_is_in_recovery() THEN NULL '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+_state = threading.local()
+
+
+def replica_aliases():
+    """Return the database aliases configured as read replicas."""
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+class ReplicaPool:
+    """Pick a healthy replica, re-checking each one at a fixed interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health = {}
+        self._counter = itertools.count()
+
+    def is_healthy(self, alias):
+        """Return whether the replica answered and is within the lag limit."""
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        now = time.monotonic()
+        checked_at, healthy = self._health.get(alias, (None, False))
+        if checked_at is not None and now - checked_at < interval:
+            return healthy
+
+        healthy = self._check(alias)
+        with self._lock:
+            self._health[alias] = (now, healthy)
+        return healthy
+
+    def _check(self, alias):
+        """Query the replica for its replication lag."""
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                row = cursor.fetchone()
+        except DatabaseError:
+            return False
+        lag = row[0] if row else None
+        return lag is None or float(lag) <= max_lag
+
+    def mark_unhealthy(self, alias):
+        """Take a replica out of rotation until its next health check."""
+        with self._lock:
+            self._health[alias] = (time.monotonic(), False)
+
+    def reset(self):
+        """Forget all cached health results."""
+        with self._lock:
+            self._health.clear()
+
+    def choose(self):
+        """Return the next healthy replica in round-robin order, or None."""
+        healthy = [a for a in replica_aliases() if self.is_healthy(a)]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+
+pool = ReplicaPool()
+
+
+def _pin_key(request):
+    """Identify the client so its reads can be pinned after a write."""
+    identity = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not identity:
+        return None
+    digest = hashlib.sha256(identity.encode()).hexdigest()
+    return PIN_CACHE_PREFIX + digest
+
+
+@contextmanager
+def use_primary():
+    """Force every read inside the block onto the primary database."""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = False
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+def read_only(request):
+    """Let a request with an unsafe method that only reads, such as a batch
+    of GETs, use replicas like a safe request and leave the client unpinned.
+    """
+    request._replica_read_only = True
+    _state.use_replica = getattr(request, '_replica_allowed', False)
+    _state.alias = None
+
+
+class ReplicaRouter:
+    """Route reads to a replica while a request allows it."""
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False):
+            return 'default'
+        if connections['default'].in_atomic_block:
+            return 'default'
+        alias = getattr(_state, 'alias', None)
+        if alias is None:
+            alias = pool.choose() or 'default'
+            _state.alias = alias
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Enable replica reads for safe requests from clients not pinned
+    to the primary, and pin a client for a short window after it writes.
+    Views mark unsafe requests that only read with read_only().
+
+    A database error on a replica takes the replica out of rotation. A
+    safe request that failed that way is served again from the primary;
+    other requests are not, as their body has already been read.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = _pin_key(request)
+        safe = request.method in SAFE_METHODS
+        pinned = key is not None and cache.get(key) is not None
+
+        request._replica_failed = False
+        request._replica_read_only = False
+        request._replica_allowed = not pinned and bool(replica_aliases())
+        _state.use_replica = safe and request._replica_allowed
+        _state.alias = None
+        try:
+            response = self.get_response(request)
+            if request._replica_failed:
+                request._replica_allowed = False
+                with use_primary():
+                    response = self.get_response(request)
+        finally:
+            _state.use_replica = False
+            _state.alias = None
+
+        writes = not safe and not request._replica_read_only
+        if writes and key is not None and response.status_code < 400:
+            cache.set(key, True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+    def process_exception(self, request, exception):
+        alias = getattr(_state, 'alias', None)
+        if isinstance(exception, DatabaseError) and \
+                alias in replica_aliases():
+            pool.mark_unhealthy(alias)
+            request._replica_failed = request.method in SAFE_METHODS
+        return None
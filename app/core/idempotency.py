@@ -0,0 +1,151 @@
+"""
+Idempotency-Key support for retried POST requests.
+
+The first request with a key runs normally and its response is stored.
+Retries with the same key replay the stored response without running the
+view again. Concurrent duplicates wait on a PostgreSQL advisory lock until
+the first request has finished.
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.urls import resolve, Resolver404
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from core.models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = 'Idempotent-Replayed'
+POLL_INTERVAL = 0.05
+# Response headers not stored with the body; replays recompute them.
+UNSTORED_HEADERS = {'content-type', 'content-length', REPLAY_HEADER.lower()}
+
+
+def _client_identity(request):
+    """Identify the caller so keys from different clients never collide.
+
+    Anonymous callers are told apart by address, as the throttles do.
+    """
+    return request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME) or \
+        'address:' + BaseThrottle().get_ident(request)
+
+
+def _fingerprint(request):
+    """Hash the parts of a request that must match on a retry."""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.get_full_path()}\n'.encode())
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    if limit is None or length <= limit:
+        digest.update(request.body)
+    else:
+        # Large uploads are not buffered just to hash them.
+        digest.update(f'{request.content_type} {length}'.encode())
+    return digest.hexdigest()
+
+
+def _acquire(lock_id, timeout):
+    """Wait up to timeout seconds for the advisory lock of a key."""
+    deadline = time.monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_id])
+            if cursor.fetchone()[0]:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+
+
+def _release(lock_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+
+
+def _replay(record):
+    response = HttpResponse(
+        bytes(record.body),
+        status=record.status_code,
+        content_type=record.content_type,
+    )
+    for header, value in record.headers.items():
+        response[header] = value
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    """Apply Idempotency-Key handling to the routes in IDEMPOTENT_ROUTES."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _route(self, request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return None
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if not key or request.method != 'POST' or \
+                self._route(request) not in settings.IDEMPOTENT_ROUTES:
+            return self.get_response(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {'detail': 'Idempotency-Key is too long.'}, status=400)
+
+        scope = hashlib.sha256(
+            f'{_client_identity(request)}\n{request.path_info}\n{key}'
+            .encode()
+        ).hexdigest()
+        fingerprint = _fingerprint(request)
+        # Advisory lock keys are signed 64-bit integers.
+        lock_id = int(scope[:15], 16)
+
+        if not _acquire(lock_id, settings.IDEMPOTENCY_WAIT_SECONDS):
+            return JsonResponse(
+                {'detail': 'A request with this Idempotency-Key is '
+                           'still in progress.'},
+                status=409,
+            )
+        try:
+            record = IdempotencyKey.objects.filter(
+                scope=scope, expires_at__gt=timezone.now()).first()
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return JsonResponse(
+                        {'detail': 'Idempotency-Key was already used for '
+                                   'a different request.'},
+                        status=422,
+                    )
+                return _replay(record)
+
+            response = self.get_response(request)
+            if response.status_code < 500 and not response.streaming:
+                IdempotencyKey.objects.update_or_create(
+                    scope=scope,
+                    defaults={
+                        'fingerprint': fingerprint,
+                        'status_code': response.status_code,
+                        'content_type': response.get('Content-Type', ''),
+                        'headers': {
+                            header: value
+                            for header, value in response.items()
+                            if header.lower() not in UNSTORED_HEADERS
+                        },
+                        'body': response.content,
+                        'expires_at': timezone.now() + timedelta(
+                            seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                    },
+                )
+            return response
+        finally:
+            _release(lock_id)
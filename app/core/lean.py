@@ -0,0 +1,85 @@
+"""
+Lean middleware stack for the token-authenticated API.
+
+Sessions, CSRF, session authentication, messages and clickjacking headers
+serve the browser pages only; API views authenticate with tokens. The
+classes here are those middleware, skipped on LEAN_PATH_PREFIXES so API
+requests pass straight through, and run as usual everywhere else, including
+the HTML pages listed in LEAN_EXCLUDED_PREFIXES.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import (
+    AuthenticationMiddleware as BaseAuthenticationMiddleware,
+)
+from django.contrib.messages.middleware import (
+    MessageMiddleware as BaseMessageMiddleware,
+)
+from django.contrib.sessions.middleware import (
+    SessionMiddleware as BaseSessionMiddleware,
+)
+from django.middleware.clickjacking import (
+    XFrameOptionsMiddleware as BaseXFrameOptionsMiddleware,
+)
+from django.middleware.csrf import CsrfViewMiddleware as BaseCsrfViewMiddleware
+
+HOOKS = ['process_view', 'process_exception', 'process_template_response']
+
+
+def is_lean(request):
+    """Return whether a request takes the lean API middleware stack."""
+    try:
+        return request._lean_middleware
+    except AttributeError:
+        path = request.path_info
+        request._lean_middleware = path.startswith(
+            tuple(settings.LEAN_PATH_PREFIXES)) and not path.startswith(
+            tuple(getattr(settings, 'LEAN_EXCLUDED_PREFIXES', ())))
+        return request._lean_middleware
+
+
+def _skip_hook(middleware, name):
+    def hook(self, request, *args):
+        if is_lean(request):
+            return args[-1] if name == 'process_template_response' else None
+        return getattr(middleware, name)(self, request, *args)
+    hook.__name__ = name
+    return hook
+
+
+def browser_only(middleware):
+    """Subclass a middleware to pass lean requests straight through.
+
+    Subclassing keeps checks that look for the stock middleware, such as the
+    admin's, satisfied.
+    """
+    def __call__(self, request):
+        if is_lean(request):
+            return self.get_response(request)
+        return middleware.__call__(self, request)
+
+    namespace = {'__call__': __call__, '__module__': __name__,
+                 '__doc__': f'{middleware.__name__} skipped for the API.'}
+    for name in HOOKS:
+        if hasattr(middleware, name):
+            namespace[name] = _skip_hook(middleware, name)
+    return type(middleware.__name__, (middleware,), namespace)
+
+
+SessionMiddleware = browser_only(BaseSessionMiddleware)
+CsrfViewMiddleware = browser_only(BaseCsrfViewMiddleware)
+AuthenticationMiddleware = browser_only(BaseAuthenticationMiddleware)
+MessageMiddleware = browser_only(BaseMessageMiddleware)
+XFrameOptionsMiddleware = browser_only(BaseXFrameOptionsMiddleware)
+
+# The stock middleware each lean one stands in for, e.g. to benchmark them.
+STOCK = {
+    f'{__name__}.{middleware.__name__}': (
+        f'{middleware.__base__.__module__}.{middleware.__base__.__name__}')
+    for middleware in [
+        SessionMiddleware,
+        CsrfViewMiddleware,
+        AuthenticationMiddleware,
+        MessageMiddleware,
+        XFrameOptionsMiddleware,
+    ]
+}
@@ -0,0 +1,303 @@
+"""
+Django management command to load test the API against a seeded database.
+
+Drives the real URL routes in-process with a weighted workload mix, reports
+throughput, latency percentiles and queries per request, and can compare the
+result with a stored baseline. Load data with ``seed_data`` first.
+"""
+import io
+import json
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.authtoken.models import Token
+
+from core.management.commands.seed_data import SEED_PASSWORD
+from core.models import Recipe, User
+
+DEFAULT_MIX = {
+    'recipe-list': 40,
+    'recipe-detail': 25,
+    'tag-list': 10,
+    'ingredient-list': 10,
+    'me': 10,
+    'token': 4,
+    'upload-image': 1,
+}
+# Relative increase in p95 latency, or decrease in throughput, that counts
+# as a regression when comparing with a baseline.
+DEFAULT_THRESHOLD = 0.10
+
+
+def _image():
+    """Return a small JPEG upload."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32)).save(buffer, format='JPEG')
+    buffer.name = 'bench.jpg'
+    buffer.seek(0)
+    return buffer
+
+
+def request_recipe_list(client, user, rng):
+    return client.get(reverse('recipe:recipe-list'), **user.headers)
+
+
+def request_recipe_detail(client, user, rng):
+    url = reverse('recipe:recipe-detail', args=[rng.choice(user.recipe_ids)])
+    return client.get(url, **user.headers)
+
+
+def request_upload_image(client, user, rng):
+    url = reverse(
+        'recipe:recipe-upload-image', args=[rng.choice(user.recipe_ids)])
+    return client.post(url, {'image': _image()}, **user.headers)
+
+
+def request_tag_list(client, user, rng):
+    return client.get(reverse('recipe:tag-list'), **user.headers)
+
+
+def request_ingredient_list(client, user, rng):
+    return client.get(reverse('recipe:ingredient-list'), **user.headers)
+
+
+def request_token(client, user, rng):
+    payload = {'email': user.email, 'password': SEED_PASSWORD}
+    return client.post(reverse('user:token'), payload)
+
+
+def request_me(client, user, rng):
+    return client.get(reverse('user:me'), **user.headers)
+
+
+ENDPOINTS = {
+    'recipe-list': request_recipe_list,
+    'recipe-detail': request_recipe_detail,
+    'upload-image': request_upload_image,
+    'tag-list': request_tag_list,
+    'ingredient-list': request_ingredient_list,
+    'token': request_token,
+    'me': request_me,
+}
+
+
+class BenchUser:
+    """A seeded user with its token and a sample of its recipe IDs."""
+
+    def __init__(self, user, recipe_ids):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.email = user.email
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        self.recipe_ids = recipe_ids
+
+
+class QueryCounter:
+    """Execute wrapper counting statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def parse_mix(value):
+    """Parse ``name=weight,...`` into a workload mix."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(
+                f'Unknown endpoint {name!r}; choose from {sorted(ENDPOINTS)}.')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, pct):
+    """Return the pct percentile of values using nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarise(samples, elapsed):
+    """Aggregate (endpoint, status, seconds, queries) samples."""
+    def stats(rows):
+        latencies = [row[2] * 1000 for row in rows]
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[1] >= 400),
+            'throughput': round(len(rows) / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries_per_request': round(
+                sum(row[3] for row in rows) / len(rows), 2) if rows else 0,
+        }
+
+    endpoints = sorted({row[0] for row in samples})
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'total': stats(samples),
+        'endpoints': {
+            name: stats([row for row in samples if row[0] == name])
+            for name in endpoints
+        },
+    }
+
+
+def compare(result, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return descriptions of regressions against a baseline result."""
+    regressions = []
+    for name, current in result['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous:
+            continue
+        if previous['p95_ms'] and \
+                current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']} ms -> "
+                f"{current['p95_ms']} ms")
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(
+                f"{name}: queries/request {previous['queries_per_request']}"
+                f" -> {current['queries_per_request']}")
+    total, previous = result['total'], baseline.get('total', {})
+    if previous.get('throughput') and \
+            total['throughput'] < previous['throughput'] * (1 - threshold):
+        regressions.append(
+            f"throughput {previous['throughput']} -> "
+            f"{total['throughput']} req/s")
+    return regressions
+
+
+class Command(BaseCommand):
+    """Run a concurrent workload against the API routes."""
+    help = 'Benchmark the API against users created by seed_data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed whose users drive the workload.')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                            help='Weighted mix, e.g. recipe-list=5,me=1')
+        parser.add_argument('--host', default='localhost',
+                            help='Host header; must be in ALLOWED_HOSTS.')
+        parser.add_argument('--output', help='Write results to this file.')
+        parser.add_argument('--baseline', help='Compare with this result.')
+        parser.add_argument('--threshold', type=float,
+                            default=DEFAULT_THRESHOLD)
+
+    def handle(self, *args, **options):
+        users = self._load_users(options['seed'], options['users'])
+        rng = random.Random(options['seed'])
+        names = list(options['mix'])
+        weights = [options['mix'][name] for name in names]
+        plan = rng.choices(names, weights=weights, k=options['requests'])
+
+        host = options['host']
+        self._run(users, plan[:options['warmup']], 1, host)
+        samples, elapsed = self._run(
+            users, plan, options['concurrency'], host)
+        result = summarise(samples, elapsed)
+        result['options'] = {
+            key: options[key]
+            for key in ('seed', 'users', 'concurrency', 'requests', 'mix')
+        }
+
+        self._report(result)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare(result, baseline, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def _load_users(self, seed, count):
+        users = []
+        queryset = User.objects.filter(
+            email__endswith=f'@seed{seed}.example.com').order_by('id')
+        for user in queryset[:count]:
+            recipe_ids = list(Recipe.objects.filter(user=user)
+                              .order_by('id').values_list('id', flat=True)[:100])
+            if recipe_ids:
+                users.append(BenchUser(user, recipe_ids))
+        if not users:
+            raise CommandError(
+                f'No seeded users with recipes for seed {seed}; '
+                'run seed_data first.')
+        return users
+
+    def _run(self, users, plan, concurrency, host):
+        """Execute the plan across worker threads and return samples."""
+        samples = []
+        lock = threading.Lock()
+        chunks = [plan[i::concurrency] for i in range(concurrency)]
+
+        def worker(index, chunk):
+            rng = random.Random(index)
+            client = Client(SERVER_NAME=host)
+            for name in chunk:
+                user = rng.choice(users)
+                counter = QueryCounter()
+                with ExitStack() as stack:
+                    for alias in connections:
+                        stack.enter_context(
+                            connections[alias].execute_wrapper(counter))
+                    start = time.perf_counter()
+                    response = ENDPOINTS[name](client, user, rng)
+                    duration = time.perf_counter() - start
+                with lock:
+                    samples.append(
+                        (name, response.status_code, duration, counter.count))
+            if concurrency > 1:
+                connections.close_all()
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker(0, chunks[0])
+        else:
+            threads = [
+                threading.Thread(target=worker, args=(i, chunk))
+                for i, chunk in enumerate(chunks)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return samples, time.perf_counter() - started
+
+    def _report(self, result):
+        header = f"{'endpoint':<18}{'req':>7}{'err':>5}{'req/s':>9}" \
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}"
+        self.stdout.write(header)
+        rows = list(result['endpoints'].items()) + [('total', result['total'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<18}{stats['requests']:>7}{stats['errors']:>5}"
+                f"{stats['throughput']:>9}{stats['p50_ms']:>9}"
+                f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+                f"{stats['queries_per_request']:>7}"
+            )
@@ -0,0 +1,76 @@
+"""
+Django management command to measure the middleware overhead of API requests.
+
+Sends the same request through the stock middleware stack and through the
+lean one from core.lean, alternating in rounds so drift affects both alike,
+and reports how much the lean stack saves per request.
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core import lean
+from core.management.commands.benchmark import percentile
+
+
+class Command(BaseCommand):
+    """Time one API route under the stock and the lean middleware stack."""
+    help = 'Compare per-request middleware overhead of API routes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per stack in each round.')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument(
+            '--path',
+            help='Path to request; by default a revalidation of the cached '
+                 'schema, which does next to no work in the view.')
+        parser.add_argument('--host', default='localhost',
+                            help='Host header; must be in ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        stacks = {
+            'stock': [lean.STOCK.get(path, path)
+                      for path in settings.MIDDLEWARE],
+            'lean': list(settings.MIDDLEWARE),
+        }
+        path, headers = options['path'], {}
+        if path is None:
+            path = reverse('schema')
+            response = Client(SERVER_NAME=options['host']).get(path)
+            headers['HTTP_IF_NONE_MATCH'] = response['ETag']
+
+        timings = {name: [] for name in stacks}
+        for _ in range(options['rounds']):
+            for name, middleware in stacks.items():
+                with override_settings(MIDDLEWARE=middleware):
+                    timings[name] += self._time(
+                        Client(SERVER_NAME=options['host']), path, headers,
+                        options['requests'])
+
+        self.stdout.write(f"{'stack':<8}{'p50 us':>10}{'mean us':>10}")
+        medians = {}
+        for name, samples in timings.items():
+            medians[name] = percentile(samples, 50) * 1e6
+            self.stdout.write(
+                f'{name:<8}{medians[name]:>10.1f}'
+                f'{statistics.mean(samples) * 1e6:>10.1f}')
+        saved = medians['stock'] - medians['lean']
+        self.stdout.write(self.style.SUCCESS(
+            f'The lean stack saves {saved:.1f} us per request on {path} '
+            f'({saved / medians["stock"]:.0%} of the median).'))
+
+    def _time(self, client, path, headers, count):
+        # The first request loads the middleware chain.
+        client.get(path, **headers)
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get(path, **headers)
+            samples.append(time.perf_counter() - start)
+        return samples
@@ -0,0 +1,38 @@
+"""
+Django management command to check the pre-rendered recipe documents.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import documents
+
+
+class Command(BaseCommand):
+    """Compare stored recipe documents with freshly rendered ones."""
+    help = 'Find pre-rendered recipe documents that drifted from the recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--user', action='append', dest='emails', default=[],
+            help='Only check the recipes of this user; may be repeated.')
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Render drifted documents again.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['emails']:
+            recipes = recipes.filter(user__email__in=options['emails'])
+        checked, drifted = documents.check(
+            recipes, options['batch_size'], options['repair'])
+
+        for recipe_id in drifted:
+            self.stdout.write(f'Recipe {recipe_id}: document drifted.')
+        message = f'Checked {checked} recipe(s), {len(drifted)} drifted'
+        if drifted and options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'{message}, repaired.'))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(f'{message}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{message}.'))
@@ -0,0 +1,28 @@
+"""
+Django management command to delete expired idempotency keys.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Delete stored responses whose idempotency window has passed."""
+    help = 'Delete expired idempotency keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        total = 0
+        now = timezone.now()
+        while True:
+            ids = list(IdempotencyKey.objects.filter(expires_at__lte=now)
+                       .values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {total} expired idempotency key(s).'))
@@ -0,0 +1,28 @@
+"""
+Django management command to generate the OpenAPI schema for this release.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Write the schema to disk so processes do not introspect the API."""
+    help = 'Generate the OpenAPI schema once and store it in SCHEMA_FILE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.SCHEMA_FILE)
+
+    def handle(self, *args, **options):
+        if not options['file']:
+            raise CommandError('No schema file given and SCHEMA_FILE unset.')
+        directory = os.path.dirname(options['file'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        schema.write(options['file'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote schema for version {schema.code_version()} to '
+            f'{options["file"]}.'))
@@ -0,0 +1,25 @@
+"""
+Django management command to merge duplicate tag and ingredient names.
+"""
+from django.core.management.base import BaseCommand
+
+from recipe import names
+
+
+class Command(BaseCommand):
+    """Merge tags and ingredients whose normalised names are equal."""
+    help = 'Merge duplicate tags and ingredients into the oldest row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Duplicates merged per transaction.')
+
+    def handle(self, *args, **options):
+        for relation in names.NAME_TABLES:
+            total = 0
+            for user_id in names.users_with_duplicates(relation):
+                total += names.merge_duplicates(
+                    relation, user_id, options['batch_size'])
+            self.stdout.write(f'Merged {total} duplicate {relation}.')
+        self.stdout.write(self.style.SUCCESS('Duplicates merged.'))
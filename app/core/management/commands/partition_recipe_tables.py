@@ -0,0 +1,81 @@
+"""
+Django management command to hash partition the recipe tables by user online.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import partitioning
+
+STEPS = ['status', 'prepare', 'backfill', 'swap', 'drop-old']
+
+
+class Command(BaseCommand):
+    """Move the recipe and link tables into partitions step by step."""
+    help = (
+        'Partition core_recipe and its link tables by user without '
+        'downtime: prepare, backfill, swap, then drop-old.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('step', choices=STEPS)
+        parser.add_argument(
+            '--partitions', type=int, default=settings.RECIPE_PARTITIONS)
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=partitioning.DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between backfill batches to limit load.')
+        parser.add_argument(
+            '--lock-timeout', default='5s',
+            help='Give up the swap if the tables cannot be locked in time.')
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, options['step'].replace('-', '_'))(options)
+        except partitioning.PartitioningError as error:
+            raise CommandError(str(error))
+
+    def status(self, options):
+        for table, partitioned, last, target in partitioning.progress():
+            if partitioned:
+                state = 'partitioned'
+            elif target is None:
+                state = 'not prepared'
+            else:
+                state = f'backfilled up to ID {last} of {target}'
+            self.stdout.write(f'{table}: {state}')
+
+    def prepare(self, options):
+        if options['partitions'] < 1:
+            raise CommandError('--partitions must be at least 1.')
+        prepared = partitioning.prepare(options['partitions'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Prepared {len(prepared)} table(s) with '
+            f'{options["partitions"]} partitions each.'))
+
+    def backfill(self, options):
+        for table in partitioning.TABLES:
+            copied = partitioning.backfill(
+                table, options['batch_size'], options['pause'],
+                report=self._report)
+            self.stdout.write(self.style.SUCCESS(
+                f'{table}: copied {copied} row(s).'))
+
+    def swap(self, options):
+        swapped = partitioning.swap(options['lock_timeout'])
+        if swapped:
+            self.stdout.write(self.style.SUCCESS(
+                'Swapped in the partitioned tables; run drop-old once '
+                'the application is healthy.'))
+        else:
+            self.stdout.write('The tables are already partitioned.')
+
+    def drop_old(self, options):
+        dropped = partitioning.drop_old()
+        self.stdout.write(self.style.SUCCESS(
+            f'Dropped {len(dropped)} old table(s).'))
+
+    def _report(self, table, last, target, copied):
+        self.stdout.write(
+            f'  {table}: up to ID {last} of {target}, {copied} copied')
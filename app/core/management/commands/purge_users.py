@@ -0,0 +1,71 @@
+"""
+Django management command to process queued user purges in the background.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import purge
+from core.models import PurgeJob, User
+
+
+class Command(BaseCommand):
+    """Delete queued users' data in small batches."""
+    help = 'Process user purge jobs in bounded, resumable batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', action='append', default=[],
+            help='Queue this user for purging before processing.')
+        parser.add_argument(
+            '--batch-size', type=int, default=purge.DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches to limit load.')
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Resume failed jobs from where they stopped.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new jobs instead of exiting.')
+        parser.add_argument('--poll', type=float, default=5)
+
+    def handle(self, *args, **options):
+        for email in options['email']:
+            try:
+                user = User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'User {email} does not exist.')
+            purge.enqueue_purge(user)
+
+        if options['retry_failed']:
+            PurgeJob.objects.filter(status=PurgeJob.FAILED) \
+                .update(status=PurgeJob.PENDING, error='')
+
+        while True:
+            job = purge.claim_job()
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            self.stdout.write(f'Purging {job.email}...')
+            try:
+                purge.run_job(
+                    job,
+                    batch_size=options['batch_size'],
+                    pause=options['pause'],
+                    report=self._report,
+                )
+            except Exception as error:
+                self.stderr.write(f'Purge of {job.email} failed: {error}')
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Purged {job.email}.'))
+
+    def _report(self, job):
+        self.stdout.write(
+            f'  {job.phase}: {job.recipes_deleted} recipes, '
+            f'{job.tags_deleted} tags, {job.ingredients_deleted} '
+            f'ingredients, {job.links_deleted} links'
+        )
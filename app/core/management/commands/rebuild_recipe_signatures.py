@@ -0,0 +1,26 @@
+"""
+Django management command to rebuild the recipe similarity signatures.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import similarity
+
+
+class Command(BaseCommand):
+    """Recompute the MinHash signature of every recipe in batches."""
+    help = 'Rebuild MinHash signatures used by the similar recipes endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--user', action='append', dest='emails', default=[],
+            help='Only rebuild the recipes of this user; may be repeated.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['emails']:
+            recipes = recipes.filter(user__email__in=options['emails'])
+        total = similarity.rebuild(options['batch_size'], recipes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total} recipe signature(s).'))
@@ -0,0 +1,33 @@
+"""
+Django management command to rebuild the per-user recipe stats.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import User
+from recipe import stats
+
+
+class Command(BaseCommand):
+    """Recompute recipe stats rows from the recipe tables in batches."""
+    help = 'Rebuild the per-user recipe stats summary rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--user', action='append', dest='emails', default=[],
+            help='Only rebuild the stats of this user; may be repeated.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id').values_list('id', flat=True)
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+
+        total, last = 0, 0
+        while True:
+            batch = list(users.filter(id__gt=last)[:options['batch_size']])
+            if not batch:
+                break
+            total += stats.reconcile(batch)
+            last = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled recipe stats of {total} user(s).'))
@@ -0,0 +1,159 @@
+"""
+Django management command to restore an archive from ``dump_recipe_data``.
+
+Every table is copied into a staging table with ``COPY ... FROM STDIN`` and
+inserted with fresh primary keys from the target sequences, remapping foreign
+keys through old-to-new ID tables in set-based SQL. Users whose email already
+exists are either refused or, with --reuse-users, receive the restored data.
+Restored users never get staff or superuser rights, which the archive does
+not carry; grant them again by hand where needed.
+"""
+import json
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.management.commands.dump_recipe_data import (
+    ARCHIVE_VERSION,
+    TABLES,
+    member_name,
+)
+from recipe import stats
+
+# Foreign key columns and the table whose IDs they reference.
+FOREIGN_KEYS = {
+    'user_id': 'core_user',
+    'recipe_id': 'core_recipe',
+    'tag_id': 'core_tag',
+    'ingredient_id': 'core_ingredient',
+}
+# Tables tracked by delta sync; restored rows are new to every client.
+SYNC_TABLES = {'core_tag', 'core_ingredient', 'core_recipe'}
+# Link tables storing the owner of their recipe, which is not archived.
+OWNED_LINK_TABLES = {'core_recipe_tags', 'core_recipe_ingredients'}
+
+
+def stage_table(table):
+    return f'stage_{table}'
+
+
+def map_table(table):
+    return f'map_{table}'
+
+
+class Command(BaseCommand):
+    """Restore users and their recipes with remapped IDs."""
+    help = (
+        'Restore users and recipe data from a dump_recipe_data archive. '
+        'Restored users are created without staff or superuser rights.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Path of the archive to read.')
+        parser.add_argument(
+            '--reuse-users', action='store_true',
+            help='Attach data to users that already exist by email.')
+
+    def handle(self, *args, **options):
+        with zipfile.ZipFile(options['archive']) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+            if manifest.get('version') != ARCHIVE_VERSION:
+                raise CommandError('Unsupported archive version.')
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                temp_tables = []
+                for table, columns, _ in TABLES:
+                    if manifest['tables'].get(table) != columns:
+                        raise CommandError(f'Archive columns differ for {table}.')
+                    self._stage(cursor, archive, table, columns)
+                    temp_tables.append(stage_table(table))
+
+                self._map_users(cursor, options['reuse_users'])
+                temp_tables.append(map_table('core_user'))
+                for table, columns, _ in TABLES[1:]:
+                    self._insert(cursor, table, columns)
+                    if 'id' in columns:
+                        temp_tables.append(map_table(table))
+                    self.stdout.write(f'Restored {table}: {cursor.rowcount}')
+
+                cursor.execute(f'SELECT new_id FROM {map_table("core_user")}')
+                stats.reconcile([row[0] for row in cursor.fetchall()])
+                cursor.execute(f'DROP TABLE {", ".join(temp_tables)}')
+
+        self.stdout.write(self.style.SUCCESS('Restore complete.'))
+
+    def _stage(self, cursor, archive, table, columns):
+        """Copy one archive member into a staging table."""
+        stage = stage_table(table)
+        cursor.execute(
+            f'CREATE TEMP TABLE {stage} ON COMMIT DROP AS '
+            f'SELECT {", ".join(columns)} FROM {table} WITH NO DATA'
+        )
+        with archive.open(member_name(table)) as f:
+            cursor.copy_expert(
+                f'COPY {stage} ({", ".join(columns)}) '
+                'FROM STDIN WITH (FORMAT csv)', f)
+
+    def _map_users(self, cursor, reuse_users):
+        """Match users by email, creating the ones that do not exist."""
+        stage, mapping = stage_table('core_user'), map_table('core_user')
+        cursor.execute(
+            f'CREATE TEMP TABLE {mapping} ON COMMIT DROP AS '
+            f'SELECT s.id AS old_id, u.id IS NOT NULL AS existed, '
+            f"COALESCE(u.id, nextval(pg_get_serial_sequence('core_user', 'id'))) "
+            f'AS new_id FROM {stage} s LEFT JOIN core_user u ON u.email = s.email'
+        )
+        cursor.execute(f'SELECT count(*) FROM {mapping} WHERE existed')
+        existing = cursor.fetchone()[0]
+        if existing and not reuse_users:
+            raise CommandError(
+                f'{existing} user(s) already exist; use --reuse-users to '
+                'restore into them.')
+
+        cursor.execute(
+            'INSERT INTO core_user (id, email, name, password, is_active, '
+            'is_staff, is_superuser) '
+            'SELECT m.new_id, s.email, s.name, s.password, s.is_active, '
+            f'false, false FROM {stage} s '
+            f'JOIN {mapping} m ON m.old_id = s.id WHERE NOT m.existed'
+        )
+        self.stdout.write(f'Restored core_user: {cursor.rowcount}')
+
+    def _insert(self, cursor, table, columns):
+        """Insert staged rows with new IDs and remapped foreign keys."""
+        stage = stage_table(table)
+        joins, select = [], []
+        if 'id' in columns:
+            mapping = map_table(table)
+            cursor.execute(
+                f'CREATE TEMP TABLE {mapping} ON COMMIT DROP AS '
+                f'SELECT id AS old_id, '
+                f"nextval(pg_get_serial_sequence('{table}', 'id')) AS new_id "
+                f'FROM {stage}'
+            )
+            joins.append(f'JOIN {mapping} m ON m.old_id = s.id')
+
+        for column in columns:
+            if column == 'id':
+                select.append('m.new_id')
+            elif column in FOREIGN_KEYS:
+                alias = f'm_{column}'
+                joins.append(
+                    f'JOIN {map_table(FOREIGN_KEYS[column])} {alias} '
+                    f'ON {alias}.old_id = s.{column}')
+                select.append(f'{alias}.new_id')
+            else:
+                select.append(f's.{column}')
+        if table in SYNC_TABLES:
+            columns = columns + ['updated_at']
+            select.append('clock_timestamp()')
+        if table in OWNED_LINK_TABLES:
+            joins.append('JOIN core_recipe r ON r.id = m_recipe_id.new_id')
+            columns = columns + ['user_id']
+            select.append('r.user_id')
+
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'SELECT {", ".join(select)} FROM {stage} s {" ".join(joins)}'
+        )
@@ -0,0 +1,271 @@
+"""
+Django management command to generate a synthetic dataset for load testing.
+
+Rows are written with PostgreSQL COPY in batches, using primary keys reserved
+up front from each table's sequence, so that M2M links can be written without
+reading anything back. The same --seed always produces the same data.
+"""
+import io
+import math
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import User
+from recipe import stats
+
+SEED_PASSWORD = 'seedpass123'
+
+ADJECTIVES = [
+    'Spicy', 'Creamy', 'Smoky', 'Crispy', 'Roasted', 'Grilled', 'Quick',
+    'Classic', 'Rustic', 'Zesty', 'Herby', 'Sticky', 'Golden', 'Hearty',
+    'Light', 'Slow-cooked', 'Tangy', 'Garlicky', 'Sweet', 'Savory',
+]
+DISHES = [
+    'Chicken', 'Curry', 'Noodles', 'Salad', 'Soup', 'Risotto', 'Tacos',
+    'Stew', 'Pasta', 'Pie', 'Burger', 'Stir Fry', 'Casserole', 'Flatbread',
+    'Omelette', 'Pancakes', 'Dumplings', 'Chili', 'Lasagna', 'Bowl',
+]
+TAG_WORDS = [
+    'Vegan', 'Vegetarian', 'Dinner', 'Lunch', 'Breakfast', 'Dessert',
+    'Quick', 'Healthy', 'Gluten Free', 'Dairy Free', 'Spicy', 'Comfort',
+    'Party', 'Budget', 'Kids', 'Batch Cook', 'Summer', 'Winter', 'Baking',
+    'One Pot', 'Low Carb', 'High Protein', 'Italian', 'Mexican', 'Indian',
+    'Thai', 'Chinese', 'French', 'Japanese', 'Greek',
+]
+INGREDIENT_WORDS = [
+    'Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion', 'Tomato', 'Butter',
+    'Eggs', 'Milk', 'Flour', 'Sugar', 'Rice', 'Chicken Breast', 'Beef',
+    'Carrot', 'Potato', 'Lemon', 'Basil', 'Parsley', 'Cumin', 'Paprika',
+    'Ginger', 'Soy Sauce', 'Chili', 'Cheese', 'Cream', 'Spinach',
+    'Mushroom', 'Bell Pepper', 'Coconut Milk', 'Chickpeas', 'Lentils',
+    'Pasta', 'Bread', 'Honey', 'Vinegar', 'Yogurt', 'Beans', 'Corn', 'Tofu',
+]
+
+# Pareto shape for recipes per user; the mean of paretovariate(a) is
+# a / (a - 1), which is divided out so the average stays at the option value.
+USER_SKEW = 1.5
+# Exponent of the Zipf weights used to pick popular tags and ingredients.
+POPULARITY_SKEW = 1.1
+
+
+def zipf_weights(n):
+    """Return cumulative Zipf weights for n ranked items."""
+    total = 0.0
+    weights = []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** POPULARITY_SKEW
+        weights.append(total)
+    return weights
+
+
+def vocabulary(words, count):
+    """Return count distinct names drawn from a word list."""
+    names = list(words[:count])
+    suffix = 2
+    while len(names) < count:
+        names.extend(
+            f'{word} {suffix}' for word in words[:count - len(names)])
+        suffix += 1
+    return names
+
+
+def pick(rng, items, cum_weights, mean):
+    """Pick around mean distinct items, favouring the most popular."""
+    if not items or mean <= 0:
+        return []
+    count = min(len(items), int(rng.expovariate(1 / mean) + 0.5))
+    if count == 0:
+        return []
+    return sorted(set(rng.choices(
+        range(len(items)), cum_weights=cum_weights, k=count)))
+
+
+def plan_user(rng, options):
+    """Return the tags, ingredients and recipes for one synthetic user."""
+    tags = vocabulary(TAG_WORDS, options['tags_per_user'])
+    ingredients = vocabulary(
+        INGREDIENT_WORDS, options['ingredients_per_user'])
+    rng.shuffle(tags)
+    rng.shuffle(ingredients)
+    tag_weights = zipf_weights(len(tags))
+    ingredient_weights = zipf_weights(len(ingredients))
+
+    mean = options['recipes_per_user']
+    scale = (USER_SKEW - 1) / USER_SKEW
+    recipe_count = min(
+        int(mean * rng.paretovariate(USER_SKEW) * scale + 0.5),
+        mean * 50,
+    )
+
+    recipes = []
+    for _ in range(recipe_count):
+        title = f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}'
+        time_minutes = max(1, min(600, int(rng.lognormvariate(3.3, 0.6))))
+        price = Decimal(min(999.99, rng.lognormvariate(2.0, 0.5))) \
+            .quantize(Decimal('0.01'))
+        description = '' if rng.random() < 0.3 else \
+            ' '.join(rng.choices(INGREDIENT_WORDS, k=8)).lower()
+        recipes.append((
+            title, time_minutes, price, description,
+            pick(rng, tags, tag_weights, options['tags_per_recipe']),
+            pick(rng, ingredients, ingredient_weights,
+                 options['ingredients_per_recipe']),
+        ))
+    return tags, ingredients, recipes
+
+
+def reserve_ids(cursor, table, count):
+    """Reserve count consecutive primary keys and return the first one."""
+    if count == 0:
+        return 0
+    cursor.execute(
+        'SELECT setval(pg_get_serial_sequence(%s, %s), '
+        'nextval(pg_get_serial_sequence(%s, %s)) + %s - 1)',
+        [table, 'id', table, 'id', count],
+    )
+    last = cursor.fetchone()[0]
+    return last - count + 1
+
+
+class Batch:
+    """Tab separated rows per table, flushed to the database with COPY."""
+
+    COLUMNS = {
+        'core_user': (
+            'id', 'password', 'is_superuser', 'email', 'name',
+            'is_active', 'is_staff',
+        ),
+        'core_tag': ('id', 'user_id', 'name', 'updated_at'),
+        'core_ingredient': ('id', 'user_id', 'name', 'updated_at'),
+        'core_recipe': (
+            'id', 'user_id', 'title', 'time_minutes', 'price',
+            'description', 'link', 'updated_at',
+        ),
+        'core_recipe_tags': ('recipe_id', 'tag_id', 'user_id'),
+        'core_recipe_ingredients': ('recipe_id', 'ingredient_id', 'user_id'),
+    }
+
+    def __init__(self):
+        self.created_at = timezone.now().isoformat()
+        self.reset()
+
+    def reset(self):
+        self.buffers = {table: io.StringIO() for table in self.COLUMNS}
+        self.recipes = 0
+
+    def add(self, table, *values):
+        self.buffers[table].write('\t'.join(map(str, values)) + '\n')
+
+    def flush(self, cursor):
+        for table, columns in self.COLUMNS.items():
+            buffer = self.buffers[table]
+            buffer.seek(0)
+            cursor.copy_from(buffer, table, columns=columns)
+        self.reset()
+
+
+class Command(BaseCommand):
+    """Generate users, tags, ingredients, recipes and their links."""
+    help = 'Generate a deterministic synthetic dataset for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=50)
+        parser.add_argument('--tags-per-user', type=int, default=20)
+        parser.add_argument('--ingredients-per-user', type=int, default=60)
+        parser.add_argument('--tags-per-recipe', type=float, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=float, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=50000,
+            help='Recipes written per COPY batch.')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        email_domain = f'seed{seed}.example.com'
+        if User.objects.filter(email__endswith='@' + email_domain).exists():
+            raise CommandError(
+                f'Seed {seed} has already been loaded into this database.')
+
+        rng = random.Random(seed)
+        password = make_password(SEED_PASSWORD, salt=f'seed{seed}')
+        started = time.monotonic()
+        totals = {'users': 0, 'recipes': 0}
+
+        with connection.cursor() as cursor:
+            batch = Batch()
+            user_ids = reserve_ids(cursor, 'core_user', options['users'])
+            for index in range(options['users']):
+                user_id = user_ids + index
+                batch.add(
+                    'core_user', user_id, password, 'f',
+                    f'user{index}@{email_domain}', f'Seed User {index}',
+                    't', 'f',
+                )
+                totals['recipes'] += self._add_user_data(
+                    cursor, batch, rng, user_id, options)
+                totals['users'] += 1
+
+                if batch.recipes >= options['batch_size']:
+                    with transaction.atomic():
+                        batch.flush(cursor)
+                    self._progress(totals, started)
+            with transaction.atomic():
+                batch.flush(cursor)
+
+        stats.reconcile(range(user_ids, user_ids + options['users']))
+        self._progress(totals, started)
+        self.stdout.write(self.style.SUCCESS('Seed data generated.'))
+
+    def _add_user_data(self, cursor, batch, rng, user_id, options):
+        """Queue one user's rows and return how many recipes it has."""
+        tags, ingredients, recipes = plan_user(rng, options)
+        tag_ids = reserve_ids(cursor, 'core_tag', len(tags))
+        ingredient_ids = reserve_ids(
+            cursor, 'core_ingredient', len(ingredients))
+        recipe_ids = reserve_ids(cursor, 'core_recipe', len(recipes))
+
+        for offset, name in enumerate(tags):
+            batch.add(
+                'core_tag', tag_ids + offset, user_id, name,
+                batch.created_at,
+            )
+        for offset, name in enumerate(ingredients):
+            batch.add(
+                'core_ingredient', ingredient_ids + offset, user_id, name,
+                batch.created_at,
+            )
+        for offset, recipe in enumerate(recipes):
+            title, time_minutes, price, description, \
+                tag_indexes, ingredient_indexes = recipe
+            recipe_id = recipe_ids + offset
+            batch.add(
+                'core_recipe', recipe_id, user_id, title, time_minutes,
+                price, description, '', batch.created_at,
+            )
+            for tag_index in tag_indexes:
+                batch.add(
+                    'core_recipe_tags', recipe_id, tag_ids + tag_index,
+                    user_id,
+                )
+            for ingredient_index in ingredient_indexes:
+                batch.add(
+                    'core_recipe_ingredients', recipe_id,
+                    ingredient_ids + ingredient_index, user_id,
+                )
+        batch.recipes += len(recipes)
+        return len(recipes)
+
+    def _progress(self, totals, started):
+        elapsed = time.monotonic() - started
+        rate = totals['recipes'] / elapsed if elapsed else math.inf
+        self.stdout.write(
+            f"{totals['users']} users, {totals['recipes']} recipes "
+            f'({rate:,.0f} recipes/s)'
+        )
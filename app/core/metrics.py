@@ -0,0 +1,130 @@
+"""
+Request metrics collected by middleware and exposed in Prometheus format.
+"""
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling a request.',
+    ['route', 'method'],
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Requests handled, by response status.',
+    ['route', 'method', 'status'],
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Size of non-streaming response bodies.',
+    ['route'],
+    buckets=(128, 512, 2048, 8192, 32768, 131072, 524288, 2097152),
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries executed per request.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent executing SQL per request.',
+    ['route'],
+)
+
+
+class QueryRecorder:
+    """Execute wrapper counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def route_name(request):
+    """Return the resolved URL name of a request, e.g. recipe:recipe-list."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return UNMATCHED_ROUTE
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Record latency, SQL, response size and status for every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        route = route_name(request)
+        REQUEST_LATENCY.labels(route, request.method).observe(elapsed)
+        REQUEST_COUNT.labels(
+            route, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(route).observe(recorder.count)
+        DB_DURATION.labels(route).observe(recorder.duration)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(route).observe(len(response.content))
+        return response
+
+
+def _registry():
+    """Return a registry covering every worker process when configured."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Expose collected metrics in the Prometheus text format.
+
+    Scrapers present METRICS_TOKEN as a bearer token; without one configured
+    only staff users signed in to the admin can read them.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    else:
+        user = getattr(request, 'user', None)
+        allowed = user is not None and user.is_active and user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(_registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
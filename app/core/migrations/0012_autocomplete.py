@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:00
+
+from django.contrib.postgres.operations import (
+    TrigramExtension,
+    UnaccentExtension,
+)
+from django.db import migrations
+
+# unaccent() is only STABLE, so it is wrapped in an IMMUTABLE function that
+# can be used in index expressions.
+CREATE_FUNCTION = '''
+CREATE FUNCTION core_normalize_name(text) RETURNS text AS
+$$ SELECT public.unaccent('public.unaccent', lower($1)) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+'''
+DROP_FUNCTION = 'DROP FUNCTION core_normalize_name(text)'
+
+
+def name_indexes(table, prefix):
+    return migrations.RunSQL(
+        [
+            f'CREATE INDEX {prefix}_name_prefix_idx ON {table} '
+            f'(user_id, core_normalize_name(name) text_pattern_ops)',
+            f'CREATE INDEX {prefix}_name_trgm_idx ON {table} '
+            f'USING gin (core_normalize_name(name) gin_trgm_ops)',
+        ],
+        [
+            f'DROP INDEX {prefix}_name_prefix_idx',
+            f'DROP INDEX {prefix}_name_trgm_idx',
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipesignature'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_FUNCTION, DROP_FUNCTION),
+        name_indexes('core_tag', 'core_tag'),
+        name_indexes('core_ingredient', 'core_ingr'),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Add delta times each occurrence of a key to a jsonb map of counts,
+# dropping keys whose count reaches zero.
+CREATE_FUNCTION = '''
+CREATE FUNCTION core_bump_counts(counts jsonb, keys text[], delta integer)
+RETURNS jsonb AS $$
+    SELECT jsonb_strip_nulls(counts || COALESCE(jsonb_object_agg(
+        k, NULLIF(COALESCE((counts ->> k)::integer, 0) + n * delta, 0)
+    ), '{}'))
+    FROM (SELECT k, count(*) AS n FROM unnest(keys) AS k GROUP BY k) AS x
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+'''
+DROP_FUNCTION = 'DROP FUNCTION core_bump_counts(jsonb, text[], integer)'
+
+BACKFILL = '''
+INSERT INTO core_recipestats (
+    user_id, recipe_count, total_price, total_time_minutes,
+    time_histogram, tag_counts, ingredient_counts)
+SELECT u.id,
+    (SELECT count(*) FROM core_recipe r WHERE r.user_id = u.id),
+    (SELECT COALESCE(sum(price), 0) FROM core_recipe r WHERE r.user_id = u.id),
+    (SELECT COALESCE(sum(time_minutes), 0) FROM core_recipe r
+     WHERE r.user_id = u.id),
+    (SELECT COALESCE(jsonb_object_agg(bucket, n), '{}') FROM (
+        SELECT width_bucket(time_minutes,
+                            ARRAY[10, 20, 30, 45, 60, 90, 120])::text AS bucket,
+               count(*) AS n
+        FROM core_recipe r WHERE r.user_id = u.id GROUP BY 1) AS h),
+    (SELECT COALESCE(jsonb_object_agg(tag_id::text, n), '{}') FROM (
+        SELECT l.tag_id, count(*) AS n FROM core_recipe_tags l
+        JOIN core_recipe r ON r.id = l.recipe_id
+        WHERE r.user_id = u.id GROUP BY l.tag_id) AS t),
+    (SELECT COALESCE(jsonb_object_agg(ingredient_id::text, n), '{}') FROM (
+        SELECT l.ingredient_id, count(*) AS n FROM core_recipe_ingredients l
+        JOIN core_recipe r ON r.id = l.recipe_id
+        WHERE r.user_id = u.id GROUP BY l.ingredient_id) AS i)
+FROM core_user u
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_autocomplete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('time_histogram', models.JSONField(default=dict)),
+                ('tag_counts', models.JSONField(default=dict)),
+                ('ingredient_counts', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_FUNCTION, DROP_FUNCTION),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
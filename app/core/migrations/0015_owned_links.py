@@ -0,0 +1,81 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:00
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Adding a nullable column without a default does not rewrite the tables.
+# Rows written before it keep a NULL owner; partition_recipe_tables looks
+# their owner up when it copies them.
+ADD_OWNER = '''
+ALTER TABLE core_recipe_tags ADD COLUMN user_id bigint;
+ALTER TABLE core_recipe_ingredients ADD COLUMN user_id bigint;
+'''
+DROP_OWNER = '''
+ALTER TABLE core_recipe_tags DROP COLUMN user_id;
+ALTER TABLE core_recipe_ingredients DROP COLUMN user_id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipedocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipesignature',
+            name='recipe',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='core.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='recipedocument',
+            name='recipe',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='core.recipe'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(ADD_OWNER, DROP_OWNER),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_tags',
+                        'unique_together': {('recipe', 'tag')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient')),
+                        ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_ingredients',
+                        'unique_together': {('recipe', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='tags',
+                    field=core.models.OwnedManyToManyField(blank=True, through='core.RecipeTag', to='core.Tag'),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=core.models.OwnedManyToManyField(blank=True, through='core.RecipeIngredient', to='core.Ingredient'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations
+
+from core import partitioning
+
+
+def partition_empty_tables(apps, schema_editor):
+    # Tables that already hold rows are left to partition_recipe_tables,
+    # which moves them without locking them for the whole copy.
+    partitioning.partition_empty(settings.RECIPE_PARTITIONS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_owned_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_empty_tables, migrations.RunPython.noop),
+    ]
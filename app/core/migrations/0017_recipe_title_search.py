@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:00
+
+from django.db import migrations
+
+from core import partitioning
+
+INDEX = 'core_recipe_title_trgm_idx'
+DEFINITION = 'USING gin (core_normalize_name(title) gin_trgm_ops)'
+PARTITIONS_SQL = '''
+    SELECT inhrelid::regclass::text FROM pg_inherits
+    WHERE inhparent = 'core_recipe'::regclass ORDER BY 1
+'''
+
+
+def create_title_index(apps, schema_editor):
+    # Built concurrently so the admin's title search can be added to a large
+    # recipe table without blocking writes. A partitioned table cannot be
+    # indexed concurrently, so each partition is and the parent's index is
+    # assembled from them.
+    with schema_editor.connection.cursor() as cursor:
+        if not partitioning.is_partitioned(cursor, 'core_recipe'):
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY {INDEX} ON core_recipe '
+                f'{DEFINITION}')
+            return
+        cursor.execute(f'CREATE INDEX {INDEX} ON ONLY core_recipe {DEFINITION}')
+        cursor.execute(PARTITIONS_SQL)
+        for (partition,) in cursor.fetchall():
+            name = f'{partition}_title_trgm_idx'
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY {name} ON {partition} {DEFINITION}')
+            cursor.execute(f'ALTER INDEX {INDEX} ATTACH PARTITION {name}')
+
+
+def drop_title_index(apps, schema_editor):
+    # Dropping the parent's index drops those of the partitions with it.
+    schema_editor.execute(f'DROP INDEX {INDEX}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_partition_recipes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_index, drop_title_index),
+    ]
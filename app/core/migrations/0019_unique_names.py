@@ -0,0 +1,111 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:00
+
+from django.db import migrations, transaction
+
+# (table, index prefix, link table, link column, tombstone type, stats
+# column) of the name tables.
+NAME_TABLES = [
+    ('core_tag', 'core_tag', 'core_recipe_tags', 'tag_id', 'tag',
+     'tag_counts'),
+    ('core_ingredient', 'core_ingr', 'core_recipe_ingredients',
+     'ingredient_id', 'ingredient', 'ingredient_counts'),
+]
+
+# Rows that share a user and the key of the new unique index, paired with
+# the oldest of them, which is kept.
+MERGES_SQL = '''
+    CREATE TEMPORARY TABLE name_merges ON COMMIT DROP AS
+    SELECT id AS old_id, keep_id, user_id FROM (
+        SELECT id, user_id, first_value(id) OVER (
+            PARTITION BY user_id, core_normalize_name(name) ORDER BY id
+        ) AS keep_id
+        FROM {table}
+    ) AS ranked
+    WHERE id <> keep_id
+'''
+MOVE_LINKS_SQL = '''
+    INSERT INTO {link_table} (recipe_id, {column}, user_id)
+    SELECT l.recipe_id, m.keep_id, l.user_id
+    FROM {link_table} l JOIN name_merges m ON l.{column} = m.old_id
+    ON CONFLICT DO NOTHING
+'''
+UNLINK_SQL = '''
+    WITH unlinked AS (
+        DELETE FROM {link_table} l USING name_merges m
+        WHERE l.{column} = m.old_id AND l.user_id = m.user_id
+        RETURNING l.recipe_id
+    ), touched AS (
+        UPDATE core_recipe SET updated_at = clock_timestamp()
+        WHERE id IN (SELECT recipe_id FROM unlinked)
+        RETURNING id
+    )
+    DELETE FROM core_recipedocument
+    WHERE recipe_id IN (SELECT id FROM touched)
+'''
+DELETE_SQL = '''
+    WITH deleted AS (
+        DELETE FROM {table} USING name_merges m WHERE id = m.old_id
+        RETURNING m.user_id, m.old_id
+    )
+    INSERT INTO core_tombstone (user_id, type, object_id, deleted_at)
+    SELECT user_id, %s, old_id, clock_timestamp() FROM deleted
+'''
+COUNTS_SQL = '''
+    UPDATE core_recipestats s SET {counts} = (
+        SELECT COALESCE(jsonb_object_agg(key, n), '{{}}') FROM (
+            SELECT l.{column}::text AS key, count(*) AS n
+            FROM {link_table} l
+            WHERE l.user_id = s.user_id GROUP BY 1
+        ) AS c)
+    WHERE s.user_id IN (SELECT user_id FROM name_merges)
+'''
+
+
+def merge_duplicates(apps, schema_editor):
+    # Duplicates that predate normalisation would fail the unique indexes.
+    # Only names equal under the index key are merged here, with the SQL of
+    # this point in history; the merge_duplicates command handles the rest.
+    # Similarity signatures and cached matching indexes of affected users
+    # catch up on rebuild_recipe_signatures and on expiry.
+    connection = schema_editor.connection
+    for table, _, link_table, column, tombstone_type, counts in NAME_TABLES:
+        names = {'table': table, 'link_table': link_table, 'column': column,
+                 'counts': counts}
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute(MERGES_SQL.format(**names))
+            cursor.execute(MOVE_LINKS_SQL.format(**names))
+            cursor.execute(UNLINK_SQL.format(**names))
+            cursor.execute(COUNTS_SQL.format(**names))
+            cursor.execute(DELETE_SQL.format(**names), [tombstone_type])
+
+
+def unique_name_index(table, prefix):
+    # The unique index also serves the prefix searches of autocomplete, so
+    # it replaces the plain index on the same expression.
+    unique = (
+        f'CREATE UNIQUE INDEX CONCURRENTLY {prefix}_name_uniq ON {table} '
+        f'(user_id, core_normalize_name(name) text_pattern_ops)')
+    plain = (
+        f'CREATE INDEX CONCURRENTLY {prefix}_name_prefix_idx ON {table} '
+        f'(user_id, core_normalize_name(name) text_pattern_ops)')
+    return [
+        migrations.RunSQL(
+            unique, f'DROP INDEX CONCURRENTLY {prefix}_name_uniq'),
+        migrations.RunSQL(
+            f'DROP INDEX CONCURRENTLY {prefix}_name_prefix_idx', plain),
+    ]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0018_idempotencykey_headers'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        *unique_name_index('core_tag', 'core_tag'),
+        *unique_name_index('core_ingredient', 'core_ingr'),
+    ]
@@ -1,7 +1,11 @@
 """
 Database models
 """
-from django.db import models
+from django.db import connections, models
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from django.utils.functional import cached_property
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -12,6 +16,8 @@ from django.conf import settings
 import uuid
 import os
 
+from core import partitioning
+
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
     ext = filename.split('.')[-1]
@@ -56,6 +62,99 @@ class User(AbstractBaseUser,PermissionsMixin):
     def __str__(self):
         return self.email
 
+class OwnedManyToManyDescriptor(ManyToManyDescriptor):
+    """M2M accessor whose managers store the owner on new links."""
+
+    @cached_property
+    def related_manager_cls(self):
+        manager_cls = super().related_manager_cls
+
+        class OwnedManyRelatedManager(manager_cls):
+            def add(self, *objs, through_defaults=None):
+                # Both ends of a link belong to the same user.
+                through_defaults = {
+                    'user_id': self.instance.user_id,
+                    **(through_defaults or {}),
+                }
+                super().add(*objs, through_defaults=through_defaults)
+            add.alters_data = True
+
+            def _owner_lookup(self, user_ids):
+                # Name the owner of the links so partitions can be pruned.
+                link = self.through._meta.get_field(self.target_field_name)
+                return {
+                    f'{link.related_query_name()}__user__in': sorted(user_ids)}
+
+            def _apply_rel_filters(self, queryset):
+                queryset = super()._apply_rel_filters(queryset)
+                if not partitioning.links_partitioned(
+                        connections[queryset.db]):
+                    return queryset
+                # The relation filter is sticky, so this one joins the same
+                # link rows rather than the link table a second time.
+                return queryset.filter(
+                    **self._owner_lookup([self.instance.user_id]))
+
+            def get_prefetch_queryset(self, instances, queryset=None):
+                if queryset is None:
+                    queryset = super(manager_cls, self).get_queryset()
+                queryset._add_hints(instance=instances[0])
+                queryset = queryset.using(queryset._db or self._db)
+                db = connections[queryset.db]
+                if not partitioning.links_partitioned(db):
+                    return super().get_prefetch_queryset(instances, queryset)
+
+                # As in Django's, but with the owner in the same filter as
+                # the relation, so both apply to one join of the link table.
+                queryset = queryset.filter(
+                    **{f'{self.query_field_name}__in': instances},
+                    **self._owner_lookup(
+                        {instance.user_id for instance in instances}))
+                fk = self.through._meta.get_field(self.source_field_name)
+                table = db.ops.quote_name(fk.model._meta.db_table)
+                queryset = queryset.extra(select={
+                    f'_prefetch_related_val_{f.attname}':
+                    f'{table}.{db.ops.quote_name(f.column)}'
+                    for f in fk.local_related_fields
+                })
+                return (
+                    queryset,
+                    lambda result: tuple(
+                        getattr(result, f'_prefetch_related_val_{f.attname}')
+                        for f in fk.local_related_fields
+                    ),
+                    lambda inst: tuple(
+                        f.get_db_prep_value(getattr(inst, f.attname), db)
+                        for f in fk.foreign_related_fields
+                    ),
+                    False,
+                    self.prefetch_cache_name,
+                    False,
+                )
+
+        return OwnedManyRelatedManager
+
+
+class OwnedManyToManyField(models.ManyToManyField):
+    """Many-to-many field between objects of one user.
+
+    The link table has a user_id column to be partitioned by, filled in by
+    add(), set() and create() from whichever side they are called on.
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name,
+                OwnedManyToManyDescriptor(self.remote_field, reverse=False))
+
+    def contribute_to_related_class(self, cls, related):
+        super().contribute_to_related_class(cls, related)
+        if not self.remote_field.is_hidden() and \
+                not related.related_model._meta.swapped:
+            setattr(cls, related.get_accessor_name(),
+                    OwnedManyToManyDescriptor(self.remote_field, reverse=True))
+
+
 class Recipe(models.Model):
     """Recipe model."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -63,36 +162,235 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     description = models.TextField(blank=True)
-    tags = models.ManyToManyField('Tag', blank=True)
-    ingredients = models.ManyToManyField('Ingredient', blank=True)
+    tags = OwnedManyToManyField('Tag', blank=True, through='RecipeTag')
+    ingredients = OwnedManyToManyField(
+        'Ingredient', blank=True, through='RecipeIngredient')
     link = models.CharField(max_length=255, blank=True)
     image = models.ImageField(null = True ,upload_to = recipe_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-time_minutes']
+        indexes = [
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_recipe_user_updated_idx'),
+        ]
 
 
 class Tag(models.Model):
     """Tag model for recipes."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_tag_user_updated_idx'),
+        ]
 
 class Ingredient(models.Model):
     """Ingredient model for recipes."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
     class Meta:
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_ingr_user_updated_idx'),
+        ]
+
+class RecipeTag(models.Model):
+    """Link between a recipe and a tag, stored with the recipe's owner."""
+    # Foreign keys to the recipe cannot be enforced once core_recipe is
+    # partitioned, as its IDs are then only unique together with user_id.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        db_constraint=False, db_index=False, related_name='+',
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, db_constraint=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recipe_tags'
+        unique_together = [('recipe', 'tag')]
+
+
+class RecipeIngredient(models.Model):
+    """Link between a recipe and an ingredient, stored with its owner."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        db_constraint=False, db_index=False, related_name='+',
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, db_constraint=False)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recipe_ingredients'
+        unique_together = [('recipe', 'ingredient')]
+
+
+class SlowQuery(models.Model):
+    """SQL statement that ran longer than the slow query threshold."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    duration_ms = models.FloatField()
+    alias = models.CharField(max_length=64)
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    route = models.CharField(max_length=255, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    plan = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.duration_ms:.1f} ms {self.sql[:80]}'
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'slow queries'
+
+
+class PurgeJob(models.Model):
+    """Background deletion of a user's data in bounded batches."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user_id = models.BigIntegerField(unique=True)
+    email = models.EmailField(max_length=225)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    phase = models.CharField(max_length=20, default='recipes')
+    recipes_deleted = models.PositiveBigIntegerField(default=0)
+    tags_deleted = models.PositiveBigIntegerField(default=0)
+    ingredients_deleted = models.PositiveBigIntegerField(default=0)
+    links_deleted = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.email} ({self.status})'
+
+    class Meta:
+        ordering = ['-id']
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a request made with an Idempotency-Key header."""
+    scope = models.CharField(max_length=64, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    content_type = models.CharField(max_length=100)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.scope
+
+
+class Tombstone(models.Model):
+    """Record of a deleted recipe, tag or ingredient for delta sync."""
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    TYPE_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.type} {self.object_id}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'],
+                         name='core_tomb_user_deleted_idx'),
+        ]
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's tags and ingredients."""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='signature', db_constraint=False,
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    signature = models.BinaryField()
+    bands = ArrayField(models.BigIntegerField())
+
+    def __str__(self):
+        return f'Signature of recipe {self.recipe_id}'
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['bands'], name='core_recipesig_bands_gin'),
+        ]
+
+
+class RecipeStats(models.Model):
+    """Running totals of a user's recipes, updated on every change."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+        related_name='recipe_stats',
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    time_histogram = models.JSONField(default=dict)
+    tag_counts = models.JSONField(default=dict)
+    ingredient_counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f'Recipe stats of user {self.user_id}'
+
+
+class RecipeDocument(models.Model):
+    """Pre-rendered JSON of a recipe as the detail and list APIs return it."""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='document', db_constraint=False,
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    version = models.PositiveSmallIntegerField()
+    detail = models.TextField()
+    summary = models.TextField()
+    rendered_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'Document of recipe {self.recipe_id}'
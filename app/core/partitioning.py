@@ -0,0 +1,393 @@
+"""
+Online hash partitioning of the recipe tables by user.
+
+``core_recipe`` and its tag and ingredient links are rebuilt as tables
+partitioned by ``hash(user_id)``, so all of a user's rows sit in one
+partition and queries filtering by user scan and maintain only its indexes.
+
+Tables that already hold data move without downtime, in steps that can be
+run hours apart:
+
+1. ``prepare`` creates a partitioned copy ``<table>_p`` of every table, with
+   the same columns, indexes and foreign keys, and a trigger mirroring each
+   write on the old table into the copy. Primary and unique keys gain
+   user_id, as PostgreSQL requires the partition key in them.
+2. ``backfill`` copies the rows that existed before the trigger, in short
+   batches that lock only the rows being copied, and resumes where it
+   stopped.
+3. ``swap`` briefly locks the tables, checks the copies are complete and
+   renames them into place. The old tables stay as ``<table>_old`` until
+   ``drop_old``.
+"""
+import re
+import time
+
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+# Partitioned tables, parents first so links can look up their owner.
+TABLES = ['core_recipe', 'core_recipe_tags', 'core_recipe_ingredients']
+# Owner of a row; links written before they had user_id take the recipe's.
+OWNERS = {
+    'core_recipe': '{row}.user_id',
+    'core_recipe_tags': (
+        'COALESCE({row}.user_id, '
+        '(SELECT user_id FROM core_recipe WHERE id = {row}.recipe_id))'),
+    'core_recipe_ingredients': (
+        'COALESCE({row}.user_id, '
+        '(SELECT user_id FROM core_recipe WHERE id = {row}.recipe_id))'),
+}
+PROGRESS_TABLE = 'core_partition_progress'
+DEFAULT_BATCH_SIZE = 5000
+# Seconds a process relies on knowing whether the tables are partitioned;
+# swap and migrate update it at once in their own process.
+CHECK_INTERVAL = 300
+
+COLUMNS_SQL = '''
+    SELECT attname FROM pg_attribute
+    WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+    ORDER BY attnum
+'''
+CONSTRAINTS_SQL = '''
+    SELECT c.contype, pg_get_constraintdef(c.oid), c.confrelid::regclass::text,
+        ARRAY(
+            SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY AS k(num, n)
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.num
+            ORDER BY k.n)
+    FROM pg_constraint c
+    WHERE c.conrelid = %s::regclass AND c.contype IN ('p', 'u', 'f')
+    ORDER BY c.contype, c.conname
+'''
+# Indexes that do not back a primary key or unique constraint.
+INDEXES_SQL = '''
+    SELECT i.relname, x.indisunique, pg_get_indexdef(x.indexrelid)
+    FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = %s::regclass AND NOT EXISTS (
+        SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    ORDER BY i.relname
+'''
+# Foreign keys from other tables to the ones being partitioned.
+REFERENCES_SQL = '''
+    SELECT conrelid::regclass::text, conname FROM pg_constraint
+    WHERE contype = 'f' AND confrelid = ANY(%(tables)s::regclass[])
+      AND conrelid <> ALL(%(tables)s::regclass[])
+'''
+TRIGGER_SQL = '''
+CREATE FUNCTION {function}() RETURNS trigger AS $$
+DECLARE
+    owner bigint;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        owner := {old_owner};
+        IF owner IS NULL THEN
+            DELETE FROM {copy} WHERE id = OLD.id;
+        ELSE
+            DELETE FROM {copy} WHERE user_id = owner AND id = OLD.id;
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO {copy} ({columns}) VALUES ({values})
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH ROW EXECUTE FUNCTION {function}();
+'''
+
+
+LINKS_PARTITIONED_SQL = '''
+    SELECT count(*) FROM pg_class WHERE relkind = 'p' AND oid IN (
+        SELECT to_regclass(name) FROM unnest(%s::text[]) AS t(name))
+'''
+
+
+# Time of the last check and its result, per database alias.
+_checked = {}
+
+
+class PartitioningError(Exception):
+    """Raised when a partitioning step cannot run in the current state."""
+
+
+def copy_table(table):
+    return f'{table}_p'
+
+
+def old_table(table):
+    return f'{table}_old'
+
+
+def _suffixed(name, suffix):
+    # Identifiers are truncated at 63 bytes.
+    return name[:63 - len(suffix)] + suffix
+
+
+def _function(table):
+    return f'{copy_table(table)}_sync'
+
+
+def _exists(cursor, name):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    return cursor.fetchone()[0]
+
+
+def is_partitioned(cursor, table):
+    """Return whether a table is already partitioned."""
+    cursor.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass",
+        [table])
+    return cursor.fetchone()[0]
+
+
+def check_partitioned(db):
+    """Look up and remember whether all the tables are partitioned."""
+    with db.cursor() as cursor:
+        cursor.execute(LINKS_PARTITIONED_SQL, [TABLES])
+        partitioned = cursor.fetchone()[0] == len(TABLES)
+    _checked[db.alias] = (time.monotonic(), partitioned)
+    return partitioned
+
+
+def links_partitioned(db=connection):
+    """Return whether queries on the database can prune partitions.
+
+    Link rows only all carry user_id once the tables were swapped, so
+    callers add it to their predicates only then. The answer is looked up
+    on first use and kept by the process for CHECK_INTERVAL seconds.
+    """
+    checked_at, partitioned = _checked.get(db.alias, (None, False))
+    if checked_at is None or time.monotonic() - checked_at >= CHECK_INTERVAL:
+        partitioned = check_partitioned(db)
+    return partitioned
+
+
+def owner_filter(db, link, owner):
+    """Return SQL restricting a link table alias to its owner, if useful."""
+    return f'AND {link}.user_id = {owner}' if links_partitioned(db) else ''
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.name == 'core':
+        check_partitioned(connections[using])
+
+
+def _columns(cursor, table):
+    cursor.execute(COLUMNS_SQL, [table])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_copy(cursor, table, partitions):
+    """Create the partitioned copy of a table with its keys and indexes."""
+    copy = copy_table(table)
+    cursor.execute(
+        f'CREATE TABLE {copy} '
+        f'(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        'PARTITION BY HASH (user_id)')
+    cursor.execute(f'ALTER TABLE {copy} ALTER COLUMN user_id SET NOT NULL')
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE {copy}{remainder} PARTITION OF {copy} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})')
+
+    cursor.execute(CONSTRAINTS_SQL, [table])
+    for kind, definition, referenced, columns in cursor.fetchall():
+        if kind == 'f':
+            # Recipe IDs are no longer unique on their own to refer to.
+            if referenced not in TABLES:
+                cursor.execute(f'ALTER TABLE {copy} ADD {definition}')
+            continue
+        if 'user_id' not in columns:
+            columns = ['user_id'] + columns
+        key = 'PRIMARY KEY' if kind == 'p' else 'UNIQUE'
+        cursor.execute(
+            f'ALTER TABLE {copy} ADD {key} ({", ".join(columns)})')
+
+    cursor.execute(INDEXES_SQL, [table])
+    for name, unique, definition in cursor.fetchall():
+        if unique:
+            raise PartitioningError(
+                f'Unique index {name} must be recreated with user_id first.')
+        cursor.execute(re.sub(
+            r'^CREATE INDEX \S+ ON \S+ ',
+            f'CREATE INDEX {_suffixed(name, "_p")} ON {copy} ', definition))
+
+
+def _create_trigger(cursor, table):
+    """Mirror every write on a table into its copy."""
+    columns = _columns(cursor, table)
+    values = [
+        OWNERS[table].format(row='NEW') if column == 'user_id'
+        else f'NEW.{column}'
+        for column in columns
+    ]
+    cursor.execute(TRIGGER_SQL.format(
+        function=_function(table), table=table, copy=copy_table(table),
+        columns=', '.join(columns), values=', '.join(values),
+        old_owner=OWNERS[table].format(row='OLD'),
+    ))
+
+
+def prepare(partitions):
+    """Create partitioned copies and start mirroring writes into them.
+
+    Rows up to the highest ID present once the trigger exists are left for
+    ``backfill``; later ones are mirrored by the trigger.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ('
+            'table_name text PRIMARY KEY, last_id bigint NOT NULL, '
+            'target_id bigint NOT NULL)')
+        prepared = []
+        for table in TABLES:
+            if is_partitioned(cursor, table) or \
+                    _exists(cursor, copy_table(table)):
+                continue
+            _create_copy(cursor, table, partitions)
+            _create_trigger(cursor, table)
+            cursor.execute(
+                f'INSERT INTO {PROGRESS_TABLE} '
+                f'SELECT %s, 0, COALESCE(max(id), 0) FROM {table}', [table])
+            prepared.append(table)
+        return prepared
+
+
+def backfill(table, batch_size=DEFAULT_BATCH_SIZE, pause=0, report=None):
+    """Copy the rows of a table that predate its trigger, batch by batch."""
+    copy = copy_table(table)
+    with connection.cursor() as cursor:
+        columns = _columns(cursor, table)
+    select = [
+        OWNERS[table].format(row='t') if column == 'user_id'
+        else f't.{column}'
+        for column in columns
+    ]
+    copied = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT last_id, target_id FROM {PROGRESS_TABLE} '
+                'WHERE table_name = %s FOR UPDATE', [table])
+            row = cursor.fetchone()
+            if row is None:
+                raise PartitioningError(f'{table} has not been prepared.')
+            last, target = row
+            # Locking the source rows keeps them from being deleted before
+            # their copy is committed, which the trigger could not undo.
+            cursor.execute(
+                f'SELECT id FROM {table} WHERE id > %s AND id <= %s '
+                'ORDER BY id LIMIT %s FOR KEY SHARE',
+                [last, target, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                cursor.execute(
+                    f'UPDATE {PROGRESS_TABLE} SET last_id = target_id '
+                    'WHERE table_name = %s', [table])
+                return copied
+            cursor.execute(
+                f'INSERT INTO {copy} ({", ".join(columns)}) '
+                f'SELECT {", ".join(select)} FROM {table} t '
+                'WHERE t.id = ANY(%s) ON CONFLICT DO NOTHING', [ids])
+            copied += cursor.rowcount
+            cursor.execute(
+                f'UPDATE {PROGRESS_TABLE} SET last_id = %s '
+                'WHERE table_name = %s', [ids[-1], table])
+        if report is not None:
+            report(table, ids[-1], target, copied)
+        if pause:
+            time.sleep(pause)
+
+
+def progress():
+    """Return (table, partitioned, last ID copied, target ID) per table."""
+    with connection.cursor() as cursor:
+        done = {}
+        if _exists(cursor, PROGRESS_TABLE):
+            cursor.execute(
+                f'SELECT table_name, last_id, target_id FROM {PROGRESS_TABLE}')
+            done = {row[0]: row[1:] for row in cursor.fetchall()}
+        return [
+            (table, is_partitioned(cursor, table), *done.get(table, (None, None)))
+            for table in TABLES
+        ]
+
+
+def _rename_indexes(cursor, table):
+    """Give the copy's indexes the names of the old table's."""
+    cursor.execute(INDEXES_SQL, [table])
+    for name, _, _ in cursor.fetchall():
+        cursor.execute(
+            f'ALTER INDEX {name} RENAME TO {_suffixed(name, "_old")}')
+        cursor.execute(
+            f'ALTER INDEX IF EXISTS {_suffixed(name, "_p")} RENAME TO {name}')
+
+
+def swap(lock_timeout='5s'):
+    """Replace the tables by their completed partitioned copies."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL lock_timeout = %s', [lock_timeout])
+        cursor.execute(
+            f'LOCK TABLE {", ".join(TABLES)} IN ACCESS EXCLUSIVE MODE')
+        if all(is_partitioned(cursor, table) for table in TABLES):
+            return []
+        done = {}
+        if _exists(cursor, PROGRESS_TABLE):
+            cursor.execute(
+                f'SELECT table_name, last_id >= target_id FROM {PROGRESS_TABLE}')
+            done = dict(cursor.fetchall())
+        pending = [table for table in TABLES if not done.get(table)]
+        if pending:
+            raise PartitioningError(
+                f'Backfill is not complete for {", ".join(pending)}.')
+
+        cursor.execute(REFERENCES_SQL, {'tables': TABLES})
+        for referencing, name in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {name}')
+        for table in TABLES:
+            cursor.execute(f'DROP TRIGGER {_function(table)} ON {table}')
+            cursor.execute(f'DROP FUNCTION {_function(table)}()')
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            _rename_indexes(cursor, table)
+            cursor.execute(
+                f'ALTER TABLE {table} RENAME TO {old_table(table)}')
+            cursor.execute(
+                f'ALTER TABLE {copy_table(table)} RENAME TO {table}')
+            # The sequence would otherwise be dropped with the old table.
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        cursor.execute(f'DROP TABLE {PROGRESS_TABLE}')
+        check_partitioned(connection)
+        return TABLES
+
+
+def drop_old():
+    """Drop the unpartitioned tables left behind by ``swap``."""
+    with connection.cursor() as cursor:
+        old = [old_table(t) for t in TABLES if _exists(cursor, old_table(t))]
+        if old:
+            cursor.execute(f'DROP TABLE {", ".join(old)}')
+        return old
+
+
+def partition_empty(partitions):
+    """Partition the tables in one go if none of them holds rows yet.
+
+    Returns whether the tables are partitioned afterwards.
+    """
+    with connection.cursor() as cursor:
+        if all(is_partitioned(cursor, table) for table in TABLES):
+            return True
+        for table in TABLES:
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {table})')
+            if cursor.fetchone()[0]:
+                return False
+    with transaction.atomic():
+        prepare(partitions)
+        swap()
+        drop_old()
+    return True
@@ -0,0 +1,155 @@
+"""
+Opt-in request profiling for staff users.
+
+Send ``X-Profile: 1`` or ``?profile=1`` to get a JSON summary instead of the
+normal body, or ``download`` to get the raw cProfile stats as a file.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+TOP_FUNCTIONS = 30
+
+# Phases are read from the cumulative time of the outermost matching call.
+# They may overlap: queries evaluated lazily while serializing count towards
+# both ``queryset`` and ``serializer``.
+PHASES = {
+    'auth': ('rest_framework/request.py', '_authenticate'),
+    'queryset': ('django/db/models/query.py', '_fetch_all'),
+    'serializer': ('rest_framework/serializers.py', 'data'),
+    'renderer': ('rest_framework/response.py', 'rendered_content'),
+}
+
+
+def sql_text(sql, cursor):
+    """Return a statement as str, whatever form it was executed in."""
+    if isinstance(sql, bytes):
+        return sql.decode()
+    if not isinstance(sql, str):
+        # psycopg2.sql objects render against psycopg2's own cursor.
+        return sql.as_string(getattr(cursor, 'cursor', cursor))
+    return sql
+
+
+class QueryTimeline:
+    """Execute wrapper keeping every statement with its offset and duration."""
+
+    def __init__(self, start):
+        self.start = start
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ended = time.perf_counter()
+            self.entries.append({
+                'alias': context['connection'].alias,
+                'sql': sql_text(sql, context['cursor']),
+                'start_ms': round((began - self.start) * 1000, 3),
+                'duration_ms': round((ended - began) * 1000, 3),
+            })
+
+
+def _requested_mode(request):
+    """Return the profiling mode asked for by the request, if any."""
+    return request.META.get(PROFILE_HEADER) or \
+        request.GET.get(PROFILE_PARAM)
+
+
+def _staff_user(request):
+    """Return the request user if it is staff, authenticating tokens early."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = result[0] if result else None
+    if user is not None and user.is_staff:
+        return user
+    return None
+
+
+def phase_timings(stats):
+    """Return per-phase timings in milliseconds from raw profiler stats."""
+    timings = {}
+    for phase, (path, func) in PHASES.items():
+        cumulative = [
+            ct for (filename, _, name), (_, _, _, ct, _) in stats.items()
+            if name == func and filename.endswith(path)
+        ]
+        timings[phase] = round(max(cumulative, default=0) * 1000, 3)
+    return timings
+
+
+def _top_functions(profiler):
+    """Return the most expensive functions as pstats text."""
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative') \
+        .print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """Run staff requests that ask for it under cProfile."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = _requested_mode(request)
+        if not mode or not getattr(settings, 'REQUEST_PROFILING', False) \
+                or _staff_user(request) is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        timeline = QueryTimeline(start)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timeline))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        profiler.create_stats()
+
+        if mode == 'download':
+            download = HttpResponse(
+                marshal.dumps(profiler.stats),
+                content_type='application/octet-stream',
+            )
+            download['Content-Disposition'] = \
+                'attachment; filename="request.prof"'
+            return download
+
+        return JsonResponse({
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 3),
+            'phases': phase_timings(profiler.stats),
+            'queries': {
+                'count': len(timeline.entries),
+                'total_ms': round(
+                    sum(e['duration_ms'] for e in timeline.entries), 3),
+                'timeline': timeline.entries,
+            },
+            'profile': _top_functions(profiler),
+        })
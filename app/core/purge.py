@@ -0,0 +1,121 @@
+"""
+Chunked, resumable deletion of a user's data.
+
+Rows are removed with set-based deletes of at most ``batch_size`` parents per
+transaction instead of Django's cascade collector, so no request loads a
+tenant into memory or holds locks for long. Progress is saved with every
+batch, so a job interrupted part way resumes where it stopped.
+"""
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.models import PurgeJob, User
+
+# Phase, parent table, counter field and the tables pointing at it.
+PHASES = [
+    ('recipes', 'core_recipe', 'recipes_deleted', [
+        ('core_recipe_tags', 'recipe_id'),
+        ('core_recipe_ingredients', 'recipe_id'),
+        ('core_recipesignature', 'recipe_id'),
+        ('core_recipedocument', 'recipe_id'),
+    ]),
+    ('tags', 'core_tag', 'tags_deleted', [
+        ('core_recipe_tags', 'tag_id'),
+    ]),
+    ('ingredients', 'core_ingredient', 'ingredients_deleted', [
+        ('core_recipe_ingredients', 'ingredient_id'),
+    ]),
+]
+USER_PHASE = 'user'
+DEFAULT_BATCH_SIZE = 1000
+# Running jobs not updated for this long are assumed to have lost their worker.
+STALE_AFTER = timedelta(minutes=5)
+
+
+def enqueue_purge(user):
+    """Deactivate a user and schedule its data for deletion."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        job, _ = PurgeJob.objects.get_or_create(
+            user_id=user.id, defaults={'email': user.email})
+    return job
+
+
+def claim_job():
+    """Mark the oldest pending or abandoned job as running and return it."""
+    stale = timezone.now() - STALE_AFTER
+    with transaction.atomic():
+        job = PurgeJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=PurgeJob.PENDING) |
+            Q(status=PurgeJob.RUNNING, updated_at__lt=stale)
+        ).order_by('id').first()
+        if job is not None:
+            job.status = PurgeJob.RUNNING
+            job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _delete_batch(cursor, table, links, user_id, batch_size):
+    """Delete up to batch_size rows of a user and their links."""
+    cursor.execute(
+        f'SELECT id FROM {table} WHERE user_id = %s '
+        'ORDER BY id LIMIT %s FOR UPDATE',
+        [user_id, batch_size],
+    )
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return 0, 0
+
+    links_deleted = 0
+    for link_table, column in links:
+        cursor.execute(
+            f'DELETE FROM {link_table} WHERE {column} = ANY(%s)', [ids])
+        links_deleted += cursor.rowcount
+    cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', [ids])
+    return cursor.rowcount, links_deleted
+
+
+def run_batch(job, batch_size=DEFAULT_BATCH_SIZE):
+    """Run one batch of a job and advance its phase when it runs dry."""
+    phases = [phase[0] for phase in PHASES]
+    with transaction.atomic():
+        if job.phase == USER_PHASE:
+            User.objects.filter(id=job.user_id).delete()
+            job.status = PurgeJob.DONE
+        else:
+            _, table, field, links = PHASES[phases.index(job.phase)]
+            with connection.cursor() as cursor:
+                rows, links_deleted = _delete_batch(
+                    cursor, table, links, job.user_id, batch_size)
+            setattr(job, field, getattr(job, field) + rows)
+            job.links_deleted += links_deleted
+            if rows < batch_size:
+                position = phases.index(job.phase) + 1
+                job.phase = phases[position] \
+                    if position < len(phases) else USER_PHASE
+        job.save()
+
+
+def run_job(job, batch_size=DEFAULT_BATCH_SIZE, pause=0, report=None):
+    """Run a claimed job to completion, recording any failure on it."""
+    try:
+        while job.status != PurgeJob.DONE:
+            run_batch(job, batch_size)
+            if report is not None:
+                report(job)
+            if pause:
+                time.sleep(pause)
+    except Exception as error:
+        job.status = PurgeJob.FAILED
+        job.error = str(error)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    return job
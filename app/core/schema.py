@@ -0,0 +1,160 @@
+"""
+OpenAPI schema generated once per code version and served from memory.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+FORMATS = {
+    'yaml': 'application/vnd.oai.openapi',
+    'json': 'application/vnd.oai.openapi+json',
+}
+
+_lock = threading.Lock()
+_cache = {}
+
+
+class Rendered(NamedTuple):
+    """One encoding of the schema, ready to be written to a response."""
+    content: bytes
+    gzipped: bytes
+    etag: str
+
+
+@lru_cache(maxsize=None)
+def _source_digest():
+    """Hash the project's Python sources, standing in for a release tag."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(settings.BASE_DIR):
+        # Sorting in place makes the walk itself visit directories in order.
+        dirs.sort()
+        files.sort()
+        for name in files:
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(path.encode())
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def code_version():
+    """Return the version of the code the schema is generated from."""
+    return settings.CODE_VERSION or _source_digest()
+
+
+def generate():
+    """Introspect the API and return the schema as a dict."""
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def write(path):
+    """Generate the schema and store it with the current code version."""
+    with open(path, 'w') as output:
+        json.dump({'version': code_version(), 'schema': generate()}, output)
+
+
+def _read(path, version):
+    """Return the schema stored at path if it was made from this version."""
+    try:
+        with open(path) as stored:
+            data = json.load(stored)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != version:
+        logger.info('Ignoring schema in %s generated from version %s.',
+                    path, data.get('version'))
+        return None
+    return data['schema']
+
+
+def _render(schema):
+    from drf_spectacular.renderers import (
+        OpenApiJsonRenderer,
+        OpenApiYamlRenderer,
+    )
+
+    rendered = {}
+    for fmt, renderer in (('yaml', OpenApiYamlRenderer()),
+                          ('json', OpenApiJsonRenderer())):
+        content = renderer.render(schema, renderer_context={})
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        rendered[fmt] = Rendered(
+            content, gzip.compress(content, mtime=0), f'"{fmt}-{digest}"')
+    return rendered
+
+
+def load():
+    """Return the rendered schema for the running code version.
+
+    The schema is read from SCHEMA_FILE when generate_schema stored it for
+    this version, otherwise generated; either way only once per process.
+    """
+    version = code_version()
+    rendered = _cache.get(version)
+    if rendered is not None:
+        return rendered
+    with _lock:
+        if version not in _cache:
+            schema = None
+            if settings.SCHEMA_FILE:
+                schema = _read(settings.SCHEMA_FILE, version)
+            if schema is None:
+                schema = generate()
+            _cache.clear()
+            _cache[version] = _render(schema)
+        return _cache[version]
+
+
+def clear():
+    """Forget the rendered schema so the next request loads it again."""
+    with _lock:
+        _cache.clear()
+
+
+def _format(request):
+    fmt = request.GET.get('format')
+    if fmt in FORMATS:
+        return fmt
+    if 'json' in request.META.get('HTTP_ACCEPT', ''):
+        return 'json'
+    return 'yaml'
+
+
+@require_safe
+def schema_view(request):
+    """Serve the cached schema, honouring If-None-Match and gzip."""
+    fmt = _format(request)
+    rendered = load()[fmt]
+    compress = ACCEPTS_GZIP.search(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    etag = rendered.etag[:-1] + '-gzip"' if compress else rendered.etag
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    elif compress:
+        response = HttpResponse(rendered.gzipped, content_type=FORMATS[fmt])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(rendered.content, content_type=FORMATS[fmt])
+    response['ETag'] = etag
+    response['Vary'] = 'Accept, Accept-Encoding'
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
@@ -0,0 +1,129 @@
+"""
+Slow query log with sampled EXPLAIN plans.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+
+from core.metrics import route_name
+from core.profiling import sql_text
+from core.models import SlowQuery
+
+EXPLAIN_PREFIX = 'EXPLAIN (ANALYZE, BUFFERS) '
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryRecorder:
+    """Execute wrapper remembering statements over the threshold."""
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.entries.append((
+                    context['connection'].alias,
+                    sql_text(sql, context['cursor']), params, many,
+                    duration_ms,
+                ))
+
+
+def _explainable(sql, many):
+    """Only plain reads are safe to execute a second time."""
+    statement = sql.lstrip().upper()
+    return not many and statement.startswith('SELECT') and \
+        'FOR UPDATE' not in statement
+
+
+def explain(alias, sql, params):
+    """Return the EXPLAIN ANALYZE plan of a read as text.
+
+    ANALYZE executes the statement again, so anything but a plain read is
+    refused, and the work is rolled back regardless.
+    """
+    if not _explainable(sql, False):
+        return ''
+    try:
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute(EXPLAIN_PREFIX + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True, using=alias)
+            return plan
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+
+def record(entries, route='', user=None):
+    """Store slow queries, explain a sample, and trim the log.
+
+    Failures are logged rather than raised, so they never fail the request
+    the queries came from.
+    """
+    try:
+        _record(entries, route, user)
+    except DatabaseError:
+        logger.exception('Could not record %d slow queries.', len(entries))
+
+
+def _record(entries, route, user):
+    rate = getattr(settings, 'SLOW_QUERY_EXPLAIN_RATE', 0.1)
+    rows = []
+    for alias, sql, params, many, duration_ms in entries:
+        plan = ''
+        if _explainable(sql, many) and random.random() < rate:
+            plan = explain(alias, sql, params)
+        rows.append(SlowQuery(
+            alias=alias,
+            sql=sql,
+            params=repr(params) if params else '',
+            duration_ms=duration_ms,
+            route=route,
+            user=user,
+            plan=plan,
+        ))
+    created = SlowQuery.objects.bulk_create(rows)
+
+    size = getattr(settings, 'SLOW_QUERY_LOG_SIZE', 1000)
+    newest = max(row.id for row in created)
+    SlowQuery.objects.filter(id__lte=newest - size).delete()
+
+
+class SlowQueryMiddleware:
+    """Log statements slower than SLOW_QUERY_THRESHOLD_MS per request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        if threshold is None:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(threshold)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        if recorder.entries:
+            user = getattr(request, 'user', None)
+            record(
+                recorder.entries,
+                route=route_name(request),
+                user=user if user is not None and user.is_authenticated
+                else None,
+            )
+        return response
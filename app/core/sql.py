@@ -0,0 +1,15 @@
+"""
+Helpers for raw SQL run through Django's database cursors.
+"""
+
+
+def execute_values(cursor, sql, rows, template):
+    """Insert many rows with one ``VALUES %s`` statement.
+
+    psycopg2's own execute_values sends bytes through Django's execute
+    wrappers, which expect str, and splits the rows into pages of 100.
+    """
+    values = ','.join(cursor.mogrify(template, row).decode() for row in rows)
+    # Without parameters the statement is sent as is, so a % in the values
+    # needs no escaping.
+    cursor.execute(sql.replace('%s', values, 1))
@@ -0,0 +1,85 @@
+"""
+Helpers for pinning query and allocation budgets on API endpoints.
+"""
+import re
+import tracemalloc
+from collections import Counter
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+SIZES = (1, 100, 1000)
+# Allowance for noise in peak allocations that does not scale with rows.
+ALLOCATION_SLACK = 256 * 1024
+
+
+def normalise(sql):
+    """Strip literals so repeated statements compare equal."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\((?:\s*\?\s*,)*\s*\?\s*\)', '(...)', sql)
+
+
+def query_diff(small, large):
+    """Describe statements that ran more often in the larger run."""
+    before, after = Counter(map(normalise, small)), Counter(map(normalise, large))
+    lines = []
+    for sql, count in after.most_common():
+        if count > before[sql]:
+            lines.append(f'  {before[sql]:>5} -> {count:<5} {sql}')
+    return '\n'.join(lines) or '  (no repeated statements)'
+
+
+def measure(func):
+    """Run func and return its response, SQL statements and peak bytes."""
+    with CaptureQueriesContext(connection) as captured:
+        tracemalloc.start()
+        try:
+            response = func()
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return response, [q['sql'] for q in captured.captured_queries], peak
+
+
+class BudgetMixin:
+    """Assert an endpoint stays within its budgets as related rows grow.
+
+    ``setup(size)`` creates the data for one run and returns a callable making
+    the request. Every size runs inside a savepoint that is rolled back.
+    """
+    sizes = SIZES
+
+    def _run(self, setup, size):
+        sid = transaction.savepoint()
+        try:
+            return measure(setup(size))
+        finally:
+            transaction.savepoint_rollback(sid)
+
+    def assertWithinBudget(self, setup, max_queries, kib_per_row):
+        """Check query count and allocation growth at each size."""
+        self._run(setup, self.sizes[0])
+        runs = {size: self._run(setup, size) for size in self.sizes}
+
+        smallest = self.sizes[0]
+        _, base_queries, base_peak = runs[smallest]
+        for size, (response, queries, peak) in runs.items():
+            self.assertLess(
+                response.status_code, 400,
+                f'{size} rows: unexpected status {response.status_code}')
+            if len(queries) > max_queries:
+                self.fail(
+                    f'{size} rows: {len(queries)} queries, budget is '
+                    f'{max_queries}. Statements compared with {smallest} '
+                    f'row(s):\n{query_diff(base_queries, queries)}'
+                )
+            allowed = base_peak + ALLOCATION_SLACK + \
+                kib_per_row * 1024 * (size - smallest)
+            if peak > allowed:
+                self.fail(
+                    f'{size} rows: peak allocation {peak // 1024} KiB, '
+                    f'budget is {allowed // 1024} KiB '
+                    f'({kib_per_row} KiB per row over {base_peak // 1024} '
+                    f'KiB at {smallest} row(s)).'
+                )
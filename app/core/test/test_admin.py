@@ -1,10 +1,19 @@
 """
 Tests for the admin panel.
 """
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client as client
+
+from core.admin import EstimatedCountPaginator
+from core.models import Ingredient, Recipe, Tag
+
+
 class UserAdminTests(TestCase):
     """Tests for the custom UserAdmin."""
 
@@ -31,3 +40,115 @@ class UserAdminTests(TestCase):
 
         self.assertContains(res, self.user.email)
         self.assertContains(res, self.user.name)
+
+
+class ScalableAdminTests(TestCase):
+    """Tests for the recipe, tag and ingredient admin pages."""
+
+    def setUp(self):
+        self.client = client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+
+    def create_recipe(self, **params):
+        defaults = {'title': 'Soup', 'time_minutes': 5,
+                    'price': Decimal('1.00')}
+        defaults.update(params)
+        return Recipe.objects.create(user=self.user, **defaults)
+
+    def test_changelists_listed(self):
+        """Test the changelists list rows with their owners."""
+        self.create_recipe(title='Lentil soup')
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        for name, text in [('recipe', 'Lentil soup'), ('tag', 'Vegan'),
+                           ('ingredient', 'Salt')]:
+            res = self.client.get(reverse(f'admin:core_{name}_changelist'))
+            self.assertContains(res, text)
+            self.assertContains(res, self.user.email)
+
+    def test_search_ignores_case_and_accents(self):
+        """Test search matches names as the name indexes compare them."""
+        Tag.objects.create(user=self.user, name='Crème brûlée')
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(
+            reverse('admin:core_tag_changelist'), {'q': 'CREME'})
+
+        self.assertContains(res, 'Crème brûlée')
+        self.assertNotContains(res, 'Vegan')
+
+    def test_count_estimated_for_large_tables(self):
+        """Test counts come from the table statistics above the limit."""
+        for _ in range(3):
+            self.create_recipe()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe')
+
+        queryset = Recipe.objects.order_by('id')
+        with self.settings(ADMIN_EXACT_COUNT_LIMIT=0):
+            with self.assertNumQueries(1):
+                count = EstimatedCountPaginator(queryset, 100).count
+        self.assertEqual(count, 3)
+
+    def test_tags_autocomplete(self):
+        """Test the recipe form looks tags up through autocomplete."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        form = self.client.get(reverse('admin:core_recipe_add'))
+        res = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'veg', 'app_label': 'core', 'model_name': 'recipe',
+            'field_name': 'tags'})
+
+        self.assertContains(form, 'admin-autocomplete')
+        self.assertContains(form, 'name="tags"')
+        self.assertEqual(res.json()['results'],
+                         [{'id': str(tag.id), 'text': 'Vegan'}])
+
+    def test_delete_recipes_action(self):
+        """Test selected recipes are deleted with their links."""
+        recipe = self.create_recipe()
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        kept = self.create_recipe()
+
+        self.client.post(reverse('admin:core_recipe_changelist'), {
+            'action': 'delete_recipes', '_selected_action': [recipe.id]})
+
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_delete_selected_names(self):
+        """Test deleting selected tags unlinks them in one statement."""
+        recipe = self.create_recipe()
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ['Vegan', 'Quick', 'Cheap']]
+        recipe.tags.add(*tags)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:core_tag_changelist'), {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [tag.id for tag in tags[:2]]})
+
+        self.assertEqual(list(Tag.objects.all()), [tags[2]])
+        self.assertEqual(list(recipe.tags.all()), [tags[2]])
+        self.assertEqual(sum(
+            'DELETE FROM core_recipe_tags' in q['sql']
+            for q in queries.captured_queries), 1)
+
+    def test_merge_duplicates_action(self):
+        """Test merging duplicates of the selected tags' owners."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name=' vegan  ')
+
+        self.client.post(reverse('admin:core_tag_changelist'), {
+            'action': 'merge_duplicates', '_selected_action': [tag.id]})
+
+        self.assertEqual(list(Tag.objects.all()), [tag])
@@ -0,0 +1,101 @@
+"""
+Tests for the batch API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse('batch')
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+class BatchAPITests(TestCase):
+    """Test running several requests in one batch."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_auth_required(self):
+        """Test auth is required for batches."""
+        res = APIClient().post(BATCH_URL, {'requests': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_screen_load(self):
+        """Test reads are dispatched as the batch user, in order."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=5,
+                              price=Decimal('2.50'))
+
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'path': RECIPES_URL},
+            {'path': TAGS_URL},
+            {'path': ME_URL},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes, tags, me = res.data['responses']
+        self.assertEqual(recipes['status'], 200)
+        self.assertEqual(recipes['body'][0]['title'], 'Soup')
+        self.assertEqual(tags['body'][0]['name'], 'Vegan')
+        self.assertEqual(me['body']['email'], self.user.email)
+
+    def test_write_with_body(self):
+        """Test sub-requests can write with a JSON body."""
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Quick'}},
+            {'path': TAGS_URL},
+        ]}, format='json')
+
+        created, listed = res.data['responses']
+        self.assertEqual(created['status'], 201)
+        self.assertEqual([t['name'] for t in listed['body']], ['Quick'])
+        self.assertTrue(Tag.objects.filter(user=self.user, name='Quick')
+                        .exists())
+
+    def test_sub_request_errors_are_per_item(self):
+        """Test a failing sub-request does not fail the batch."""
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {}},
+            {'path': '/api/unknown/'},
+            {'path': reverse('admin:index')},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data['responses']],
+                         [400, 404, 404])
+
+    def test_parallel_reads(self):
+        """Test reads may run in parallel and keep their order."""
+        res = self.client.post(BATCH_URL, {'parallel': True, 'requests': [
+            {'path': ME_URL},
+            {'path': ME_URL},
+        ]}, format='json')
+
+        self.assertEqual([r['body']['name'] for r in res.data['responses']],
+                         ['Test Name', 'Test Name'])
+
+    def test_too_many_requests(self):
+        """Test batches above the limit are rejected."""
+        with self.settings(BATCH_MAX_REQUESTS=1):
+            res = self.client.post(BATCH_URL, {'requests': [
+                {'path': TAGS_URL},
+                {'path': TAGS_URL},
+            ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,54 @@
+"""
+Tests for the deployment system checks.
+"""
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from core.checks import check_shared_cache
+
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': 'memcached:11211',
+    },
+}
+
+
+@override_settings(REQUIRE_SHARED_CACHE=True, DATABASE_REPLICAS=['replica'])
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_local_cache_refused(self):
+        """Test a per-process cache is an error when workers share state"""
+        errors = check_shared_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIn('pinning', errors[0].msg)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_shared_cache_accepted(self):
+        """Test a cache shared by all workers passes the check"""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES=LOCAL_CACHE, REQUIRE_SHARED_CACHE=False)
+    def test_local_cache_allowed_when_not_required(self):
+        """Test the check is skipped while developing"""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES=LOCAL_CACHE, DATABASE_REPLICAS=[])
+    def test_throttling_needs_shared_cache(self):
+        """Test rate limits alone require a shared cache"""
+        errors = check_shared_cache(None)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn('rate limits', errors[0].msg)
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_matching_index_needs_shared_cache(self):
+        """Test the matching index is named among shared cache users"""
+        errors = check_shared_cache(None)
+
+        self.assertIn('matching index', errors[0].msg)
@@ -1,9 +1,17 @@
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 from django.db.utils import OperationalError
 from django.core.management import call_command
-from django.test import SimpleTestCase
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from core import models
+from core.management.commands import benchmark
 
 
 @patch('core.management.commands.db_wait.Command.check')
@@ -27,4 +35,171 @@ class CommandTests(SimpleTestCase):
         call_command('db_wait')
 
         self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
\ No newline at end of file
+        patched_check.assert_called_with(databases=['default'])
+
+class SeedDataTests(TestCase):
+    '''Test the synthetic dataset generator.'''
+
+    def _snapshot(self):
+        return [
+            (recipe.title, recipe.price,
+             sorted(tag.name for tag in recipe.tags.all()))
+            for recipe in models.Recipe.objects.order_by('id')
+            .prefetch_related('tags')
+        ]
+
+    def test_seed_data_creates_rows(self):
+        """Test users, recipes and links are created for each user."""
+        call_command('seed_data', users=3, recipes_per_user=10,
+                     tags_per_user=5, ingredients_per_user=8, seed=1,
+                     stdout=StringIO())
+
+        self.assertEqual(models.User.objects.count(), 3)
+        self.assertEqual(models.Tag.objects.count(), 15)
+        self.assertGreater(models.Recipe.objects.count(), 0)
+        for recipe in models.Recipe.objects.prefetch_related('tags'):
+            for tag in recipe.tags.all():
+                self.assertEqual(tag.user_id, recipe.user_id)
+
+    def test_seed_data_deterministic(self):
+        """Test the same seed produces the same data."""
+        options = {'users': 2, 'recipes_per_user': 5, 'seed': 7,
+                   'batch_size': 3, 'stdout': StringIO()}
+        call_command('seed_data', **options)
+        first = self._snapshot()
+        models.User.objects.all().delete()
+
+        call_command('seed_data', **options)
+
+        self.assertEqual(self._snapshot(), first)
+
+    def test_seed_data_twice_fails(self):
+        """Test loading the same seed twice is refused."""
+        call_command('seed_data', users=1, recipes_per_user=1, seed=3,
+                     stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, recipes_per_user=1, seed=3,
+                         stdout=StringIO())
+
+
+class BenchmarkTests(TestCase):
+    '''Test the API benchmark harness.'''
+
+    def test_benchmark_writes_results(self):
+        """Test a run reports every endpoint in the mix."""
+        call_command('seed_data', users=2, recipes_per_user=5, seed=1,
+                     stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark', seed=1, requests=12, warmup=0,
+                         concurrency=1, host='testserver',
+                         mix=benchmark.parse_mix('recipe-list=1,me=1,token=1'),
+                         output=output.name, stdout=StringIO())
+            result = json.load(output)
+
+        self.assertEqual(
+            set(result['endpoints']), {'recipe-list', 'me', 'token'})
+        self.assertEqual(result['total']['requests'], 12)
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertGreater(
+            result['endpoints']['recipe-list']['queries_per_request'], 0)
+
+    def test_benchmark_requires_seed(self):
+        """Test the benchmark refuses to run without seeded users."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark', seed=99, stdout=StringIO())
+
+    def test_compare_detects_regressions(self):
+        """Test slower p95 and extra queries are reported."""
+        def result(p95, queries, throughput):
+            stats = {'p95_ms': p95, 'queries_per_request': queries,
+                     'throughput': throughput}
+            return {'endpoints': {'me': stats}, 'total': stats}
+
+        self.assertEqual(
+            benchmark.compare(result(10, 2, 100), result(10, 2, 100)), [])
+        regressions = benchmark.compare(result(20, 3, 50), result(10, 2, 100))
+        self.assertEqual(len(regressions), 3)
+
+    def test_middleware_benchmark_reports_saving(self):
+        """Test the middleware benchmark times both stacks."""
+        out = StringIO()
+
+        call_command('benchmark_middleware', requests=5, rounds=1,
+                     host='testserver', stdout=out)
+
+        self.assertIn('stock', out.getvalue())
+        self.assertIn('The lean stack saves', out.getvalue())
+
+
+class DumpRestoreTests(TestCase):
+    '''Test dumping and restoring recipe data with COPY.'''
+
+    def setUp(self):
+        self.user = models.User.objects.create_user(
+            email='tenant@example.com', password='testpass123', name='Tenant')
+        other = models.User.objects.create_user(
+            email='other@example.com', password='testpass123')
+        tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = models.Ingredient.objects.create(
+            user=self.user, name='Tofu')
+        recipe = models.Recipe.objects.create(
+            user=self.user, title='Tofu Bowl', time_minutes=15,
+            price=Decimal('7.50'), description='')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        models.Recipe.objects.create(
+            user=other, title='Other', time_minutes=5, price=Decimal('1.00'))
+        self.archive = tempfile.NamedTemporaryFile(suffix='.zip')
+        self.addCleanup(self.archive.close)
+
+    def _dump(self):
+        call_command('dump_recipe_data', self.archive.name,
+                     'tenant@example.com', stdout=StringIO())
+
+    def test_dump_and_restore(self):
+        """Test a dumped user is restored with new IDs and links."""
+        self._dump()
+        old_recipe_id = models.Recipe.objects.get(title='Tofu Bowl').id
+        self.user.delete()
+
+        call_command('restore_recipe_data', self.archive.name,
+                     stdout=StringIO())
+
+        user = models.User.objects.get(email='tenant@example.com')
+        self.assertTrue(user.check_password('testpass123'))
+        self.assertFalse(user.is_staff or user.is_superuser)
+        recipe = models.Recipe.objects.get(user=user)
+        self.assertNotEqual(recipe.id, old_recipe_id)
+        self.assertEqual(recipe.price, Decimal('7.50'))
+        self.assertEqual(recipe.description, '')
+        self.assertFalse(recipe.image)
+        self.assertEqual([t.name for t in recipe.tags.all()], ['Vegan'])
+        self.assertEqual(recipe.tags.get().user, user)
+        self.assertEqual(
+            [i.name for i in recipe.ingredients.all()], ['Tofu'])
+        self.assertEqual(models.Recipe.objects.count(), 2)
+
+    def test_restore_existing_user_refused(self):
+        """Test restoring over an existing user needs --reuse-users."""
+        self._dump()
+
+        with self.assertRaises(CommandError):
+            call_command('restore_recipe_data', self.archive.name,
+                         stdout=StringIO())
+
+    def test_restore_into_existing_user(self):
+        """Test data can be restored into a user with the same email."""
+        self._dump()
+
+        call_command('restore_recipe_data', self.archive.name,
+                     reuse_users=True, stdout=StringIO())
+
+        self.assertEqual(
+            models.Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_dump_unknown_user(self):
+        """Test dumping a user that does not exist fails."""
+        with self.assertRaises(CommandError):
+            call_command('dump_recipe_data', self.archive.name,
+                         'missing@example.com', stdout=StringIO())
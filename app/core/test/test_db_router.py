@@ -0,0 +1,192 @@
+"""
+Tests for the read replica database router.
+"""
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, OperationalError
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TransactionTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import db_router
+from core.models import Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+@patch('core.db_router.ReplicaPool._check', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test read routing decisions."""
+
+    def setUp(self):
+        db_router.pool.reset()
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = db_router.ReplicaRouter()
+        self.seen = []
+
+    def _view(self, request):
+        self.seen.append(self.router.db_for_read(Tag))
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def _call(self, request):
+        middleware = db_router.ReplicaRoutingMiddleware(self._view)
+        return middleware(request)
+
+    def test_reads_outside_request_use_primary(self, patched_check):
+        """Test reads use the primary when no request enabled replicas."""
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_writes_use_primary(self, patched_check):
+        """Test writes always go to the primary."""
+        self.assertEqual(self.router.db_for_write(Tag), 'default')
+
+    def test_safe_requests_round_robin(self, patched_check):
+        """Test safe requests alternate between healthy replicas."""
+        self._call(self.factory.get('/'))
+        self._call(self.factory.get('/'))
+
+        self.assertEqual(sorted(self.seen), ['replica_a', 'replica_b'])
+
+    def test_unsafe_request_uses_primary(self, patched_check):
+        """Test reads during a write request use the primary."""
+        self._call(self.factory.post('/'))
+
+        self.assertEqual(self.seen, ['default'])
+
+    def test_pinned_after_write(self, patched_check):
+        """Test a client reads from the primary right after writing."""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        self._call(self.factory.post('/', **auth))
+        self._call(self.factory.get('/', **auth))
+        self._call(self.factory.get('/', HTTP_AUTHORIZATION='Token other'))
+
+        self.assertEqual(self.seen[1], 'default')
+        self.assertNotEqual(self.seen[2], 'default')
+
+    def test_read_only_post_uses_replica(self, patched_check):
+        """Test a POST that only reads uses a replica and does not pin."""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        def view(request):
+            db_router.read_only(request)
+            return self._view(request)
+
+        db_router.ReplicaRoutingMiddleware(view)(
+            self.factory.post('/', **auth))
+        self._call(self.factory.get('/', **auth))
+
+        self.assertNotIn('default', self.seen)
+
+    def test_unhealthy_replicas_fall_back(self, patched_check):
+        """Test reads fall back to the primary when replicas are down."""
+        patched_check.return_value = False
+        self._call(self.factory.get('/'))
+
+        self.assertEqual(self.seen, ['default'])
+
+    def test_unhealthy_replica_skipped(self, patched_check):
+        """Test a replica marked unhealthy leaves the rotation."""
+        db_router.pool.mark_unhealthy('replica_a')
+        self._call(self.factory.get('/'))
+        self._call(self.factory.get('/'))
+
+        self.assertEqual(self.seen, ['replica_b', 'replica_b'])
+
+    def test_use_primary_context(self, patched_check):
+        """Test use_primary forces reads onto the primary."""
+        def view(request):
+            with db_router.use_primary():
+                self.seen.append(self.router.db_for_read(Tag))
+            return HttpResponse()
+
+        db_router.ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+
+        self.assertEqual(self.seen, ['default'])
+
+    def test_replica_error_retried_on_primary(self, patched_check):
+        """Test a read failing on a replica is served from the primary."""
+        middleware = None
+
+        def view(request):
+            alias = self.router.db_for_read(Tag)
+            self.seen.append(alias)
+            if alias != 'default':
+                middleware.process_exception(
+                    request, OperationalError('replica went away'))
+                return HttpResponse(status=500)
+            return HttpResponse()
+
+        middleware = db_router.ReplicaRoutingMiddleware(view)
+        res = middleware(self.factory.get('/'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(self.seen), 2)
+        self.assertEqual(self.seen[1], 'default')
+        self.assertFalse(db_router.pool.is_healthy(self.seen[0]))
+
+    def test_unsafe_request_not_retried(self, patched_check):
+        """Test a read only POST failing on a replica is not dispatched
+        again, as its body has been consumed."""
+        middleware = None
+
+        def view(request):
+            db_router.read_only(request)
+            alias = self.router.db_for_read(Tag)
+            self.seen.append(alias)
+            middleware.process_exception(
+                request, OperationalError('replica went away'))
+            return HttpResponse(status=500)
+
+        middleware = db_router.ReplicaRoutingMiddleware(view)
+        res = middleware(self.factory.post('/'))
+
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(len(self.seen), 1)
+        self.assertFalse(db_router.pool.is_healthy(self.seen[0]))
+
+    def test_migrations_skip_replicas(self, patched_check):
+        """Test migrations are never applied to a replica."""
+        self.assertFalse(self.router.allow_migrate('replica_a', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'No read replicas configured.')
+@override_settings(DATABASE_REPLICAS=settings.DATABASE_REPLICAS[:1])
+class ReplicaIntegrationTests(TransactionTestCase):
+    """Test API reads against a primary and a mirrored replica.
+
+    Reads inside a transaction stay on the primary, so these tests commit.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        db_router.pool.reset()
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_reads_from_replica(self):
+        """Test the tag list is served from the replica."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as captured:
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]['name'], 'Vegan')
+        self.assertTrue(any(
+            'core_tag' in query['sql'] for query in captured.captured_queries))
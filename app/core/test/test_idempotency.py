@@ -0,0 +1,117 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import IdempotencyKey, Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+CREATE_USER_URL = reverse('user:create')
+
+
+class IdempotencyTests(TestCase):
+    """Test retried POST requests are replayed, not repeated."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+            'tags': [{'name': 'Dinner'}],
+        }
+
+    def _post(self, payload, key='key-1'):
+        return self.client.post(
+            RECIPES_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_response(self):
+        """Test a retry returns the stored response without a new recipe."""
+        first = self._post(self.payload)
+        second = self._post(self.payload)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second['Allow'], first['Allow'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_different_keys_create_twice(self):
+        """Test requests with different keys are both processed."""
+        self._post(self.payload, key='key-1')
+        self._post(self.payload, key='key-2')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Test reusing a key with a different body is rejected."""
+        self._post(self.payload)
+        res = self._post({**self.payload, 'title': 'Stew'})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_expired_key_runs_again(self):
+        """Test a key past its TTL is processed as a new request."""
+        self._post(self.payload)
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+
+        res = self._post(self.payload)
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_user_create_replayed(self):
+        """Test retried sign ups do not fail on the duplicate email."""
+        client = APIClient()
+        payload = {'email': 'new@example.com', 'password': 'testpass',
+                   'name': 'New'}
+
+        first = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='k')
+        second = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='k')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+
+    def test_anonymous_clients_kept_apart(self):
+        """Test anonymous callers from other addresses do not share keys."""
+        client = APIClient()
+        payload = {'email': 'new@example.com', 'password': 'testpass',
+                   'name': 'New'}
+
+        client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='k',
+                    REMOTE_ADDR='10.0.0.1')
+        res = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='k',
+                          REMOTE_ADDR='10.0.0.2')
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clear_expired_keys(self):
+        """Test the cleanup command removes only expired keys."""
+        self._post(self.payload, key='old')
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+        self._post(self.payload, key='new')
+
+        call_command('clear_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
@@ -0,0 +1,52 @@
+"""
+Tests for the lean API middleware stack.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+ME_URL = reverse('user:me')
+
+
+class LeanMiddlewareTests(TestCase):
+    """Test API routes skip the browser middleware and the admin does not."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+
+    def test_api_skips_browser_middleware(self):
+        """Test token requests get no session, CSRF or frame handling."""
+        token = Token.objects.create(user=self.user)
+
+        res = self.client.get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['email'], self.user.email)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+        self.assertNotIn('X-Frame-Options', res)
+
+    def test_admin_keeps_full_stack(self):
+        """Test admin pages still use sessions and frame protection."""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123')
+        self.client.force_login(admin)
+
+        res = self.client.get(reverse('admin:index'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.wsgi_request.user, admin)
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+
+    def test_api_docs_keep_frame_protection(self):
+        """Test the HTML API docs are not served without X-Frame-Options."""
+        for url in [reverse('swagger-ui'), reverse('redoc')]:
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res['X-Frame-Options'], 'DENY')
@@ -0,0 +1,91 @@
+"""
+Tests for the request metrics middleware.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core.models import Tag
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample(name, **labels):
+    """Return the current value of a metric sample."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test metrics are recorded per route and exposed."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_counted_by_route(self):
+        """Test a request increments the counter for its route name."""
+        labels = {'route': 'recipe:tag-list', 'method': 'GET', 'status': '200'}
+        before = sample('http_requests_total', **labels)
+
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(sample('http_requests_total', **labels), before + 1)
+
+    def test_queries_recorded(self):
+        """Test SQL queries issued by a view are counted."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        before = sample('http_request_db_queries_sum', route='recipe:tag-list')
+
+        self.client.get(TAGS_URL)
+
+        after = sample('http_request_db_queries_sum', route='recipe:tag-list')
+        self.assertGreaterEqual(after - before, 1)
+
+    def test_unmatched_route(self):
+        """Test unresolved paths share a single label."""
+        labels = {'route': '<unmatched>', 'method': 'GET', 'status': '404'}
+        before = sample('http_requests_total', **labels)
+
+        self.client.get('/does-not-exist/')
+
+        self.assertEqual(sample('http_requests_total', **labels), before + 1)
+
+    def test_metrics_endpoint(self):
+        """Test the metrics endpoint returns the Prometheus text format."""
+        self.client.get(TAGS_URL)
+        staff = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123')
+        self.client.force_login(staff)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds_bucket', res.content)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_endpoint_denied_by_default(self):
+        """Test metrics are not open to anyone without a token."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        self.client.force_login(self.user)
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        """Test a configured token is required to scrape metrics."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
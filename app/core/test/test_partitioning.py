@@ -0,0 +1,120 @@
+"""
+Tests for partitioning the recipe tables by user.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import partitioning
+from core.models import Recipe, Tag, Ingredient, User
+from recipe import bulk
+
+
+def partition_of(table, **filters):
+    """Return the partition number holding the matching rows of a table."""
+    where = ' AND '.join(f'{column} = %s' for column in filters)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT tableoid::regclass::text FROM {table} '
+            f'WHERE {where}', list(filters.values()))
+        names = [row[0] for row in cursor.fetchall()]
+    return [name.rsplit('_p', 1)[1] for name in names]
+
+
+class PartitioningTests(TestCase):
+    """Test recipes and their links are partitioned by user."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com', password='testpass123')
+
+    def create_recipe(self, user):
+        return Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('1.00'))
+
+    def test_new_database_partitioned(self):
+        """Test migrating an empty database partitions the tables."""
+        with connection.cursor() as cursor:
+            for table in partitioning.TABLES:
+                self.assertTrue(partitioning.is_partitioned(cursor, table))
+
+    def test_links_stored_with_owner(self):
+        """Test links added from either side carry the recipe's owner."""
+        recipe = self.create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        recipe.tags.add(tag)
+        salt.recipe_set.add(recipe)
+        recipe.tags.create(user=self.user, name='Vegan')
+
+        self.assertEqual(
+            set(Recipe.tags.through.objects.values_list('user_id', flat=True)),
+            {self.user.id})
+        self.assertEqual(
+            Recipe.ingredients.through.objects.get().user_id, self.user.id)
+
+    def test_user_rows_share_a_partition(self):
+        """Test a user's recipes and links live in matching partitions."""
+        for index in range(10):
+            user = User.objects.create_user(
+                email=f'user{index}@example.com', password='testpass123')
+            recipe = self.create_recipe(user)
+            recipe.tags.add(Tag.objects.create(user=user, name='Quick'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=user, name='Salt'))
+
+            partitions = partition_of('core_recipe', user_id=user.id)
+            self.assertEqual(len(partitions), 1)
+            self.assertEqual(
+                partition_of('core_recipe_tags', user_id=user.id), partitions)
+            self.assertEqual(
+                partition_of('core_recipe_ingredients', user_id=user.id),
+                partitions)
+
+    def test_link_reads_name_the_owner(self):
+        """Test link reads filter by user once the tables are partitioned."""
+        recipe = self.create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Quick'))
+
+        with CaptureQueriesContext(connection) as queries:
+            recipes = list(Recipe.objects.prefetch_related('tags'))
+            tags = list(recipe.tags.all())
+
+        self.assertTrue(partitioning.links_partitioned(connection))
+        self.assertEqual([t.name for t in recipes[0].tags.all()], ['Quick'])
+        self.assertEqual([t.name for t in tags], ['Quick'])
+        for query in queries.captured_queries[1:]:
+            self.assertIn('"core_recipe_tags"."user_id" IN', query['sql'])
+            self.assertEqual(query['sql'].count('JOIN "core_recipe_tags"'), 1)
+
+    def test_bulk_delete_names_the_owner(self):
+        """Test deleting recipes removes their links by owner."""
+        recipe = self.create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Quick'))
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = bulk.delete_recipes(Recipe.objects.filter(id=recipe.id))
+
+        self.assertEqual(counts['links_deleted'], 1)
+        deletes = [q['sql'] for q in queries.captured_queries
+                   if q['sql'].startswith('DELETE FROM core_recipe_')]
+        self.assertEqual(len(deletes), 2)
+        for sql in deletes:
+            self.assertIn('user_id = ANY', sql)
+
+    def test_steps_skip_partitioned_tables(self):
+        """Test the command leaves already partitioned tables alone."""
+        out = StringIO()
+
+        call_command('partition_recipe_tables', 'prepare', stdout=out)
+        call_command('partition_recipe_tables', 'swap', stdout=out)
+        call_command('partition_recipe_tables', 'status', stdout=out)
+
+        self.assertIn('Prepared 0 table(s)', out.getvalue())
+        self.assertIn('already partitioned', out.getvalue())
+        self.assertIn('core_recipe: partitioned', out.getvalue())
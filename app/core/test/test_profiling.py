@@ -0,0 +1,101 @@
+"""
+Tests for the staff request profiling middleware.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+from psycopg2 import sql
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.profiling import phase_timings, sql_text
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_client(**params):
+    """Create a user and return a client authenticated with its token."""
+    user = get_user_model().objects.create_user(
+        password='testpass123', **params)
+    Recipe.objects.create(
+        user=user, title='Soup', time_minutes=10, price='5.00')
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client
+
+
+@override_settings(REQUEST_PROFILING=True)
+class ProfilingTests(TestCase):
+    """Test profiling is limited to staff and reports phases."""
+
+    def test_staff_receives_summary(self):
+        """Test a staff user gets a profile summary instead of the body."""
+        client = create_client(email='staff@example.com', is_staff=True)
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        summary = res.json()
+        self.assertEqual(summary['status'], 200)
+        self.assertEqual(
+            set(summary['phases']),
+            {'auth', 'queryset', 'serializer', 'renderer'},
+        )
+        self.assertGreater(summary['queries']['count'], 0)
+        self.assertIn('sql', summary['queries']['timeline'][0])
+
+    def test_query_param_download(self):
+        """Test the raw profile can be downloaded."""
+        client = create_client(email='staff@example.com', is_staff=True)
+
+        res = client.get(RECIPES_URL, {'profile': 'download'})
+
+        self.assertEqual(res['Content-Type'], 'application/octet-stream')
+        self.assertIn('attachment', res['Content-Disposition'])
+
+    def test_non_staff_ignored(self):
+        """Test profiling requests from regular users return the body."""
+        client = create_client(email='user@example.com')
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]['title'], 'Soup')
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled_by_setting(self):
+        """Test staff get the body when profiling is switched off."""
+        client = create_client(email='staff@example.com', is_staff=True)
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()[0]['title'], 'Soup')
+
+    def test_phase_timings_use_outermost_call(self):
+        """Test nested calls of a phase function are not summed."""
+        stats = {
+            ('/x/rest_framework/serializers.py', 1, 'data'):
+                (1, 1, 0.001, 0.004, {}),
+            ('/x/rest_framework/serializers.py', 2, 'data'):
+                (1, 1, 0.001, 0.003, {}),
+        }
+
+        timings = phase_timings(stats)
+
+        self.assertEqual(timings['serializer'], 4.0)
+        self.assertEqual(timings['auth'], 0)
+
+    def test_sql_text_from_any_form(self):
+        """Test bytes and composed statements are recorded as str."""
+        with connection.cursor() as cursor:
+            composed = sql.SQL('SELECT {}').format(sql.Identifier('id'))
+
+            self.assertEqual(sql_text(b'SELECT 1', cursor), 'SELECT 1')
+            self.assertEqual(sql_text(composed, cursor), 'SELECT "id"')
+            self.assertEqual(sql_text('SELECT 1', cursor), 'SELECT 1')
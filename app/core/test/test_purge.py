@@ -0,0 +1,86 @@
+"""
+Tests for chunked user purges.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+
+from core import purge
+from core.models import Recipe, Tag, Ingredient, PurgeJob, User
+
+
+class PurgeTests(TestCase):
+    """Test users' data is deleted in batches."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='gone@example.com', password='testpass123')
+        self.other = User.objects.create_user(
+            email='stays@example.com', password='testpass123')
+        tags = Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {i}') for i in range(5))
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        for i in range(7):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'))
+            recipe.tags.add(*tags)
+            recipe.ingredients.add(ingredient)
+        Recipe.objects.create(
+            user=self.other, title='Kept', time_minutes=5,
+            price=Decimal('1.00'))
+        Token.objects.create(user=self.user)
+
+    def test_enqueue_deactivates_user(self):
+        """Test queuing a purge deactivates the user and drops its token."""
+        job = purge.enqueue_purge(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(job.status, PurgeJob.PENDING)
+
+    def test_run_job_in_batches(self):
+        """Test a job deletes everything over several batches."""
+        purge.enqueue_purge(self.user)
+        job = purge.claim_job()
+        phases = []
+
+        purge.run_job(job, batch_size=3, report=lambda j: phases.append(j.phase))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PurgeJob.DONE)
+        self.assertEqual(job.recipes_deleted, 7)
+        self.assertEqual(job.tags_deleted, 5)
+        self.assertEqual(job.ingredients_deleted, 1)
+        self.assertEqual(job.links_deleted, 7 * 5 + 7)
+        self.assertGreater(phases.count('recipes'), 1)
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertEqual(list(Recipe.objects.values_list('title', flat=True)),
+                         ['Kept'])
+
+    def test_job_resumes(self):
+        """Test a partly run job continues from its saved progress."""
+        purge.enqueue_purge(self.user)
+        job = purge.claim_job()
+        purge.run_batch(job, batch_size=3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 4)
+
+        job = PurgeJob.objects.get(id=job.id)
+        purge.run_job(job, batch_size=3)
+
+        job.refresh_from_db()
+        self.assertEqual(job.recipes_deleted, 7)
+        self.assertEqual(job.status, PurgeJob.DONE)
+
+    def test_purge_command(self):
+        """Test the command queues and processes a purge."""
+        call_command('purge_users', email=['gone@example.com'],
+                     batch_size=2, stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertTrue(User.objects.filter(id=self.other.id).exists())
@@ -0,0 +1,85 @@
+"""
+Tests for the cached OpenAPI schema.
+"""
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('schema')
+
+
+@override_settings(CODE_VERSION='v1', SCHEMA_FILE=None)
+class SchemaTests(TestCase):
+    """Test the schema is generated once and served from memory."""
+
+    def setUp(self):
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_generated_once(self):
+        """Test repeated requests reuse the rendered schema."""
+        with patch('core.schema.generate', wraps=schema.generate) as generate:
+            first = self.client.get(SCHEMA_URL)
+            second = self.client.get(
+                SCHEMA_URL, HTTP_ACCEPT='application/json')
+
+        generate.assert_called_once()
+        self.assertEqual(first['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn(b'openapi:', first.content)
+        self.assertIn('paths', json.loads(second.content))
+
+    def test_new_version_regenerates(self):
+        """Test a change of code version generates the schema again."""
+        with patch('core.schema.generate', wraps=schema.generate) as generate:
+            self.client.get(SCHEMA_URL)
+            with self.settings(CODE_VERSION='v2'):
+                self.client.get(SCHEMA_URL)
+
+        self.assertEqual(generate.call_count, 2)
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets an empty 304."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_gzip(self):
+        """Test clients accepting gzip get the precompressed schema."""
+        plain = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res['ETag'], plain['ETag'])
+
+    def test_stored_schema_used_for_its_version(self):
+        """Test the command's file is served only while the version matches."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            call_command('generate_schema', file=path, stdout=StringIO())
+
+            with self.settings(SCHEMA_FILE=path), \
+                    patch('core.schema.generate') as generate:
+                res = self.client.get(SCHEMA_URL, {'format': 'json'})
+            generate.assert_not_called()
+            self.assertIn('paths', json.loads(res.content))
+
+            schema.clear()
+            with self.settings(SCHEMA_FILE=path, CODE_VERSION='v2'), \
+                    patch('core.schema.generate', return_value={}) as generate:
+                self.client.get(SCHEMA_URL)
+            generate.assert_called_once()
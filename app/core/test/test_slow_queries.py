@@ -0,0 +1,115 @@
+"""
+Tests for the slow query log.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, OperationalError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import SlowQuery
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class SlowQueryLogTests(TestCase):
+    """Test slow statements are captured with context."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_queries_logged_with_plan(self):
+        """Test queries over the threshold are stored with route and user."""
+        self.client.get(TAGS_URL)
+
+        logged = SlowQuery.objects.filter(route='recipe:tag-list')
+        self.assertTrue(logged.exists())
+        self.assertTrue(all(q.user == self.user for q in logged))
+        tag_query = logged.filter(sql__contains='core_tag').first()
+        self.assertIn('Buffers', tag_query.plan)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60000)
+    def test_fast_queries_ignored(self):
+        """Test queries under the threshold are not stored."""
+        self.client.get(TAGS_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_writes_not_explained(self):
+        """Test statements that modify data are never re-executed."""
+        slow_queries.record([
+            ('default', 'UPDATE core_tag SET name = %s', ('x',), False, 5.0),
+        ])
+
+        self.assertEqual(SlowQuery.objects.get().plan, '')
+
+    @override_settings(SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_bytes_statements_stored_as_text(self):
+        """Test statements executed as bytes are logged and explained."""
+        recorder = slow_queries.SlowQueryRecorder(0)
+        with connection.execute_wrapper(recorder):
+            with connection.cursor() as cursor:
+                cursor.execute(b'SELECT 1')
+
+        slow_queries.record(recorder.entries)
+
+        logged = SlowQuery.objects.get()
+        self.assertEqual(logged.sql, 'SELECT 1')
+        self.assertIn('Result', logged.plan)
+
+    def test_explain_refuses_writes(self):
+        """Test explain never re-executes a statement that is not a read."""
+        plan = slow_queries.explain(
+            'default', 'DELETE FROM core_tag WHERE id = %s', (1,))
+
+        self.assertEqual(plan, '')
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_record_failure_keeps_response(self):
+        """Test a failure to store the log does not fail the request."""
+        with patch('core.models.SlowQuery.objects.bulk_create',
+                   side_effect=OperationalError('connection lost')), \
+                self.assertLogs('core.slow_queries', 'ERROR'):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=2, SLOW_QUERY_EXPLAIN_RATE=0)
+    def test_log_is_bounded(self):
+        """Test the oldest entries are dropped past the log size."""
+        for i in range(4):
+            slow_queries.record([
+                ('default', f'SELECT {i}', None, False, 5.0),
+            ])
+
+        self.assertEqual(
+            list(SlowQuery.objects.values_list('sql', flat=True)),
+            ['SELECT 3', 'SELECT 2'],
+        )
+
+    def test_admin_lists_slow_queries(self):
+        """Test the slow query log is viewable in the admin."""
+        slow_queries.record([('default', 'SELECT 1', None, False, 5.0)])
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(admin_user)
+
+        res = self.client.get(reverse('admin:core_slowquery_changelist'))
+
+        self.assertContains(res, 'SELECT 1')
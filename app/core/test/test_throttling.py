@@ -0,0 +1,154 @@
+"""
+Tests for token bucket throttling and load shedding.
+"""
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import throttling
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test the cache backed token bucket."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_up_to_capacity(self):
+        """Test a full bucket allows capacity requests, then waits."""
+        results = [throttling.consume('b', 3, 1.0, now=1000)[0]
+                   for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(throttling.consume('b', 3, 1.0, now=1000)[1], 1.0)
+
+    def test_refill(self):
+        """Test tokens come back at the refill rate."""
+        for _ in range(3):
+            throttling.consume('b', 3, 1.0, now=1000)
+
+        self.assertTrue(throttling.consume('b', 3, 1.0, now=1001)[0])
+        self.assertFalse(throttling.consume('b', 3, 1.0, now=1001)[0])
+
+    def test_idle_bucket_capped(self):
+        """Test a long idle period does not bank more than capacity."""
+        throttling.consume('b', 3, 1.0, now=1000)
+
+        results = [throttling.consume('b', 3, 1.0, now=5000)[0]
+                   for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_idle_bucket_interleaved(self):
+        """Test consumers racing after an idle period are not overcharged."""
+        throttling.consume('b', 5, 1.0, now=1000)
+        barrier = threading.Barrier(3, timeout=5)
+
+        class InterleavedCache:
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+            def incr(self, key, delta=1):
+                # Every consumer takes its token before any corrects the
+                # overflow.
+                spent = cache.incr(key, delta)
+                barrier.wait()
+                return spent
+
+        results = []
+        with mock.patch.object(throttling, 'cache', InterleavedCache()):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    throttling.consume('b', 5, 1.0, now=5000)[0]))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        remaining = [throttling.consume('b', 5, 1.0, now=5000)[0]
+                     for _ in range(6)].count(True)
+
+        self.assertEqual(results, [True, True, True])
+        self.assertGreaterEqual(remaining, 2)
+        self.assertLess(remaining, 5)
+
+    def test_parse_rate(self):
+        """Test DRF style rates are parsed."""
+        self.assertEqual(throttling.parse_rate('100/min'), (100, 60))
+        self.assertEqual(throttling.parse_rate('5/s'), (5, 1))
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'user': '2/min', 'anon': '2/min'},
+})
+class ThrottleAPITests(TestCase):
+    """Test throttling is applied per user and per route."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_throttled_with_retry_after(self):
+        """Test requests past the bucket get 429 with Retry-After."""
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    def test_buckets_per_route(self):
+        """Test each route has its own bucket."""
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class LoadSheddingTests(SimpleTestCase):
+    """Test in-flight requests are capped."""
+
+    @override_settings(LOAD_SHED_MAX_CONCURRENCY=1, LOAD_SHED_QUEUE_TIMEOUT=0)
+    def test_sheds_when_full(self):
+        """Test a request that cannot get a slot gets a fast 503."""
+        middleware = throttling.LoadSheddingMiddleware(
+            lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+
+        self.assertEqual(middleware(request).status_code, 200)
+        middleware.slots.acquire()
+        res = middleware(request)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
+
+    @override_settings(LOAD_SHED_MAX_CONCURRENCY=None)
+    def test_disabled(self):
+        """Test requests pass straight through when no cap is set."""
+        middleware = throttling.LoadSheddingMiddleware(
+            lambda request: HttpResponse())
+
+        self.assertEqual(middleware(RequestFactory().get('/')).status_code, 200)
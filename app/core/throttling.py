@@ -0,0 +1,125 @@
+"""
+Token bucket throttling and load shedding.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Idle buckets expire from the cache after at least this many seconds.
+MIN_BUCKET_TTL = 3600
+
+
+def parse_rate(rate):
+    """Parse 'requests/period' into (capacity, seconds per period)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def consume(key, capacity, refill_rate, now=None):
+    """Take one token from a bucket using atomic cache increments.
+
+    The key holds the number of tokens spent, measured against the tokens
+    earned since the epoch (``refill_rate * now``), so no read-modify-write
+    is needed. After an idle period the count is reset to a full bucket
+    less this request; requests racing that reset may go uncharged, but
+    the bucket is never charged more than was spent. Returns whether a
+    token was available, and if not, how many seconds until one is.
+    """
+    now = time.time() if now is None else now
+    earned = int(refill_rate * now)
+    timeout = max(MIN_BUCKET_TTL, int(10 * capacity / refill_rate))
+
+    # A new bucket starts full: spent == earned leaves capacity tokens.
+    cache.add(key, earned, timeout)
+    try:
+        spent = cache.incr(key)
+    except ValueError:
+        cache.add(key, earned + 1, timeout)
+        spent = earned + 1
+
+    available = capacity + earned - spent
+    if available < 0:
+        cache.decr(key)
+        return False, (-available) / refill_rate
+    if spent <= earned:
+        # The bucket overflowed while idle; drop tokens above capacity.
+        # Concurrent requests see the same overflow, so set rather than add
+        # the correction, or each of them would apply it in full.
+        cache.set(key, earned + 1, timeout)
+    return True, None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-user, per-route token bucket backed by the Django cache.
+
+    Rates come from ``DEFAULT_THROTTLE_RATES``: the view's ``throttle_scope``
+    if it has one, otherwise ``user`` or ``anon``. 'N/period' allows bursts
+    of N requests, refilled evenly over the period.
+    """
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'user' if request.user and request.user.is_authenticated \
+            else 'anon'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        match = request.resolver_match
+        route = match.view_name if match else request.path
+        key = f'throttle:{scope}:{route}:{ident}'
+
+        allowed, self._wait = consume(key, capacity, capacity / period)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class LoadSheddingMiddleware:
+    """Cap in-flight requests per process and shed load past a deadline.
+
+    Requests wait up to LOAD_SHED_QUEUE_TIMEOUT seconds for one of
+    LOAD_SHED_MAX_CONCURRENCY slots, then get a fast 503 with Retry-After.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = getattr(settings, 'LOAD_SHED_MAX_CONCURRENCY', None)
+        self.timeout = getattr(settings, 'LOAD_SHED_QUEUE_TIMEOUT', 1.0)
+        self.retry_after = getattr(settings, 'LOAD_SHED_RETRY_AFTER', 1)
+        self.slots = threading.BoundedSemaphore(self.limit) \
+            if self.limit else None
+
+    def __call__(self, request):
+        if self.slots is None:
+            return self.get_response(request)
+        if not self.slots.acquire(timeout=self.timeout):
+            response = JsonResponse(
+                {'detail': 'Server is overloaded, retry later.'}, status=503)
+            response['Retry-After'] = str(self.retry_after)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
@@ -0,0 +1,73 @@
+'''
+Prefix and typo-tolerant autocomplete for tag and ingredient names.
+
+Names are compared through ``core_normalize_name`` (lower case, accents
+removed), which backs a ``text_pattern_ops`` index on (user, name) for
+prefix matches and a ``pg_trgm`` GIN index for fuzzy matches. Prefix
+matches come first, ranked by how many recipes use the name; fuzzy matches
+only fill the remaining slots. pg_trgm's default word similarity cutoff of
+0.6 misses common typos such as 'mozarela', so fuzzy matching runs with
+AUTOCOMPLETE_SIMILARITY instead, which the GIN index serves all the same.
+'''
+from django.conf import settings
+from django.db import connection, transaction
+
+from recipe.bulk import LINK_TABLES
+
+# Relation name and the table holding its names.
+NAME_TABLES = {
+    'tags': 'core_tag',
+    'ingredients': 'core_ingredient',
+}
+
+PREFIX_SQL = '''
+    SELECT o.id, o.name, count(l.recipe_id) AS uses
+    FROM {table} o LEFT JOIN {link_table} l ON l.{column} = o.id
+    WHERE o.user_id = %(user)s
+      AND core_normalize_name(o.name) LIKE
+          core_normalize_name(%(pattern)s) || '%%'
+    GROUP BY o.id
+    ORDER BY uses DESC, o.name
+    LIMIT %(limit)s
+'''
+THRESHOLD_SQL = '''
+    SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)
+'''
+FUZZY_SQL = '''
+    SELECT o.id, o.name, count(l.recipe_id) AS uses
+    FROM {table} o LEFT JOIN {link_table} l ON l.{column} = o.id
+    WHERE o.user_id = %(user)s
+      AND core_normalize_name(%(term)s) <%% core_normalize_name(o.name)
+      AND NOT core_normalize_name(o.name) LIKE
+          core_normalize_name(%(pattern)s) || '%%'
+    GROUP BY o.id
+    ORDER BY word_similarity(
+        core_normalize_name(%(term)s), core_normalize_name(o.name)) DESC,
+        uses DESC, o.name
+    LIMIT %(limit)s
+'''
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def suggest(user, relation, term, limit):
+    '''Return up to limit (id, name, uses) suggestions for a typed term.'''
+    link_table, column = LINK_TABLES[relation]
+    names = {'table': NAME_TABLES[relation], 'link_table': link_table,
+             'column': column}
+    params = {'user': user.id, 'term': term, 'pattern': _escape_like(term),
+              'limit': limit}
+    with connection.cursor() as cursor:
+        cursor.execute(PREFIX_SQL.format(**names), params)
+        results = cursor.fetchall()
+        if len(results) < limit:
+            params['limit'] = limit - len(results)
+            # The threshold is set for this transaction only.
+            with transaction.atomic():
+                cursor.execute(
+                    THRESHOLD_SQL, [str(settings.AUTOCOMPLETE_SIMILARITY)])
+                cursor.execute(FUZZY_SQL.format(**names), params)
+                results += cursor.fetchall()
+    return results
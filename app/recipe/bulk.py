@@ -0,0 +1,167 @@
+'''
+Set-based bulk operations on many recipes at once.
+'''
+from django.db import connection, transaction
+
+from core import partitioning
+from recipe import documents, similarity, stats
+
+# Tables keyed by recipe that are not links, removed along with recipes.
+RECIPE_TABLES = ['core_recipesignature', 'core_recipedocument']
+# Relation name, M2M table and the column pointing at the related object.
+LINK_TABLES = {
+    'tags': ('core_recipe_tags', 'tag_id'),
+    'ingredients': ('core_recipe_ingredients', 'ingredient_id'),
+}
+
+UNLINK_SQL = '''
+    WITH gone AS (
+        SELECT * FROM unnest(%(ids)s::bigint[], %(users)s::bigint[])
+            AS g(id, user_id)
+    ), links AS (
+        DELETE FROM {table} l USING gone g
+        WHERE l.{column} = g.id {owner}
+        RETURNING l.recipe_id
+    ), documents AS (
+        DELETE FROM core_recipedocument
+        WHERE recipe_id IN (SELECT recipe_id FROM links)
+    ), touched AS (
+        UPDATE core_recipe SET updated_at = clock_timestamp()
+        WHERE id IN (SELECT recipe_id FROM links)
+    ), counted AS (
+        UPDATE core_recipestats s SET {counts} = s.{counts} - k.keys
+        FROM (
+            SELECT user_id, array_agg(id::text) AS keys
+            FROM gone GROUP BY user_id
+        ) AS k
+        WHERE s.user_id = k.user_id
+    )
+    SELECT DISTINCT recipe_id FROM links
+'''
+
+
+def _lock(recipes):
+    '''Lock the recipes of a queryset and return their (id, user_id).'''
+    # Filters on M2M fields make the queryset DISTINCT, which cannot be
+    # combined with FOR UPDATE, so lock through a subquery instead.
+    return list(
+        recipes.model.objects.filter(id__in=recipes.values('id'))
+        .order_by('id').select_for_update()
+        .values_list('id', 'user_id')
+    )
+
+
+def _lock_ids(recipes):
+    '''Lock the recipes of a queryset and return their IDs.'''
+    return [pk for pk, _ in _lock(recipes)]
+
+
+def delete_recipes(recipes):
+    '''Delete recipes and their links with one statement per table.'''
+    counts = {'deleted': 0, 'links_deleted': 0}
+    with transaction.atomic(), connection.cursor() as cursor:
+        locked = _lock(recipes)
+        if not locked:
+            return counts
+        ids = [pk for pk, _ in locked]
+        stats.remove_recipes(cursor, ids)
+        # Naming the owners lets the deletes skip other users' partitions.
+        owner = ''
+        params = [ids]
+        if partitioning.links_partitioned(cursor.db):
+            owner = 'AND user_id = ANY(%s)'
+            params.append(sorted({user_id for _, user_id in locked}))
+        for table, _ in LINK_TABLES.values():
+            cursor.execute(
+                f'DELETE FROM {table} WHERE recipe_id = ANY(%s) {owner}',
+                params)
+            counts['links_deleted'] += cursor.rowcount
+        for table in RECIPE_TABLES:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE recipe_id = ANY(%s)', [ids])
+        cursor.execute(
+            'INSERT INTO core_tombstone (user_id, type, object_id, deleted_at) '
+            "SELECT user_id, 'recipe', id, clock_timestamp() FROM core_recipe "
+            'WHERE id = ANY(%s)',
+            [ids],
+        )
+        cursor.execute('DELETE FROM core_recipe WHERE id = ANY(%s)', [ids])
+        counts['deleted'] = cursor.rowcount
+    return counts
+
+
+def _touch(cursor, ids):
+    '''Mark recipes as changed for delta sync, similarity and documents.'''
+    cursor.execute(
+        'UPDATE core_recipe SET updated_at = clock_timestamp() '
+        'WHERE id = ANY(%s)', [ids])
+    similarity.schedule(ids)
+    documents.invalidate(ids)
+
+
+def attach(recipes, relation, related_ids):
+    '''Link every recipe to every related object, skipping existing links.'''
+    table, column = LINK_TABLES[relation]
+    with transaction.atomic(), connection.cursor() as cursor:
+        ids = _lock_ids(recipes)
+        if not ids or not related_ids:
+            return 0
+        cursor.execute(
+            f'INSERT INTO {table} (recipe_id, {column}, user_id) '
+            'SELECT r.id, o.id, r.user_id FROM core_recipe r '
+            'CROSS JOIN unnest(%s::bigint[]) AS o(id) '
+            f'WHERE r.id = ANY(%s) ON CONFLICT DO NOTHING RETURNING {column}',
+            [list(related_ids), ids],
+        )
+        keys = [row[0] for row in cursor.fetchall()]
+        if keys:
+            _touch(cursor, ids)
+            stats.change_link_keys(cursor, relation, ids[0], keys, 1)
+        return len(keys)
+
+
+def detach(recipes, relation, related_ids):
+    '''Remove links between the recipes and the related objects.'''
+    table, column = LINK_TABLES[relation]
+    with transaction.atomic(), connection.cursor() as cursor:
+        ids = _lock_ids(recipes)
+        if not ids or not related_ids:
+            return 0
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE recipe_id = ANY(%s) AND {column} = ANY(%s) '
+            f'RETURNING {column}',
+            [ids, list(related_ids)],
+        )
+        keys = [row[0] for row in cursor.fetchall()]
+        if keys:
+            _touch(cursor, ids)
+            stats.change_link_keys(cursor, relation, ids[0], keys, -1)
+        return len(keys)
+
+
+def unlink(relation, related_id, user_id):
+    '''Remove every link to a tag or ingredient about to be deleted.
+
+    The documents of the affected recipes are dropped, their updated_at
+    bumped and the object's count removed from the owner's stats in the same
+    statement; returns the IDs of those recipes.
+    '''
+    return unlink_many(relation, [(related_id, user_id)])
+
+
+def unlink_many(relation, objects):
+    '''Unlink many tags or ingredients, given as (id, user_id), at once.'''
+    table, column = LINK_TABLES[relation]
+    objects = list(objects)
+    if not objects:
+        return []
+    with connection.cursor() as cursor:
+        sql = UNLINK_SQL.format(
+            table=table, column=column, counts=stats.COUNT_COLUMNS[relation],
+            owner=partitioning.owner_filter(cursor.db, 'l', 'g.user_id'))
+        cursor.execute(sql, {
+            'ids': [pk for pk, _ in objects],
+            'users': [user_id for _, user_id in objects],
+        })
+        return [row[0] for row in cursor.fetchall()]
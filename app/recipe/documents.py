@@ -0,0 +1,188 @@
+'''
+Pre-rendered recipe documents.
+
+The detail and list JSON of every recipe is rendered once and stored in
+``core_recipedocument``, so reads return the stored bytes instead of
+loading tags and ingredients and running the serializers each time.
+
+New recipes are rendered after commit. Other writes only delete the
+documents they affect in their own transaction, however many recipes that
+is; a read that finds no document renders and stores it, but never
+overwrites one, so it cannot replace a fresh document with what it loaded
+before a concurrent write. ``check_recipe_documents`` finds and repairs
+documents that drifted from the recipe tables, batch by batch.
+'''
+import json
+
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.models import Recipe, RecipeDocument
+from core.sql import execute_values
+from recipe import bulk
+
+# Bump when the serializers change to re-render every stored document.
+VERSION = 1
+
+# Position of each document in a rendered row.
+FIELDS = {'detail': 3, 'summary': 4}
+
+STORE_SQL = '''
+    INSERT INTO core_recipedocument AS d (
+        recipe_id, user_id, version, detail, summary, rendered_at)
+    VALUES %s
+    ON CONFLICT (recipe_id) DO UPDATE SET
+        version = EXCLUDED.version, detail = EXCLUDED.detail,
+        summary = EXCLUDED.summary, rendered_at = EXCLUDED.rendered_at
+'''
+# Reads only fill in missing or outdated documents.
+FILL_SQL = STORE_SQL + ' WHERE d.version <> EXCLUDED.version'
+TEMPLATE = '(%s, %s, %s, %s, %s, now())'
+
+INVALIDATE_LINKED_SQL = '''
+    DELETE FROM core_recipedocument WHERE recipe_id IN (
+        SELECT recipe_id FROM {link_table} WHERE {column} = ANY(%s))
+'''
+
+
+class DocumentResponse(Response):
+    '''Response with a JSON body rendered ahead of time.
+
+    The body is sent as is to JSON clients; ``data`` is only decoded for
+    other renderers, such as the browsable API.
+    '''
+
+    def __init__(self, content, **kwargs):
+        self.prerendered = content
+        super().__init__(**kwargs)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.prerendered)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        if not isinstance(renderer, JSONRenderer):
+            return super().rendered_content
+        self['Content-Type'] = renderer.media_type
+        return self.prerendered
+
+
+def _load(recipe_ids):
+    return Recipe.objects.filter(
+        id__in=recipe_ids,
+    ).prefetch_related('tags', 'ingredients')
+
+
+def render(recipes):
+    '''Return (recipe ID, user ID, version, detail, summary) rows.'''
+    # Imported here as the serializers import modules depending on this one.
+    from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+    renderer = JSONRenderer()
+    return [
+        (
+            recipe.id, recipe.user_id, VERSION,
+            renderer.render(RecipeDetailSerializer(recipe).data).decode(),
+            renderer.render(RecipeSerializer(recipe).data).decode(),
+        )
+        for recipe in recipes
+    ]
+
+
+def _store(sql, rows):
+    if rows:
+        with connection.cursor() as cursor:
+            execute_values(cursor, sql, rows, template=TEMPLATE)
+
+
+def refresh(recipe_ids):
+    '''Render and store the documents of the given recipes.'''
+    rows = render(_load(list(recipe_ids)))
+    _store(STORE_SQL, rows)
+    return len(rows)
+
+
+def schedule(recipe_ids):
+    '''Render documents once the current transaction has committed.'''
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: refresh(recipe_ids))
+
+
+def invalidate(recipe_ids):
+    '''Drop the documents of recipes; the next read renders them again.'''
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM core_recipedocument WHERE recipe_id = ANY(%s)',
+                [recipe_ids])
+
+
+def invalidate_linked(relation, related_ids):
+    '''Drop the documents of recipes linked to renamed tags or ingredients.'''
+    link_table, column = bulk.LINK_TABLES[relation]
+    related_ids = list(related_ids)
+    if related_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(INVALIDATE_LINKED_SQL.format(
+                link_table=link_table, column=column), [related_ids])
+
+
+def fetch(recipes, field):
+    '''Return the stored documents of a queryset of recipes in its order.
+
+    Missing documents are rendered and stored on the way.
+    '''
+    rows = list(recipes.prefetch_related(None).values_list(
+        'id', f'document__{field}', 'document__version'))
+    missing = [pk for pk, _, version in rows if version != VERSION]
+    rendered = {}
+    if missing:
+        fresh = render(_load(missing))
+        _store(FILL_SQL, fresh)
+        rendered = {row[0]: row[FIELDS[field]] for row in fresh}
+    return [
+        rendered.get(pk, document).encode() for pk, document, _ in rows
+        if pk in rendered or document is not None
+    ]
+
+
+def check(recipes=None, batch_size=500, repair=False):
+    '''Compare stored documents with freshly rendered ones, batch by batch.
+
+    Returns how many recipes were checked and the IDs of those whose
+    document is outdated or differs; with repair those are rendered again.
+    '''
+    recipes = Recipe.objects.all() if recipes is None else recipes
+    ids = recipes.order_by('id').values_list('id', flat=True)
+    checked, drifted, last = 0, [], 0
+    while True:
+        batch = list(ids.filter(id__gt=last)[:batch_size])
+        if not batch:
+            return checked, drifted
+        with transaction.atomic():
+            stored = {
+                pk: (version, detail, summary)
+                for pk, version, detail, summary in RecipeDocument.objects
+                .filter(recipe_id__in=batch)
+                .values_list('recipe_id', 'version', 'detail', 'summary')
+            }
+            bad = [
+                row[0] for row in render(_load(batch))
+                if row[0] in stored and stored[row[0]] != row[2:]
+            ]
+            if repair:
+                refresh(bad)
+        checked += len(batch)
+        drifted += bad
+        last = batch[-1]
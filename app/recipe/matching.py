@@ -0,0 +1,93 @@
+'''
+"What can I cook" matching with a per-user inverted ingredient index.
+
+The index maps each ingredient ID to a sorted array of recipe IDs, plus the
+ingredient IDs of every recipe, all as compact unsigned integer arrays. It
+is built with one query, kept in the cache and dropped whenever a user's
+recipe ingredients change, so scoring never touches the database.
+'''
+import uuid
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core import partitioning
+from core.models import Recipe
+
+# Indexes of users who stopped changing their recipes expire eventually.
+INDEX_TTL = 24 * 60 * 60
+
+
+def _version_key(user_id):
+    return f'recipe-match:version:{user_id}'
+
+
+def _version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(user_id):
+    '''Drop the index of a user after their recipe ingredients changed.'''
+    def drop():
+        cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+    # Drop now for readers in this transaction and again on commit, so a
+    # rebuild running concurrently cannot cache the uncommitted state.
+    drop()
+    transaction.on_commit(drop)
+
+
+def build_index(user_id):
+    '''Return (postings, recipes) for all recipes of a user.'''
+    postings = defaultdict(lambda: array('L'))
+    recipes = defaultdict(lambda: array('L'))
+    links = Recipe.ingredients.through.objects
+    if partitioning.links_partitioned():
+        links = links.filter(user_id=user_id)
+    else:
+        links = links.filter(recipe__user_id=user_id)
+    rows = links.order_by('recipe_id', 'ingredient_id') \
+        .values_list('recipe_id', 'ingredient_id')
+    for recipe_id, ingredient_id in rows.iterator():
+        postings[ingredient_id].append(recipe_id)
+        recipes[recipe_id].append(ingredient_id)
+    return dict(postings), dict(recipes)
+
+
+def get_index(user_id):
+    '''Return the cached index of a user, building it when missing.'''
+    key = f'recipe-match:index:{user_id}:{_version(user_id)}'
+    index = cache.get(key)
+    if index is None:
+        index = build_index(user_id)
+        cache.set(key, index, INDEX_TTL)
+    return index
+
+
+def match(index, have, min_coverage=0.0):
+    '''Rank recipes by the fraction of their ingredients in have.
+
+    Returns (recipe ID, coverage, missing ingredient IDs) tuples, best
+    coverage first, for recipes sharing at least one ingredient with have.
+    '''
+    postings, recipes = index
+    have = set(have)
+    hits = Counter()
+    for ingredient_id in have:
+        hits.update(postings.get(ingredient_id, ()))
+
+    results = []
+    for recipe_id, count in hits.items():
+        ingredients = recipes[recipe_id]
+        coverage = count / len(ingredients)
+        if coverage >= min_coverage:
+            missing = [i for i in ingredients if i not in have]
+            results.append((recipe_id, coverage, missing))
+    results.sort(key=lambda result: (-result[1], len(result[2]), result[0]))
+    return results
@@ -0,0 +1,182 @@
+'''
+Normalisation and duplicate merging for tag and ingredient names.
+
+Names are compared by ``core_normalize_name`` (lower case, no accents) after
+trimming and collapsing whitespace, and after mapping the synonyms in
+NAME_SYNONYMS to their canonical name. Duplicates that predate
+normalisation are merged into the oldest row by ``merge_duplicates``; a
+unique index on (user, normalised name) keeps new ones from appearing.
+'''
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.models import Tombstone
+from recipe import documents, matching, similarity, stats
+from recipe.bulk import LINK_TABLES
+
+# Relation name, name table and tombstone type.
+NAME_TABLES = {
+    'tags': ('core_tag', Tombstone.TAG),
+    'ingredients': ('core_ingredient', Tombstone.INGREDIENT),
+}
+
+MATCH_SQL = '''
+    SELECT i.name, core_normalize_name(i.name), o.id, o.name
+    FROM unnest(%(names)s::text[]) WITH ORDINALITY AS i(name, position)
+    LEFT JOIN {table} o ON o.user_id = %(user)s
+        AND core_normalize_name(o.name) = core_normalize_name(i.name)
+    ORDER BY i.position, o.id
+'''
+TRIM_SQL = '''
+    UPDATE {table} SET name = regexp_replace(btrim(name), '\\s+', ' ', 'g')
+    WHERE user_id = %(user)s
+      AND name <> regexp_replace(btrim(name), '\\s+', ' ', 'g')
+    RETURNING id
+'''
+# Names of a user, keyed the way duplicates are detected.
+KEYED_SQL = '''
+    SELECT o.id, o.user_id, COALESCE(
+        core_normalize_name(s.canonical), core_normalize_name(o.trimmed)
+    ) AS key
+    FROM (
+        SELECT id, user_id,
+               regexp_replace(btrim(name), '\\s+', ' ', 'g') AS trimmed
+        FROM {table}
+    ) AS o
+    LEFT JOIN unnest(%(variants)s::text[], %(canonicals)s::text[])
+        AS s(variant, canonical)
+        ON core_normalize_name(s.variant) = core_normalize_name(o.trimmed)
+'''
+DUPLICATES_SQL = '''
+    SELECT id, keep_id FROM (
+        SELECT id, first_value(id) OVER (PARTITION BY key ORDER BY id)
+            AS keep_id
+        FROM ({keyed} WHERE o.user_id = %(user)s) AS keyed
+    ) AS ranked
+    WHERE id <> keep_id
+    ORDER BY id
+'''
+USERS_SQL = '''
+    SELECT DISTINCT user_id FROM ({keyed}) AS keyed
+    GROUP BY user_id, key HAVING count(*) > 1
+    ORDER BY user_id
+'''
+
+
+def synonyms():
+    '''Return NAME_SYNONYMS keyed by lower case, whitespace collapsed name.'''
+    return {
+        ' '.join(variant.split()).lower(): canonical
+        for variant, canonical in settings.NAME_SYNONYMS.items()
+    }
+
+
+def _synonym_params():
+    variants = synonyms()
+    return {'variants': list(variants), 'canonicals': list(variants.values())}
+
+
+def normalize_name(name):
+    '''Collapse whitespace and map synonyms to their canonical name.'''
+    collapsed = ' '.join(name.split())
+    return synonyms().get(collapsed.lower(), collapsed)
+
+
+def match_names(relation, user, names):
+    '''Match names against a user's existing ones, ignoring case and accents.
+
+    Returns (existing, missing): the existing (id, name) per normalised key,
+    and the first given name for every key without an existing row.
+    '''
+    table, _ = NAME_TABLES[relation]
+    existing, missing = {}, {}
+    with connection.cursor() as cursor:
+        cursor.execute(MATCH_SQL.format(table=table),
+                       {'names': list(names), 'user': user.id})
+        for name, key, pk, existing_name in cursor.fetchall():
+            if pk is not None:
+                existing.setdefault(key, (pk, existing_name))
+            else:
+                missing.setdefault(key, name)
+    return existing, missing
+
+
+def merge_duplicates(relation, user_id, batch_size=500):
+    '''Merge a user's duplicate names into the oldest one, batch by batch.
+
+    Every batch runs in its own short transaction: links to the duplicates
+    are moved to the kept row, then the duplicates are deleted. Returns how
+    many rows were merged away.
+    '''
+    table, tombstone_type = NAME_TABLES[relation]
+    link_table, column = LINK_TABLES[relation]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            DUPLICATES_SQL.format(keyed=KEYED_SQL.format(table=table)),
+            {'user': user_id, **_synonym_params()})
+        pairs = cursor.fetchall()
+
+    merged = 0
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        with transaction.atomic(), connection.cursor() as cursor:
+            merged += _merge_batch(
+                cursor, table, link_table, column, tombstone_type, user_id,
+                [old for old, _ in batch], [keep for _, keep in batch],
+            )
+    # Duplicates are keyed on the trimmed name, so once they are merged
+    # trimming cannot collide with another row on the unique index.
+    with connection.cursor() as cursor:
+        cursor.execute(TRIM_SQL.format(table=table), {'user': user_id})
+        documents.invalidate_linked(
+            relation, [row[0] for row in cursor.fetchall()])
+    if merged:
+        stats.reconcile([user_id])
+        if relation == 'ingredients':
+            matching.invalidate(user_id)
+    return merged
+
+
+def _merge_batch(cursor, table, link_table, column, tombstone_type, user_id,
+                 old_ids, keep_ids):
+    # Lock the duplicates so no new links to them appear meanwhile.
+    cursor.execute(
+        f'SELECT id FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE',
+        [old_ids])
+    cursor.execute(
+        f'INSERT INTO {link_table} (recipe_id, {column}, user_id) '
+        f'SELECT l.recipe_id, m.keep_id, %s FROM {link_table} l '
+        'JOIN unnest(%s::bigint[], %s::bigint[]) AS m(old_id, keep_id) '
+        f'ON l.{column} = m.old_id '
+        'ON CONFLICT DO NOTHING',
+        [user_id, old_ids, keep_ids],
+    )
+    cursor.execute(
+        f'DELETE FROM {link_table} WHERE {column} = ANY(%s) '
+        'RETURNING recipe_id',
+        [old_ids])
+    recipe_ids = sorted({row[0] for row in cursor.fetchall()})
+    if recipe_ids:
+        cursor.execute(
+            'UPDATE core_recipe SET updated_at = clock_timestamp() '
+            'WHERE id = ANY(%s)',
+            [recipe_ids])
+        similarity.schedule(recipe_ids)
+        documents.invalidate(recipe_ids)
+
+    cursor.execute(
+        'INSERT INTO core_tombstone (user_id, type, object_id, deleted_at) '
+        'SELECT %s, %s, id, clock_timestamp() '
+        'FROM unnest(%s::bigint[]) AS d(id)',
+        [user_id, tombstone_type, old_ids])
+    cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', [old_ids])
+    return cursor.rowcount
+
+
+def users_with_duplicates(relation):
+    '''Return the IDs of users that have duplicate names.'''
+    table, _ = NAME_TABLES[relation]
+    with connection.cursor() as cursor:
+        cursor.execute(USERS_SQL.format(keyed=KEYED_SQL.format(table=table)),
+                       _synonym_params())
+        return [row[0] for row in cursor.fetchall()]
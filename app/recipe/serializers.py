@@ -3,17 +3,51 @@ serilizers for the recipe APIs.
 '''
 from rest_framework import serializers
 from core.models import (Recipe, Tag , Ingredient)
+from recipe import names
 
-class IngredientSerializer(serializers.ModelSerializer):
+class NameSerializer(serializers.ModelSerializer):
+    '''Base serializer for the tag and ingredient objects.
+
+    Names are unique per user regardless of case and accents, so creating
+    one that exists returns the existing object.
+    '''
+    relation = None
+
+    def validate_name(self, value):
+        value = names.normalize_name(value)
+        if self.instance is not None:
+            existing, _ = names.match_names(
+                self.relation, self.instance.user, [value])
+            if any(pk != self.instance.pk for pk, _ in existing.values()):
+                raise serializers.ValidationError(
+                    'This name is already in use.')
+        return value
+
+    def create(self, validated_data):
+        '''Create the object unless the user already has the name.'''
+        model = self.Meta.model
+        model.objects.bulk_create(
+            [model(**validated_data)], ignore_conflicts=True)
+        existing, _ = names.match_names(
+            self.relation, validated_data['user'], [validated_data['name']])
+        (pk, name), = existing.values()
+        return model(id=pk, user=validated_data['user'], name=name)
+
+
+class IngredientSerializer(NameSerializer):
     '''Serializer for the ingredient object.'''
+    relation = 'ingredients'
+
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ('id',)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(NameSerializer):
     '''Serializer for the tag object.'''
+    relation = 'tags'
+
     class Meta:
         model = Tag
         fields = ['id', 'name']
@@ -28,25 +62,37 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
         read_only_fields = ('id',)
 
+    def _get_or_create(self, model, items:list):
+        '''Return the user's objects for the given names, creating missing ones.
+
+        Names match existing ones regardless of case and accents.
+        '''
+        if not items:
+            return []
+        auth_user = self.context['request'].user
+        relation = 'tags' if model is Tag else 'ingredients'
+        given = [item['name'] for item in items]
+        existing, missing = names.match_names(relation, auth_user, given)
+        if missing:
+            # A concurrent request may create the same names; select them
+            # again rather than failing on the unique index.
+            model.objects.bulk_create(
+                (model(user=auth_user, name=name)
+                 for name in missing.values()),
+                ignore_conflicts=True)
+            existing, _ = names.match_names(relation, auth_user, given)
+        return [
+            model(id=pk, user=auth_user, name=name)
+            for pk, name in existing.values()
+        ]
+
     def _get_or_create_tags(self, tags:list, recipe):
         '''Handle getting or creating tags for recipe.'''
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.add(*self._get_or_create(Tag, tags))
 
     def _get_or_create_ingredients(self, ingredients:list, recipe):
         '''Handle getting or creating ingredients for recipe.'''
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(*self._get_or_create(Ingredient, ingredients))
 
     def create(self, validated_data):
         '''Create a recipe with tags.'''
@@ -84,6 +130,113 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         '''Update the recipe with an image.'''
         if 'image' in validated_data:
             instance.image = validated_data['image']
-            instance.save()
+            instance.save(update_fields=['image', 'updated_at'])
         return instance
 
+
+class TombstoneSerializer(serializers.Serializer):
+    '''Serializer for a deleted recipe, tag or ingredient.'''
+    type = serializers.CharField()
+    id = serializers.IntegerField(source='object_id')
+
+
+class ChangesSerializer(serializers.Serializer):
+    '''Serializer for one page of delta sync changes.'''
+    recipes = RecipeDetailSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = TombstoneSerializer(many=True)
+    cursor = serializers.CharField(
+        help_text='Pass as since to get the changes after this page.')
+    has_more = serializers.BooleanField()
+
+
+class TimeBucketSerializer(serializers.Serializer):
+    '''Serializer for one bucket of the cooking time histogram.'''
+    min = serializers.IntegerField()
+    max = serializers.IntegerField(allow_null=True)
+    count = serializers.IntegerField()
+
+
+class TopNameSerializer(serializers.Serializer):
+    '''Serializer for a most used tag or ingredient.'''
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.IntegerField()
+
+
+class StatsSerializer(serializers.Serializer):
+    '''Serializer for the dashboard stats of a user.'''
+    recipe_count = serializers.IntegerField()
+    average_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, coerce_to_string=False,
+        allow_null=True)
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    time_histogram = TimeBucketSerializer(many=True)
+    top_tags = TopNameSerializer(many=True)
+    top_ingredients = TopNameSerializer(many=True)
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    '''Serializer selecting recipes for a bulk action.'''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=10000)
+
+
+class RecipeShoppingListSerializer(serializers.Serializer):
+    '''Serializer selecting the recipes of a shopping list.'''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=1000)
+
+
+class RecipeBulkLinkSerializer(RecipeBulkSerializer):
+    '''Serializer for attaching or detaching tags and ingredients in bulk.'''
+    action = serializers.ChoiceField(choices=['attach', 'detach'])
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000)
+
+    def _owned_ids(self, model, value):
+        '''Check every ID belongs to the authenticated user.'''
+        found = set(model.objects.filter(
+            user=self.context['request'].user, id__in=value,
+        ).values_list('id', flat=True))
+        missing = sorted(set(value) - found)
+        if missing:
+            raise serializers.ValidationError(f'Invalid IDs: {missing}.')
+        return sorted(found)
+
+    def validate_tags(self, value):
+        return self._owned_ids(Tag, value)
+
+    def validate_ingredients(self, value):
+        return self._owned_ids(Ingredient, value)
+
+    def validate(self, attrs):
+        if not attrs.get('tags') and not attrs.get('ingredients'):
+            raise serializers.ValidationError(
+                'Provide tags or ingredients to change.')
+        return attrs
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    '''Serializer for the ingredients on hand when matching recipes.'''
+    ingredients = serializers.CharField(
+        help_text='Comma separated ingredient IDs.')
+    min_coverage = serializers.FloatField(
+        min_value=0, max_value=1, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate_ingredients(self, value):
+        try:
+            return {int(item) for item in value.split(',') if item}
+        except ValueError:
+            raise serializers.ValidationError(
+                'Provide comma separated ingredient IDs.')
+
+
+class NameAutocompleteSerializer(serializers.Serializer):
+    '''Serializer for a partially typed tag or ingredient name.'''
+    q = serializers.CharField(max_length=255, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
@@ -0,0 +1,137 @@
+'''
+Signal handlers for the recipe app.
+'''
+from django.db import connection
+from django.db.models.signals import (
+    m2m_changed,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import documents, matching, similarity, stats
+
+
+def _changed_recipe_ids(instance, action, reverse, pk_set):
+    '''Return the IDs of the recipes whose links an M2M change touches.'''
+    if not reverse:
+        return [instance.pk]
+    if action == 'pre_clear':
+        # pk_set is not given for clear, so read the links before they go.
+        return list(instance.recipe_set.values_list('id', flat=True))
+    return pk_set or []
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    '''Refresh the signatures and documents of recipes whose links changed.'''
+    if action in ('post_add', 'post_remove') or \
+            action == ('pre_clear' if reverse else 'post_clear'):
+        recipe_ids = _changed_recipe_ids(instance, action, reverse, pk_set)
+        similarity.schedule(recipe_ids)
+        documents.invalidate(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, **kwargs):
+    '''Drop the ingredient index when recipe ingredients change.'''
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        matching.invalidate(instance.user_id)
+
+
+def _snapshot(instance):
+    # Read __dict__ directly so deferred fields are never loaded.
+    values = []
+    for name in ('price', 'time_minutes'):
+        value = instance.__dict__.get(name)
+        if value is not None:
+            value = instance._meta.get_field(name).to_python(value)
+        values.append(value)
+    return tuple(values)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, raw, update_fields, **kwargs):
+    '''Apply the change of an existing recipe's price and time to the stats.
+
+    The old values are read under the row lock, which the save that follows
+    keeps, so concurrent saves in transactions never double count.
+    '''
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    price, time_minutes = _snapshot(instance)
+    if update_fields is not None:
+        price = price if 'price' in update_fields else None
+        time_minutes = time_minutes if 'time_minutes' in update_fields \
+            else None
+    if price is not None or time_minutes is not None:
+        stats.update_recipe(instance.pk, price, time_minutes)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    '''Add a new recipe to the stats.'''
+    if created:
+        price, time_minutes = _snapshot(instance)
+        stats.change_recipe(
+            instance.user_id, count=1, price=price, time=time_minutes,
+            added=[stats.time_bucket(time_minutes)])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_document_saved(sender, instance, created, **kwargs):
+    '''Render the document of a new recipe, or drop a changed one.'''
+    if created:
+        documents.schedule([instance.pk])
+    else:
+        documents.invalidate([instance.pk])
+
+
+@receiver(post_init, sender=Tag)
+@receiver(post_init, sender=Ingredient)
+def remember_linked_name(sender, instance, **kwargs):
+    '''Remember the name a tag or ingredient was loaded with.'''
+    instance._saved_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def linked_name_saved(sender, instance, created, **kwargs):
+    '''Drop the documents of recipes showing a renamed name.'''
+    if not created and instance.name != instance._saved_name:
+        documents.invalidate_linked(
+            'tags' if sender is Tag else 'ingredients', [instance.pk])
+    instance._saved_name = instance.name
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    '''Subtract a recipe and its links before they are deleted.
+
+    Covers ORM deletes and cascades; bulk.delete_recipes subtracts in SQL.
+    '''
+    with connection.cursor() as cursor:
+        stats.remove_recipes(cursor, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_counted(sender, instance, action, reverse, model, pk_set,
+                         **kwargs):
+    '''Count links in the stats after they are added, before they go.'''
+    deltas = {'post_add': 1, 'pre_remove': -1, 'pre_clear': -1}
+    if action not in deltas or (action != 'pre_clear' and not pk_set):
+        return
+    relation = 'ingredients' \
+        if sender is Recipe.ingredients.through else 'tags'
+    if reverse:
+        recipe_ids, target_ids = pk_set, [instance.pk]
+    else:
+        recipe_ids, target_ids = [instance.pk], pk_set
+    stats.change_links(
+        relation, instance.user_id, deltas[action], recipe_ids, target_ids)
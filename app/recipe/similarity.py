@@ -0,0 +1,163 @@
+'''
+"Similar recipes" with MinHash signatures and locality-sensitive hashing.
+
+Each recipe is reduced to a MinHash signature of its tag and ingredient
+IDs, whose fraction of equal positions estimates the Jaccard similarity of
+two recipes. The signature is cut into bands and every band is hashed into
+a bucket key; recipes sharing any bucket are the candidates, found through
+a GIN index instead of comparing against every recipe.
+
+Signatures are refreshed after commit whenever a recipe's tags or
+ingredients change. ``rebuild_recipe_signatures`` recomputes them in bulk.
+'''
+import hashlib
+import random
+import struct
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from core import partitioning
+from core.models import Recipe, RecipeSignature
+from core.sql import execute_values
+
+NUM_HASHES = 128
+# 32 bands of 4 rows make recipes with a Jaccard similarity above roughly
+# (1 / 32) ** (1 / 4) = 0.42 likely to share a bucket.
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+PRIME = (1 << 61) - 1
+MASK = 0xFFFFFFFF
+
+_rng = random.Random(41)
+COEFFICIENTS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(0, PRIME))
+    for _ in range(NUM_HASHES)
+]
+
+FEATURES_SQL = '''
+    SELECT r.id, r.user_id, 2 * t.tag_id
+    FROM core_recipe r LEFT JOIN core_recipe_tags t
+        ON t.recipe_id = r.id {tags_owner}
+    WHERE r.id = ANY(%(ids)s)
+    UNION ALL
+    SELECT r.id, r.user_id, 2 * i.ingredient_id + 1
+    FROM core_recipe r JOIN core_recipe_ingredients i
+        ON i.recipe_id = r.id {ingredients_owner}
+    WHERE r.id = ANY(%(ids)s)
+'''
+UPSERT_SQL = '''
+    INSERT INTO core_recipesignature (recipe_id, user_id, signature, bands)
+    VALUES %s
+    ON CONFLICT (recipe_id) DO UPDATE
+    SET signature = EXCLUDED.signature, bands = EXCLUDED.bands
+'''
+
+
+def minhash(features):
+    '''Return the MinHash signature of a set of feature integers.'''
+    if not features:
+        return []
+    return [
+        min((a * x + b) % PRIME for x in features) & MASK
+        for a, b in COEFFICIENTS
+    ]
+
+
+def band_keys(user_id, signature):
+    '''Return the LSH bucket key of every band of a signature.'''
+    keys = []
+    for band in range(len(signature) // ROWS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f'<qH{ROWS}I', user_id, band, *rows), digest_size=8)
+        keys.append(int.from_bytes(digest.digest(), 'little', signed=True))
+    return keys
+
+
+def pack(signature):
+    return struct.pack(f'<{len(signature)}I', *signature)
+
+
+def unpack(data):
+    data = bytes(data)
+    return struct.unpack(f'<{len(data) // 4}I', data)
+
+
+def estimate(a, b):
+    '''Estimate the Jaccard similarity of two signatures.'''
+    if not a or not b:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def refresh(recipe_ids):
+    '''Recompute and store the signatures of the given recipes.'''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    features = defaultdict(set)
+    owners = {}
+    with connection.cursor() as cursor:
+        cursor.execute(FEATURES_SQL.format(
+            tags_owner=partitioning.owner_filter(cursor.db, 't', 'r.user_id'),
+            ingredients_owner=partitioning.owner_filter(
+                cursor.db, 'i', 'r.user_id'),
+        ), {'ids': recipe_ids})
+        for recipe_id, user_id, feature in cursor.fetchall():
+            owners[recipe_id] = user_id
+            if feature is not None:
+                features[recipe_id].add(feature)
+
+        rows = []
+        for recipe_id, user_id in owners.items():
+            signature = minhash(features[recipe_id])
+            rows.append((recipe_id, user_id, pack(signature),
+                         band_keys(user_id, signature)))
+        if rows:
+            execute_values(
+                cursor, UPSERT_SQL, rows,
+                template='(%s, %s, %s, %s::bigint[])')
+    return len(rows)
+
+
+def schedule(recipe_ids):
+    '''Refresh signatures once the current transaction has committed.'''
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: refresh(recipe_ids))
+
+
+def similar(recipe, limit):
+    '''Return (recipe ID, similarity) pairs for the most similar recipes.'''
+    own = RecipeSignature.objects.filter(recipe=recipe).first()
+    if own is None:
+        refresh([recipe.id])
+        own = RecipeSignature.objects.get(recipe=recipe)
+    if not own.bands:
+        return []
+
+    signature = unpack(own.signature)
+    candidates = RecipeSignature.objects.filter(
+        user_id=recipe.user_id, bands__overlap=own.bands,
+    ).exclude(recipe_id=recipe.id).values_list('recipe_id', 'signature')
+    scored = [
+        (recipe_id, estimate(signature, unpack(other)))
+        for recipe_id, other in candidates
+    ]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+def rebuild(batch_size=1000, queryset=None):
+    '''Recompute signatures for all recipes, batch by batch.'''
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    ids = queryset.order_by('id').values_list('id', flat=True)
+    total, last = 0, 0
+    while True:
+        batch = list(ids.filter(id__gt=last)[:batch_size])
+        if not batch:
+            return total
+        with transaction.atomic():
+            total += refresh(batch)
+        last = batch[-1]
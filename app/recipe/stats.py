@@ -0,0 +1,254 @@
+'''
+Per-user recipe statistics kept in an incrementally updated summary row.
+
+Every write to recipes or their links applies a delta to the user's
+``core_recipestats`` row in a single statement, so the stats endpoint
+reads one row whatever the size of the collection. Histogram and usage
+counts are jsonb maps updated with ``core_bump_counts``; keys whose count
+drops to zero are removed. ``reconcile_recipe_stats`` rebuilds rows from
+the base tables.
+'''
+import bisect
+import heapq
+from decimal import Decimal
+
+from django.db import connection
+
+from core import partitioning
+from core.models import RecipeStats, Tag, Ingredient
+from recipe import bulk
+
+# Upper bounds of the time_minutes histogram buckets; the last is open ended.
+TIME_EDGES = [10, 20, 30, 45, 60, 90, 120]
+
+# Tags and ingredients listed on the dashboard.
+TOP_COUNT = 5
+
+COUNT_COLUMNS = {
+    'tags': 'tag_counts',
+    'ingredients': 'ingredient_counts',
+}
+
+ADD_RECIPE_SQL = '''
+    INSERT INTO core_recipestats AS s (
+        user_id, recipe_count, total_price, total_time_minutes,
+        time_histogram, tag_counts, ingredient_counts)
+    VALUES (%(user)s, %(count)s, %(price)s, %(time)s,
+            core_bump_counts(
+                core_bump_counts('{}', %(added)s, 1), %(removed)s, -1),
+            '{}', '{}')
+    ON CONFLICT (user_id) DO UPDATE SET
+        recipe_count = s.recipe_count + EXCLUDED.recipe_count,
+        total_price = s.total_price + EXCLUDED.total_price,
+        total_time_minutes = s.total_time_minutes + EXCLUDED.total_time_minutes,
+        time_histogram = core_bump_counts(
+            core_bump_counts(s.time_histogram, %(added)s, 1), %(removed)s, -1)
+'''
+LINKS_SQL = '''
+    UPDATE core_recipestats SET {counts} = core_bump_counts({counts}, ARRAY(
+        SELECT l.{column}::text FROM {link_table} l
+        JOIN core_recipe r ON r.id = l.recipe_id AND r.user_id = %(user)s
+        WHERE {where}
+    ), %(delta)s)
+    WHERE user_id = %(user)s
+'''
+KEYS_SQL = '''
+    UPDATE core_recipestats SET {counts} = core_bump_counts(
+        {counts}, %(keys)s::text[], %(delta)s)
+    WHERE user_id = (SELECT user_id FROM core_recipe WHERE id = %(recipe)s)
+'''
+# Move the stats by the difference between the price and time a recipe is
+# about to be saved with and the values it holds under the row lock.
+UPDATE_RECIPE_SQL = '''
+    WITH old AS (
+        SELECT user_id, price, time_minutes FROM core_recipe
+        WHERE id = %(id)s FOR UPDATE
+    ), new AS (
+        SELECT user_id, price AS old_price, time_minutes AS old_time,
+               COALESCE(%(price)s, price) AS price,
+               COALESCE(%(time)s, time_minutes) AS time_minutes
+        FROM old
+    )
+    UPDATE core_recipestats s SET
+        total_price = s.total_price + n.price - n.old_price,
+        total_time_minutes =
+            s.total_time_minutes + n.time_minutes - n.old_time,
+        time_histogram = core_bump_counts(core_bump_counts(
+            s.time_histogram,
+            ARRAY[width_bucket(n.time_minutes, %(edges)s)::text], 1),
+            ARRAY[width_bucket(n.old_time, %(edges)s)::text], -1)
+    FROM new n WHERE s.user_id = n.user_id
+'''
+REMOVE_RECIPES_SQL = '''
+    WITH gone AS (
+        SELECT id, user_id, price, time_minutes FROM core_recipe
+        WHERE id = ANY(%(ids)s)
+    ), totals AS (
+        SELECT user_id, count(*) AS n, sum(price) AS price,
+               sum(time_minutes) AS time,
+               array_agg(width_bucket(time_minutes, %(edges)s)::text) AS buckets
+        FROM gone GROUP BY user_id
+    ), tags AS (
+        SELECT g.user_id, array_agg(l.tag_id::text) AS keys
+        FROM gone g JOIN core_recipe_tags l
+            ON l.recipe_id = g.id {owner}
+        GROUP BY g.user_id
+    ), ingredients AS (
+        SELECT g.user_id, array_agg(l.ingredient_id::text) AS keys
+        FROM gone g JOIN core_recipe_ingredients l
+            ON l.recipe_id = g.id {owner}
+        GROUP BY g.user_id
+    )
+    UPDATE core_recipestats s SET
+        recipe_count = s.recipe_count - t.n,
+        total_price = s.total_price - t.price,
+        total_time_minutes = s.total_time_minutes - t.time,
+        time_histogram = core_bump_counts(s.time_histogram, t.buckets, -1),
+        tag_counts = core_bump_counts(s.tag_counts, tg.keys, -1),
+        ingredient_counts = core_bump_counts(s.ingredient_counts, ig.keys, -1)
+    FROM totals t
+    LEFT JOIN tags tg ON tg.user_id = t.user_id
+    LEFT JOIN ingredients ig ON ig.user_id = t.user_id
+    WHERE s.user_id = t.user_id
+'''
+RECONCILE_SQL = '''
+    INSERT INTO core_recipestats (
+        user_id, recipe_count, total_price, total_time_minutes,
+        time_histogram, tag_counts, ingredient_counts)
+    SELECT u.id,
+        (SELECT count(*) FROM core_recipe r WHERE r.user_id = u.id),
+        (SELECT COALESCE(sum(price), 0) FROM core_recipe r
+         WHERE r.user_id = u.id),
+        (SELECT COALESCE(sum(time_minutes), 0) FROM core_recipe r
+         WHERE r.user_id = u.id),
+        (SELECT COALESCE(jsonb_object_agg(bucket, n), '{}') FROM (
+            SELECT width_bucket(time_minutes, %(edges)s)::text AS bucket,
+                   count(*) AS n
+            FROM core_recipe r WHERE r.user_id = u.id GROUP BY 1) AS h),
+        (SELECT COALESCE(jsonb_object_agg(tag_id::text, n), '{}') FROM (
+            SELECT l.tag_id, count(*) AS n FROM core_recipe_tags l
+            JOIN core_recipe r ON r.id = l.recipe_id
+            WHERE r.user_id = u.id GROUP BY l.tag_id) AS t),
+        (SELECT COALESCE(jsonb_object_agg(ingredient_id::text, n), '{}') FROM (
+            SELECT l.ingredient_id, count(*) AS n
+            FROM core_recipe_ingredients l
+            JOIN core_recipe r ON r.id = l.recipe_id
+            WHERE r.user_id = u.id GROUP BY l.ingredient_id) AS i)
+    FROM core_user u WHERE u.id = ANY(%(users)s)
+    ON CONFLICT (user_id) DO UPDATE SET
+        recipe_count = EXCLUDED.recipe_count,
+        total_price = EXCLUDED.total_price,
+        total_time_minutes = EXCLUDED.total_time_minutes,
+        time_histogram = EXCLUDED.time_histogram,
+        tag_counts = EXCLUDED.tag_counts,
+        ingredient_counts = EXCLUDED.ingredient_counts
+'''
+
+
+def time_bucket(time_minutes):
+    '''Return the histogram bucket of a cooking time, as width_bucket does.'''
+    return bisect.bisect_right(TIME_EDGES, time_minutes)
+
+
+def change_recipe(user_id, count=0, price=0, time=0, added=(), removed=()):
+    '''Apply a change of recipe totals and time buckets to a user's row.'''
+    with connection.cursor() as cursor:
+        cursor.execute(ADD_RECIPE_SQL, {
+            'user': user_id, 'count': count, 'price': price, 'time': time,
+            'added': [str(bucket) for bucket in added],
+            'removed': [str(bucket) for bucket in removed],
+        })
+
+
+def update_recipe(recipe_id, price, time_minutes):
+    '''Apply the change to a recipe's price and time about to be saved.
+
+    None means the value is not changing. Run inside the transaction that
+    saves the recipe, so the row stays locked until the save commits.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_RECIPE_SQL, {
+            'id': recipe_id, 'price': price, 'time': time_minutes,
+            'edges': TIME_EDGES,
+        })
+
+
+def change_links(relation, user_id, delta, recipe_ids=None, target_ids=None):
+    '''Count the matching links of a relation up or down by delta.
+
+    Run after links are added and before they are removed. None for
+    recipe_ids or target_ids matches every link of the user.
+    '''
+    link_table, column = bulk.LINK_TABLES[relation]
+    where, params = ['true'], {'user': user_id, 'delta': delta}
+    if partitioning.links_partitioned():
+        where.append('l.user_id = %(user)s')
+    if recipe_ids is not None:
+        where.append('l.recipe_id = ANY(%(recipes)s)')
+        params['recipes'] = list(recipe_ids)
+    if target_ids is not None:
+        where.append(f'l.{column} = ANY(%(targets)s)')
+        params['targets'] = list(target_ids)
+    sql = LINKS_SQL.format(
+        counts=COUNT_COLUMNS[relation], column=column,
+        link_table=link_table, where=' AND '.join(where))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def change_link_keys(cursor, relation, recipe_id, keys, delta):
+    '''Count the given related IDs up or down for the owner of a recipe.'''
+    if keys:
+        cursor.execute(KEYS_SQL.format(counts=COUNT_COLUMNS[relation]), {
+            'keys': [str(key) for key in keys], 'delta': delta,
+            'recipe': recipe_id,
+        })
+
+
+def remove_recipes(cursor, recipe_ids):
+    '''Subtract recipes and their links; run before they are deleted.'''
+    sql = REMOVE_RECIPES_SQL.format(
+        owner=partitioning.owner_filter(cursor.db, 'l', 'g.user_id'))
+    cursor.execute(sql, {'ids': list(recipe_ids), 'edges': TIME_EDGES})
+
+
+def reconcile(user_ids):
+    '''Rebuild the stats rows of the given users from the base tables.'''
+    with connection.cursor() as cursor:
+        cursor.execute(RECONCILE_SQL,
+                       {'users': list(user_ids), 'edges': TIME_EDGES})
+        return cursor.rowcount
+
+
+def _top(model, user, counts):
+    '''Return the most used objects of a counts map with their counts.'''
+    candidates = heapq.nlargest(
+        TOP_COUNT, counts.items(), key=lambda item: (item[1], item[0]))
+    names = dict(model.objects.filter(
+        user=user, id__in=[int(key) for key, _ in candidates],
+    ).values_list('id', 'name'))
+    return [
+        {'id': int(key), 'name': names[int(key)], 'recipes': count}
+        for key, count in candidates if int(key) in names
+    ]
+
+
+def summary(user):
+    '''Return the dashboard stats of a user from their summary row.'''
+    row = RecipeStats.objects.filter(user=user).first() or RecipeStats()
+    count = row.recipe_count
+    bounds = [0] + TIME_EDGES + [None]
+    return {
+        'recipe_count': count,
+        'average_price': (Decimal(row.total_price) / count).quantize(
+            Decimal('0.01')) if count else None,
+        'average_time_minutes': round(row.total_time_minutes / count, 1)
+        if count else None,
+        'time_histogram': [
+            {'min': bounds[bucket], 'max': bounds[bucket + 1],
+             'count': row.time_histogram.get(str(bucket), 0)}
+            for bucket in range(len(TIME_EDGES) + 1)
+        ],
+        'top_tags': _top(Tag, user, row.tag_counts),
+        'top_ingredients': _top(Ingredient, user, row.ingredient_counts),
+    }
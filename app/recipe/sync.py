@@ -0,0 +1,95 @@
+'''
+Delta sync of recipes, tags, ingredients and deletions for offline clients.
+
+Changes from the four sources are merged into one stream ordered by
+(changed at, source, id). The cursor is the position of the last change
+returned. Changes from the last few seconds are held back, so rows written
+by transactions that have not committed yet cannot fall behind a cursor.
+'''
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+
+# Source position in the stream, name, model and change timestamp field.
+SOURCES = [
+    (0, 'recipes', Recipe, 'updated_at'),
+    (1, 'tags', Tag, 'updated_at'),
+    (2, 'ingredients', Ingredient, 'updated_at'),
+    (3, 'deleted', Tombstone, 'deleted_at'),
+]
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+START = (EPOCH, -1, 0)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidCursor(ValueError):
+    '''Raised for a cursor that was not issued by this endpoint.'''
+
+
+def encode_cursor(position):
+    changed_at, source, pk = position
+    micros = (changed_at - EPOCH) // MICROSECOND
+    raw = f'{micros}.{source}.{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return START
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        micros, source, pk = base64.urlsafe_b64decode(padded).decode() \
+            .split('.')
+        return EPOCH + int(micros) * MICROSECOND, int(source), int(pk)
+    except (ValueError, OverflowError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+
+
+def _after(position, source, field):
+    '''Filter a source to changes after a stream position.'''
+    changed_at, cursor_source, pk = position
+    if source > cursor_source:
+        return Q(**{f'{field}__gte': changed_at})
+    if source == cursor_source:
+        return Q(**{f'{field}__gt': changed_at}) | \
+            Q(**{field: changed_at, 'id__gt': pk})
+    return Q(**{f'{field}__gt': changed_at})
+
+
+def changes(user, cursor, limit):
+    '''Return up to limit changes after cursor, the next cursor and whether
+    more changes are waiting.'''
+    position = decode_cursor(cursor)
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    merged = []
+    for source, name, model, field in SOURCES:
+        queryset = model.objects.filter(user=user) \
+            .filter(**{f'{field}__lte': horizon}) \
+            .filter(_after(position, source, field)) \
+            .order_by(field, 'id')
+        if model is Recipe:
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+        merged.extend(
+            ((getattr(obj, field), source, obj.id), name, obj)
+            for obj in queryset[:limit + 1]
+        )
+
+    merged.sort(key=lambda item: item[0])
+    page = merged[:limit]
+    result = {name: [] for _, name, _, _ in SOURCES}
+    for _, name, obj in page:
+        result[name].append(obj)
+    next_position = page[-1][0] if page else position
+    return result, encode_cursor(next_position), len(merged) > limit
+
+
+def record_deletions(user, type, ids):
+    '''Store tombstones for objects about to be deleted.'''
+    Tombstone.objects.bulk_create(
+        Tombstone(user=user, type=type, object_id=pk) for pk in ids)
@@ -0,0 +1,92 @@
+"""
+Tests for tag and ingredient name autocomplete.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+TAG_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENT_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class AutocompleteAPITests(TestCase):
+    """Test suggesting names from partial input."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def names(self, url, q, **params):
+        res = self.client.get(url, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data]
+
+    def test_prefix_ranked_by_usage(self):
+        """Test prefix matches are ordered by how many recipes use them."""
+        Tag.objects.create(user=self.user, name='Curry')
+        popular = Tag.objects.create(user=self.user, name='Curried')
+        Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('1.00'))
+        recipe.tags.add(popular)
+
+        self.assertEqual(self.names(TAG_AUTOCOMPLETE_URL, 'cur'),
+                         ['Curried', 'Curry'])
+
+    def test_case_and_accent_insensitive(self):
+        """Test matching ignores case and accents."""
+        Ingredient.objects.create(user=self.user, name='Jalapeño')
+
+        self.assertEqual(self.names(INGREDIENT_AUTOCOMPLETE_URL, 'JALAPEN'),
+                         ['Jalapeño'])
+
+    def test_typo_tolerant(self):
+        """Test misspelt input still finds close names after prefixes."""
+        Ingredient.objects.create(user=self.user, name='Mozzarella')
+
+        self.assertEqual(
+            self.names(INGREDIENT_AUTOCOMPLETE_URL, 'mozarela'),
+            ['Mozzarella'])
+
+    def test_limit_and_user_scope(self):
+        """Test only the user's names are returned, top K only."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        Tag.objects.create(user=other, name='Salty')
+        for name in ['Salad', 'Salsa', 'Salmon']:
+            Tag.objects.create(user=self.user, name=name)
+
+        names = self.names(TAG_AUTOCOMPLETE_URL, 'sal', limit=2)
+
+        self.assertEqual(len(names), 2)
+        self.assertNotIn('Salty', names)
+
+    def test_like_wildcards_escaped(self):
+        """Test % and _ in the input match literally."""
+        Tag.objects.create(user=self.user, name='Half_Baked')
+        wildcard_match = Tag.objects.create(user=self.user, name='HalfXBaked')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('1.00'))
+        recipe.tags.add(wildcard_match)
+
+        self.assertEqual(self.names(TAG_AUTOCOMPLETE_URL, 'half_', limit=1),
+                         ['Half_Baked'])
+
+    def test_query_required(self):
+        """Test a missing query is rejected."""
+        res = self.client.get(TAG_AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
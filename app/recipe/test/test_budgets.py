@@ -0,0 +1,238 @@
+"""
+Query count and allocation budgets for the recipe APIs.
+"""
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.test.budgets import BudgetMixin
+from recipe import documents
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(name, pk):
+    """Return the detail URL of a recipe API object."""
+    return reverse(f'recipe:{name}-detail', args=[pk])
+
+
+def create_names(model, user, size):
+    """Bulk create and return size tags or ingredients."""
+    return model.objects.bulk_create(
+        model(user=user, name=f'{model.__name__} {i}') for i in range(size))
+
+
+def create_recipes(user, size):
+    """Bulk create size recipes, each with one tag and one ingredient."""
+    tag = Tag.objects.create(user=user, name='Dinner')
+    ingredient = Ingredient.objects.create(user=user, name='Salt')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=10,
+               price=Decimal('5.00'))
+        for i in range(size)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=r.id, tag_id=tag.id, user=user)
+        for r in recipes
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=r.id, ingredient_id=ingredient.id, user=user)
+        for r in recipes
+    )
+    return recipes, tag, ingredient
+
+
+def create_recipe_with_links(user, size):
+    """Create one recipe with size tags and size ingredients."""
+    recipe = Recipe.objects.create(
+        user=user, title='Big Recipe', time_minutes=10, price=Decimal('5.00'))
+    recipe.tags.add(*create_names(Tag, user, size))
+    recipe.ingredients.add(*create_names(Ingredient, user, size))
+    return recipe
+
+
+def image_upload():
+    """Return a small in-memory JPEG upload."""
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+    return SimpleUploadedFile(
+        'image.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeBudgetTests(BudgetMixin, TestCase):
+    """Test recipe endpoints keep constant queries as rows grow."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_recipe_list(self):
+        """Test listing recipes does not query per recipe."""
+        def setup(size):
+            create_recipes(self.user, size)
+            return lambda: self.client.get(RECIPES_URL)
+
+        self.assertWithinBudget(setup, max_queries=5, kib_per_row=32)
+
+    def test_recipe_list_prerendered(self):
+        """Test listing rendered recipes reads only their documents."""
+        def setup(size):
+            recipes, _, _ = create_recipes(self.user, size)
+            documents.refresh(r.id for r in recipes)
+            return lambda: self.client.get(RECIPES_URL)
+
+        self.assertWithinBudget(setup, max_queries=1, kib_per_row=8)
+
+    def test_recipe_list_filtered(self):
+        """Test filtering recipes by tag does not query per recipe."""
+        def setup(size):
+            _, tag, _ = create_recipes(self.user, size)
+            return lambda: self.client.get(RECIPES_URL, {'tags': tag.id})
+
+        self.assertWithinBudget(setup, max_queries=6, kib_per_row=32)
+
+    def test_recipe_detail(self):
+        """Test retrieving a recipe does not query per tag or ingredient."""
+        def setup(size):
+            recipe = create_recipe_with_links(self.user, size)
+            return lambda: self.client.get(detail_url('recipe', recipe.id))
+
+        self.assertWithinBudget(setup, max_queries=5, kib_per_row=8)
+
+    def test_recipe_detail_prerendered(self):
+        """Test retrieving a rendered recipe reads only its document."""
+        def setup(size):
+            recipe = create_recipe_with_links(self.user, size)
+            documents.refresh([recipe.id])
+            return lambda: self.client.get(detail_url('recipe', recipe.id))
+
+        self.assertWithinBudget(setup, max_queries=1, kib_per_row=4)
+
+    def test_recipe_create(self):
+        """Test creating a recipe does not query per tag or ingredient."""
+        def setup(size):
+            create_names(Tag, self.user, size // 2)
+            payload = {
+                'title': 'New Recipe',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [{'name': f'Tag {i}'} for i in range(size)],
+                'ingredients': [
+                    {'name': f'Ingredient {i}'} for i in range(size)],
+            }
+            return lambda: self.client.post(
+                RECIPES_URL, payload, format='json')
+
+        self.assertWithinBudget(setup, max_queries=19, kib_per_row=16)
+
+    def test_recipe_update(self):
+        """Test replacing a recipe's tags does not query per tag."""
+        def setup(size):
+            recipe = create_recipe_with_links(self.user, size)
+            payload = {
+                'title': 'Updated Recipe',
+                'time_minutes': 20,
+                'price': '10.00',
+                'tags': [{'name': f'New Tag {i}'} for i in range(size)],
+            }
+            return lambda: self.client.put(
+                detail_url('recipe', recipe.id), payload, format='json')
+
+        self.assertWithinBudget(setup, max_queries=22, kib_per_row=16)
+
+    def test_recipe_delete(self):
+        """Test deleting a recipe does not query per linked row."""
+        def setup(size):
+            recipe = create_recipe_with_links(self.user, size)
+            return lambda: self.client.delete(detail_url('recipe', recipe.id))
+
+        self.assertWithinBudget(setup, max_queries=12, kib_per_row=8)
+
+    def test_recipe_upload_image(self):
+        """Test uploading an image does not query per linked row."""
+        def setup(size):
+            recipe = create_recipe_with_links(self.user, size)
+            url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+            return lambda: self.client.post(
+                url, {'image': image_upload()}, format='multipart')
+
+        self.assertWithinBudget(setup, max_queries=7, kib_per_row=8)
+
+
+class TagIngredientBudgetTests(BudgetMixin, TestCase):
+    """Test tag and ingredient endpoints keep constant queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_tag_list(self):
+        """Test listing tags runs a single query."""
+        def setup(size):
+            create_names(Tag, self.user, size)
+            return lambda: self.client.get(TAGS_URL)
+
+        self.assertWithinBudget(setup, max_queries=1, kib_per_row=4)
+
+    def test_tag_create(self):
+        """Test creating a tag does not depend on existing tags."""
+        def setup(size):
+            create_names(Tag, self.user, size)
+            return lambda: self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertWithinBudget(setup, max_queries=2, kib_per_row=1)
+
+    def test_tag_delete(self):
+        """Test deleting a tag does not query per linked recipe."""
+        def setup(size):
+            _, tag, _ = create_recipes(self.user, size)
+            return lambda: self.client.delete(detail_url('tag', tag.id))
+
+        self.assertWithinBudget(setup, max_queries=8, kib_per_row=2)
+
+    def test_ingredient_list(self):
+        """Test listing ingredients runs a single query."""
+        def setup(size):
+            create_names(Ingredient, self.user, size)
+            return lambda: self.client.get(INGREDIENTS_URL)
+
+        self.assertWithinBudget(setup, max_queries=1, kib_per_row=4)
+
+    def test_ingredient_create(self):
+        """Test creating an ingredient does not depend on existing ones."""
+        def setup(size):
+            create_names(Ingredient, self.user, size)
+            return lambda: self.client.post(INGREDIENTS_URL, {'name': 'Salt'})
+
+        self.assertWithinBudget(setup, max_queries=2, kib_per_row=1)
+
+    def test_ingredient_delete(self):
+        """Test deleting an ingredient does not query per linked recipe."""
+        def setup(size):
+            _, _, ingredient = create_recipes(self.user, size)
+            return lambda: self.client.delete(
+                detail_url('ingredient', ingredient.id))
+
+        self.assertWithinBudget(setup, max_queries=8, kib_per_row=2)
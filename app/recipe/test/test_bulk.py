@@ -0,0 +1,152 @@
+"""
+Tests for the bulk recipe APIs.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import bulk
+
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+BULK_LINK_URL = reverse('recipe:recipe-bulk-link')
+
+
+def create_user(email='test@example.com', password='testpass123'):
+    """Create and return a user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkRecipeAPITests(TestCase):
+    """Test bulk delete and link endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes = [create_recipe(self.user) for _ in range(5)]
+        for recipe in self.recipes[:3]:
+            recipe.tags.add(self.tag)
+
+    def test_bulk_delete_by_ids(self):
+        """Test deleting recipes by ID returns affected counts."""
+        ids = [r.id for r in self.recipes[:2]]
+
+        res = self.client.post(BULK_DELETE_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2, 'links_deleted': 2})
+        self.assertFalse(Recipe.objects.filter(id__in=ids).exists())
+        self.assertEqual(Recipe.objects.count(), 3)
+
+    def test_bulk_delete_by_filter(self):
+        """Test deleting recipes matching a filter."""
+        url = f'{BULK_DELETE_URL}?tags={self.tag.id}'
+
+        res = self.client.post(url, {}, format='json')
+
+        self.assertEqual(res.data['deleted'], 3)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_bulk_delete_requires_selection(self):
+        """Test a bulk delete without IDs or filters is rejected."""
+        res = self.client.post(BULK_DELETE_URL, {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    def test_bulk_delete_ignores_unrelated_params(self):
+        """Test ?format= or an empty filter does not select every recipe."""
+        for url in [f'{BULK_DELETE_URL}?format=json',
+                    f'{BULK_DELETE_URL}?tags=']:
+            res = self.client.post(url, {}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    def test_bulk_delete_other_users_recipes(self):
+        """Test recipes of other users are never deleted."""
+        other = create_recipe(create_user(email='other@example.com'))
+
+        res = self.client.post(
+            BULK_DELETE_URL, {'ids': [other.id]}, format='json')
+
+        self.assertEqual(res.data['deleted'], 0)
+        self.assertTrue(Recipe.objects.filter(id=other.id).exists())
+
+    def test_bulk_attach(self):
+        """Test attaching tags and ingredients skips existing links."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {
+            'ids': [r.id for r in self.recipes],
+            'action': 'attach',
+            'tags': [self.tag.id],
+            'ingredients': [salt.id],
+        }
+
+        res = self.client.post(BULK_LINK_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'tags': 2, 'ingredients': 5})
+        self.assertEqual(self.tag.recipe_set.count(), 5)
+
+    def test_bulk_detach_by_filter(self):
+        """Test removing a tag from every recipe that has it."""
+        payload = {'action': 'detach', 'tags': [self.tag.id]}
+        url = f'{BULK_LINK_URL}?tags={self.tag.id}'
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.data, {'tags': 3})
+        self.assertEqual(self.tag.recipe_set.count(), 0)
+
+    def test_bulk_link_other_users_tag(self):
+        """Test tags of other users cannot be attached."""
+        other_tag = Tag.objects.create(
+            user=create_user(email='other@example.com'), name='Other')
+        payload = {
+            'ids': [self.recipes[0].id],
+            'action': 'attach',
+            'tags': [other_tag.id],
+        }
+
+        res = self.client.post(BULK_LINK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(other_tag.recipe_set.exists())
+
+    def test_bulk_link_all_or_nothing(self):
+        """Test tags are not linked when linking ingredients fails."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        attach = bulk.attach
+
+        def fail_on_ingredients(recipes, relation, related_ids):
+            if relation == 'ingredients':
+                raise DatabaseError('link failed')
+            return attach(recipes, relation, related_ids)
+
+        payload = {
+            'ids': [r.id for r in self.recipes],
+            'action': 'attach',
+            'tags': [self.tag.id],
+            'ingredients': [salt.id],
+        }
+        with patch('recipe.bulk.attach', side_effect=fail_on_ingredients):
+            with self.assertRaises(DatabaseError):
+                self.client.post(BULK_LINK_URL, payload, format='json')
+
+        self.assertEqual(self.tag.recipe_set.count(), 3)
@@ -0,0 +1,142 @@
+"""
+Tests for the delta sync changes API.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Tombstone
+
+CHANGES_URL = reverse('recipe:changes')
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class ChangesAPITests(TestCase):
+    """Test listing changes since a cursor."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_auth_required(self):
+        """Test auth is required to list changes."""
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_initial_sync(self):
+        """Test a request without a cursor lists everything for the user."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        create_recipe(other)
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual([t['id'] for t in res.data['tags']], [tag.id])
+        self.assertFalse(res.data['has_more'])
+
+    def test_only_changes_after_cursor(self):
+        """Test the cursor returns only rows changed since it was issued."""
+        create_recipe(self.user, title='Old')
+        cursor = self.client.get(CHANGES_URL).data['cursor']
+        recipe = create_recipe(self.user, title='New')
+
+        res = self.client.get(CHANGES_URL, {'since': cursor})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+
+    def test_deletions_reported(self):
+        """Test deleted recipes and tags are listed as tombstones."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        cursor = self.client.get(CHANGES_URL).data['cursor']
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+        self.client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+        res = self.client.get(CHANGES_URL, {'since': cursor})
+
+        self.assertCountEqual(res.data['deleted'], [
+            {'type': Tombstone.RECIPE, 'id': recipe.id},
+            {'type': Tombstone.TAG, 'id': tag.id},
+        ])
+
+    def test_deleted_tag_lists_its_recipes(self):
+        """Test recipes that lost a deleted tag are listed as changed."""
+        recipe = create_recipe(self.user)
+        create_recipe(self.user, title='Untagged')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        cursor = self.client.get(CHANGES_URL).data['cursor']
+
+        self.client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+        res = self.client.get(CHANGES_URL, {'since': cursor})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual(res.data['recipes'][0]['tags'], [])
+
+    def test_bulk_delete_tombstones(self):
+        """Test the bulk delete endpoint records tombstones."""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+
+        self.client.post(reverse('recipe:recipe-bulk-delete'),
+                         {'ids': [r.id for r in recipes]}, format='json')
+
+        self.assertEqual(
+            Tombstone.objects.filter(user=self.user).count(), 3)
+
+    def test_pages_follow_cursor(self):
+        """Test paging with limit visits every change exactly once."""
+        ids = [create_recipe(self.user).id for _ in range(5)]
+        Recipe.objects.filter(user=self.user).update(updated_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, 'since': cursor} if cursor else {'limit': 2}
+            res = self.client.get(CHANGES_URL, params)
+            seen += [r['id'] for r in res.data['recipes']]
+            cursor = res.data['cursor']
+            if not res.data['has_more']:
+                break
+
+        self.assertEqual(seen, ids)
+
+    def test_recent_changes_held_back(self):
+        """Test changes inside the settle window are not returned yet."""
+        create_recipe(self.user)
+
+        with self.settings(SYNC_SETTLE_SECONDS=60):
+            res = self.client.get(CHANGES_URL)
+
+        self.assertEqual(res.data['recipes'], [])
+        Recipe.objects.update(
+            updated_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(len(self.client.get(CHANGES_URL).data['recipes']), 1)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected."""
+        res = self.client.get(CHANGES_URL, {'since': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,151 @@
+"""
+Tests for pre-rendered recipe documents.
+"""
+import json
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, RecipeDocument, Tag
+from recipe import documents
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00'),
+                'description': 'Sample description'}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeDocumentTests(TestCase):
+    """Test recipes are served from their pre-rendered documents."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_detail_rendered_once(self):
+        """Test a recipe is rendered on first read and then served as is."""
+        recipe = create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.json(), RecipeDetailSerializer(recipe).data)
+        document = RecipeDocument.objects.get(recipe=recipe)
+        self.assertEqual(res.content, document.detail.encode())
+        with self.assertNumQueries(1):
+            self.client.get(detail_url(recipe.id))
+
+    def test_list_in_order(self):
+        """Test the list joins the summaries of the newest recipes first."""
+        first = create_recipe(self.user, title='First')
+        second = create_recipe(self.user, title='Second')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.json(), RecipeSerializer(
+            [second, first], many=True).data)
+        self.assertNotIn('description', res.json()[0])
+
+    def test_write_replaces_document(self):
+        """Test an update is visible on the next read."""
+        recipe = create_recipe(self.user)
+        self.client.get(detail_url(recipe.id))
+
+        self.client.patch(detail_url(recipe.id), {'title': 'Renamed'})
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.json()['title'], 'Renamed')
+
+    def test_rename_replaces_document(self):
+        """Test renaming a tag drops the documents showing it."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(detail_url(recipe.id))
+
+        tag.name = 'Vegetarian'
+        with self.captureOnCommitCallbacks() as callbacks:
+            tag.save()
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RecipeDocument.objects.filter(recipe=recipe).exists())
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.json()['tags'],
+                         [{'id': tag.id, 'name': 'Vegetarian'}])
+
+    def test_unchanged_name_keeps_documents(self):
+        """Test saving a tag without renaming it keeps the documents."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(detail_url(recipe.id))
+
+        Tag.objects.get(id=tag.id).save()
+
+        self.assertTrue(RecipeDocument.objects.filter(recipe=recipe).exists())
+
+    def test_outdated_version_rendered(self):
+        """Test documents of an older version are rendered again."""
+        recipe = create_recipe(self.user)
+        documents.refresh([recipe.id])
+        RecipeDocument.objects.update(version=documents.VERSION - 1,
+                                      detail='{}')
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.json()['title'], 'Sample')
+        self.assertEqual(RecipeDocument.objects.get().version,
+                         documents.VERSION)
+
+    def test_other_users_recipe_not_found(self):
+        """Test another user's recipe is not served."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        recipe = create_recipe(other)
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(RecipeDocument.objects.exists())
+
+    def test_check_and_repair(self):
+        """Test the check command finds and repairs drifted documents."""
+        recipe = create_recipe(self.user)
+        create_recipe(self.user)
+        documents.refresh(Recipe.objects.values_list('id', flat=True))
+        RecipeDocument.objects.filter(recipe=recipe).update(detail='{}')
+
+        out = StringIO()
+        call_command('check_recipe_documents', stdout=out)
+        self.assertIn(f'Recipe {recipe.id}: document drifted.', out.getvalue())
+        self.assertIn('1 drifted', out.getvalue())
+
+        call_command('check_recipe_documents', '--repair', stdout=StringIO())
+
+        self.assertEqual(
+            json.loads(RecipeDocument.objects.get(recipe=recipe).detail),
+            RecipeDetailSerializer(recipe).data)
@@ -0,0 +1,112 @@
+"""
+Tests for matching recipes against ingredients on hand.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Ingredient
+from recipe import matching
+
+MATCH_URL = reverse('recipe:recipe-match')
+
+
+def create_recipe(user, ingredients, **params):
+    """Create and return a recipe with the given ingredients."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class MatchAPITests(TestCase):
+    """Test ranking recipes by ingredient coverage."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.egg, self.flour, self.milk, self.salt = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Egg', 'Flour', 'Milk', 'Salt']
+        ]
+
+    def test_ranked_by_coverage(self):
+        """Test recipes are ranked by coverage and list what is missing."""
+        pancakes = create_recipe(
+            self.user, [self.egg, self.flour, self.milk], title='Pancakes')
+        omelette = create_recipe(self.user, [self.egg, self.salt],
+                                 title='Omelette')
+        create_recipe(self.user, [self.milk], title='Milk')
+
+        res = self.client.get(
+            MATCH_URL, {'ingredients': f'{self.egg.id},{self.salt.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        best, second = res.data['results']
+        self.assertEqual((best['id'], best['coverage']), (omelette.id, 1.0))
+        self.assertEqual(best['missing'], [])
+        self.assertEqual(second['id'], pancakes.id)
+        self.assertEqual(second['coverage'], round(1 / 3, 4))
+        self.assertCountEqual(second['missing'], [self.flour.id, self.milk.id])
+
+    def test_min_coverage(self):
+        """Test recipes below min_coverage are left out."""
+        create_recipe(self.user, [self.egg, self.flour, self.milk])
+
+        res = self.client.get(MATCH_URL, {
+            'ingredients': str(self.egg.id), 'min_coverage': 0.5})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_index_follows_ingredient_changes(self):
+        """Test adding and removing ingredients updates the index."""
+        recipe = create_recipe(self.user, [self.egg])
+        params = {'ingredients': str(self.egg.id)}
+        self.assertEqual(
+            self.client.get(MATCH_URL, params).data['results'][0]['coverage'],
+            1.0)
+
+        recipe.ingredients.add(self.flour)
+        res = self.client.get(MATCH_URL, params)
+        self.assertEqual(res.data['results'][0]['coverage'], 0.5)
+
+        self.client.delete(
+            reverse('recipe:recipe-detail', args=[recipe.id]))
+        self.assertEqual(self.client.get(MATCH_URL, params).data['count'], 0)
+
+    def test_other_users_recipes_excluded(self):
+        """Test only the user's own recipes are matched."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        create_recipe(other, [self.egg])
+
+        res = self.client.get(MATCH_URL, {'ingredients': str(self.egg.id)})
+
+        self.assertEqual(res.data['count'], 0)
+
+    def test_invalid_ingredients(self):
+        """Test non numeric ingredient IDs are rejected."""
+        res = self.client.get(MATCH_URL, {'ingredients': 'egg'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_index_needs_no_queries(self):
+        """Test scoring a warm index only queries recipe titles."""
+        create_recipe(self.user, [self.egg])
+        matching.get_index(self.user.id)
+
+        with self.assertNumQueries(1):
+            self.client.get(MATCH_URL, {'ingredients': str(self.egg.id)})
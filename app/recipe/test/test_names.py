@@ -0,0 +1,121 @@
+"""
+Tests for name normalisation and duplicate merging.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from recipe.names import normalize_name
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(NAME_SYNONYMS={'Tomatoes': 'Tomato'})
+class NameNormalizationTests(TestCase):
+    """Test names are normalised when written."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_normalize_name(self):
+        """Test whitespace is collapsed and synonyms are mapped."""
+        self.assertEqual(normalize_name('  Sun   dried '), 'Sun dried')
+        self.assertEqual(normalize_name(' tomatoes'), 'Tomato')
+
+    def test_recipe_reuses_matching_names(self):
+        """Test differently written names link the existing ingredient."""
+        tomato = Ingredient.objects.create(user=self.user, name='Tomato')
+        payload = {
+            'title': 'Salad', 'time_minutes': 5, 'price': Decimal('2.00'),
+            'ingredients': [{'name': 'tomato '}, {'name': 'Tomatoes'},
+                            {'name': 'Jalapeño'}, {'name': 'JALAPENO'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.ingredients.count(), 2)
+        self.assertIn(tomato, recipe.ingredients.all())
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+    def test_tag_create_normalized(self):
+        """Test tags created directly are stored normalised."""
+        self.client.post(reverse('recipe:tag-list'), {'name': ' Quick  Meal '})
+
+        self.assertTrue(Tag.objects.filter(name='Quick Meal').exists())
+
+    def test_create_reuses_existing_name(self):
+        """Test creating a name the user has returns the existing one."""
+        tag = Tag.objects.create(user=self.user, name='Crème brûlée')
+
+        res = self.client.post(reverse('recipe:tag-list'),
+                               {'name': 'CREME BRULEE'})
+
+        self.assertEqual(res.data, {'id': tag.id, 'name': 'Crème brûlée'})
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_names_unique_per_user(self):
+        """Test the database refuses a second row with an equal name."""
+        Ingredient.objects.create(user=self.user, name='Tomato')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ingredient.objects.create(user=self.user, name='TOMATO')
+
+
+@override_settings(NAME_SYNONYMS={'tomatoes': 'tomato'})
+class MergeDuplicatesCommandTests(TestCase):
+    """Test merging duplicates created before normalisation."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+
+    def test_merge_duplicates(self):
+        """Test links move to the oldest row and duplicates are deleted."""
+        keep = Ingredient.objects.create(user=self.user, name='Tomato')
+        spaced = Ingredient.objects.create(user=self.user, name='tomato  ')
+        plural = Ingredient.objects.create(user=self.user, name='Tomatoes')
+        other = Ingredient.objects.create(user=self.user, name='Basil')
+        recipe = Recipe.objects.create(user=self.user, title='Sauce',
+                                       time_minutes=5, price=Decimal('1.00'))
+        recipe.ingredients.add(keep, spaced)
+        second = Recipe.objects.create(user=self.user, title='Soup',
+                                       time_minutes=5, price=Decimal('1.00'))
+        second.ingredients.add(plural)
+
+        call_command('merge_duplicates', '--batch-size', '1',
+                     stdout=StringIO())
+
+        self.assertCountEqual(
+            Ingredient.objects.filter(user=self.user), [keep, other])
+        self.assertEqual(list(recipe.ingredients.all()), [keep])
+        self.assertEqual(list(second.ingredients.all()), [keep])
+        self.assertEqual(
+            Tombstone.objects.filter(type=Tombstone.INGREDIENT).count(), 2)
+
+    def test_users_kept_apart(self):
+        """Test equal names of different users are not merged."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=other, name='vegan')
+
+        call_command('merge_duplicates', stdout=StringIO())
+
+        self.assertEqual(Tag.objects.count(), 2)
@@ -0,0 +1,84 @@
+"""
+Tests for the shopping list API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Ingredient
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def create_recipe(user, ingredients, **params):
+    """Create and return a recipe with the given ingredients."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class ShoppingListAPITests(TestCase):
+    """Test combining many recipes into one shopping list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.egg = Ingredient.objects.create(user=self.user, name='Egg')
+        self.flour = Ingredient.objects.create(user=self.user, name='Flour')
+
+    def test_combined_list(self):
+        """Test ingredients are de-duplicated and totals are summed."""
+        first = create_recipe(self.user, [self.egg, self.flour],
+                              price=Decimal('2.50'), time_minutes=20)
+        second = create_recipe(self.user, [self.egg],
+                               price=Decimal('1.25'), time_minutes=5)
+
+        res = self.client.post(
+            SHOPPING_LIST_URL, {'ids': [first.id, second.id, first.id]},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['total_price'], Decimal('3.75'))
+        self.assertEqual(res.data['total_time_minutes'], 25)
+        self.assertEqual(res.data['ingredients'], [
+            {'id': self.egg.id, 'name': 'Egg', 'recipes': 2},
+            {'id': self.flour.id, 'name': 'Flour', 'recipes': 1},
+        ])
+
+    def test_other_users_recipes_ignored(self):
+        """Test recipes of other users do not count."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        theirs = create_recipe(other, [self.egg])
+
+        res = self.client.post(
+            SHOPPING_LIST_URL, {'ids': [theirs.id]}, format='json')
+
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_constant_queries(self):
+        """Test the list takes two aggregate queries for any size."""
+        ids = [create_recipe(self.user, [self.egg, self.flour]).id
+               for _ in range(20)]
+
+        with self.assertNumQueries(2):
+            self.client.post(SHOPPING_LIST_URL, {'ids': ids}, format='json')
+
+    def test_ids_required(self):
+        """Test an empty selection is rejected."""
+        res = self.client.post(SHOPPING_LIST_URL, {'ids': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
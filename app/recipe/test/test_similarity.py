@@ -0,0 +1,117 @@
+"""
+Tests for the similar recipes API.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, RecipeSignature, Tag, Ingredient
+from recipe import similarity
+
+
+def similar_url(recipe_id):
+    """Create and return a similar recipes URL."""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+class MinHashTests(SimpleTestCase):
+    """Test signatures estimate Jaccard similarity."""
+
+    def test_estimate(self):
+        """Test the estimate is close to the true Jaccard similarity."""
+        a = similarity.minhash(set(range(0, 100)))
+        b = similarity.minhash(set(range(50, 150)))
+
+        self.assertAlmostEqual(similarity.estimate(a, b), 1 / 3, delta=0.12)
+        self.assertEqual(similarity.estimate(a, a), 1.0)
+
+    def test_pack_round_trip(self):
+        """Test signatures survive storage as bytes."""
+        signature = similarity.minhash({1, 2, 3})
+
+        self.assertEqual(
+            list(similarity.unpack(similarity.pack(signature))), signature)
+
+
+class SimilarAPITests(TestCase):
+    """Test listing similar recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                     for i in range(4)]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient {i}')
+            for i in range(6)
+        ]
+
+    def create_recipe(self, tags, ingredients, user=None):
+        """Create a recipe, running signature refreshes as on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                user=user or self.user, title='Sample', time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            recipe.tags.add(*tags)
+            recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_most_similar_first(self):
+        """Test recipes are ranked by shared tags and ingredients."""
+        base = self.create_recipe(self.tags[:2], self.ingredients[:4])
+        close = self.create_recipe(self.tags[:2], self.ingredients[:3])
+        unrelated = self.create_recipe(self.tags[3:], self.ingredients[5:])
+
+        res = self.client.get(similar_url(base.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in res.data]
+        self.assertEqual(ids[0], close.id)
+        self.assertNotIn(unrelated.id, ids)
+        self.assertNotIn(base.id, ids)
+        self.assertGreater(res.data[0]['similarity'], 0.5)
+
+    def test_signature_follows_link_changes(self):
+        """Test changing links updates the stored signature."""
+        recipe = self.create_recipe(self.tags[:1], [])
+        before = bytes(RecipeSignature.objects.get(recipe=recipe).signature)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.ingredients.add(self.ingredients[0])
+
+        after = bytes(RecipeSignature.objects.get(recipe=recipe).signature)
+        self.assertNotEqual(before, after)
+
+    def test_other_users_excluded(self):
+        """Test recipes of other users are never suggested."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        base = self.create_recipe(self.tags[:2], self.ingredients[:2])
+        theirs = self.create_recipe(
+            self.tags[:2], self.ingredients[:2], user=other)
+
+        res = self.client.get(similar_url(base.id))
+
+        self.assertNotIn(theirs.id, [r['id'] for r in res.data])
+
+    def test_rebuild_command(self):
+        """Test the rebuild command creates missing signatures."""
+        recipe = self.create_recipe(self.tags[:2], self.ingredients[:2])
+        RecipeSignature.objects.all().delete()
+
+        call_command('rebuild_recipe_signatures', stdout=StringIO())
+
+        self.assertTrue(
+            RecipeSignature.objects.filter(recipe=recipe).exists())
@@ -0,0 +1,183 @@
+"""
+Tests for the recipe stats API.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, RecipeStats, Tag, Ingredient
+
+STATS_URL = reverse('recipe:stats')
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class StatsAPITests(TestCase):
+    """Test the stats summary follows every change."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def get_stats(self):
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_empty(self):
+        """Test a user without recipes gets zero stats."""
+        data = self.get_stats()
+
+        self.assertEqual(data['recipe_count'], 0)
+        self.assertIsNone(data['average_price'])
+        self.assertEqual(data['top_tags'], [])
+
+    def test_totals_and_histogram(self):
+        """Test counts, averages and the time histogram."""
+        create_recipe(self.user, time_minutes=5, price=Decimal('2.00'))
+        create_recipe(self.user, time_minutes=25, price=Decimal('4.00'))
+
+        data = self.get_stats()
+
+        self.assertEqual(data['recipe_count'], 2)
+        self.assertEqual(data['average_price'], Decimal('3.00'))
+        self.assertEqual(data['average_time_minutes'], 15)
+        counts = {b['min']: b['count'] for b in data['time_histogram']}
+        self.assertEqual(counts[0], 1)
+        self.assertEqual(counts[20], 1)
+        self.assertEqual(sum(counts.values()), 2)
+
+    def test_updates_and_deletes(self):
+        """Test edits move totals and deletes subtract the recipe."""
+        recipe = create_recipe(self.user, time_minutes=5)
+        recipe.tags.add(self.tag)
+        recipe.time_minutes = 100
+        recipe.price = Decimal('7.00')
+        recipe.save()
+
+        data = self.get_stats()
+        self.assertEqual(data['average_time_minutes'], 100)
+        self.assertEqual(data['average_price'], Decimal('7.00'))
+        self.assertEqual(data['top_tags'],
+                         [{'id': self.tag.id, 'name': 'Vegan', 'recipes': 1}])
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        data = self.get_stats()
+        self.assertEqual(data['recipe_count'], 0)
+        self.assertEqual(data['top_tags'], [])
+        self.assertEqual(
+            sum(b['count'] for b in data['time_histogram']), 0)
+
+    def test_stale_instances_counted_once(self):
+        """Test saving two copies of a recipe moves the totals once each."""
+        recipe = create_recipe(self.user, time_minutes=5)
+        first = Recipe.objects.get(id=recipe.id)
+        second = Recipe.objects.get(id=recipe.id)
+        first.time_minutes = 25
+        first.save()
+        second.time_minutes = 100
+        second.save()
+
+        data = self.get_stats()
+        self.assertEqual(data['average_time_minutes'], 100)
+        counts = {b['min']: b['count'] for b in data['time_histogram']}
+        self.assertEqual(counts[90], 1)
+        self.assertEqual(sum(counts.values()), 1)
+
+    def test_orm_delete_subtracts(self):
+        """Test deleting a recipe through the ORM updates the stats."""
+        kept = create_recipe(self.user, time_minutes=5)
+        recipe = create_recipe(self.user, time_minutes=100)
+        recipe.tags.add(self.tag)
+
+        Recipe.objects.get(id=recipe.id).delete()
+
+        data = self.get_stats()
+        self.assertEqual(data['recipe_count'], 1)
+        self.assertEqual(data['average_time_minutes'], kept.time_minutes)
+        self.assertEqual(data['top_tags'], [])
+
+    def test_deleted_names_leave_counts(self):
+        """Test deleting a tag or ingredient removes its usage count."""
+        recipe = create_recipe(self.user)
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.salt)
+
+        self.client.delete(reverse('recipe:tag-detail', args=[self.tag.id]))
+        self.client.delete(
+            reverse('recipe:ingredient-detail', args=[self.salt.id]))
+
+        row = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(row.tag_counts, {})
+        self.assertEqual(row.ingredient_counts, {})
+
+    def test_link_changes(self):
+        """Test adding, removing and clearing links updates usage."""
+        first = create_recipe(self.user)
+        second = create_recipe(self.user)
+        first.ingredients.add(self.salt)
+        self.salt.recipe_set.add(second)
+        self.assertEqual(self.get_stats()['top_ingredients'][0]['recipes'], 2)
+
+        first.ingredients.remove(self.salt)
+        first.ingredients.remove(self.salt)
+        self.assertEqual(self.get_stats()['top_ingredients'][0]['recipes'], 1)
+
+        self.salt.recipe_set.clear()
+        self.assertEqual(self.get_stats()['top_ingredients'], [])
+
+    def test_bulk_paths(self):
+        """Test bulk link and delete endpoints keep the stats in step."""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        ids = [r.id for r in recipes]
+        self.client.post(reverse('recipe:recipe-bulk-link'), {
+            'ids': ids, 'action': 'attach', 'tags': [self.tag.id],
+        }, format='json')
+        self.assertEqual(self.get_stats()['top_tags'][0]['recipes'], 3)
+
+        self.client.post(reverse('recipe:recipe-bulk-delete'),
+                         {'ids': ids[:2]}, format='json')
+
+        data = self.get_stats()
+        self.assertEqual(data['recipe_count'], 1)
+        self.assertEqual(data['top_tags'][0]['recipes'], 1)
+
+    def test_reconcile_matches_incremental(self):
+        """Test rebuilding the summary gives the same stats."""
+        recipe = create_recipe(self.user, time_minutes=50)
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.salt)
+        create_recipe(self.user, time_minutes=200)
+        incremental = self.get_stats()
+
+        RecipeStats.objects.all().delete()
+        call_command('reconcile_recipe_stats', stdout=StringIO())
+
+        self.assertEqual(self.get_stats(), incremental)
+
+    def test_constant_queries(self):
+        """Test reading the stats does not aggregate the recipes."""
+        for _ in range(10):
+            create_recipe(self.user).tags.add(self.tag)
+
+        with self.assertNumQueries(2):
+            self.client.get(STATS_URL)
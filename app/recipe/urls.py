@@ -15,4 +15,6 @@ router.register('ingredients', views.IngredientViewSet, basename='ingredient')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('stats/', views.StatsView.as_view(), name='stats'),
+]
@@ -1,28 +1,89 @@
 '''
 Views for the recipe APIs. 
 '''
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from rest_framework import (viewsets, status, mixins, status)
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 
-from core.models import (Recipe, Tag, Ingredient)
+from core import partitioning
+from core.models import (Recipe, Tag, Ingredient, Tombstone)
 from recipe.serializers import( RecipeSerializer,
                                 RecipeDetailSerializer,
                                 TagSerializer,
                                 IngredientSerializer,
-                                RecipeImageSerializer
+                                RecipeImageSerializer,
+                                RecipeBulkSerializer,
+                                RecipeBulkLinkSerializer,
+                                RecipeMatchSerializer,
+                                NameAutocompleteSerializer,
+                                RecipeShoppingListSerializer,
+                                ChangesSerializer,
+                                StatsSerializer,
                             )
+from recipe import (autocomplete, bulk, documents, matching, similarity,
+                    stats, sync)
 
 
+class TombstoneMixin:
+    """Record a tombstone for delta sync when an object is deleted."""
+    tombstone_type = None
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            sync.record_deletions(
+                self.request.user, self.tombstone_type, [instance.id])
+            self.delete_object(instance)
+        if self.tombstone_type != Tombstone.TAG:
+            matching.invalidate(self.request.user.id)
+
+    def delete_object(self, instance):
+        instance.delete()
+
+
+class LinkedObjectMixin(TombstoneMixin):
+    """Refresh signatures and documents of recipes losing a deleted link."""
+    linked_relation = None
+
+    def delete_object(self, instance):
+        recipe_ids = bulk.unlink(
+            self.linked_relation, instance.id, instance.user_id)
+        instance.delete()
+        similarity.schedule(recipe_ids)
+
+
+class AutocompleteMixin:
+    """Suggest the user's names matching a partially typed one."""
+    autocomplete_relation = None
+
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return the most used names starting with or resembling q."""
+        serializer = NameAutocompleteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        suggestions = autocomplete.suggest(
+            request.user, self.autocomplete_relation,
+            serializer.validated_data['q'], serializer.validated_data['limit'],
+        )
+        return Response([
+            {'id': pk, 'name': name, 'uses': uses}
+            for pk, name, uses in suggestions
+        ])
+
+
+class RecipeViewSet(TombstoneMixin, viewsets.ModelViewSet):
     """Manage recipes in the database."""
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
@@ -30,21 +91,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['tags', 'ingredients']
+    tombstone_type = Tombstone.RECIPE
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        return self.queryset.filter(
+            user=self.request.user
+        ).prefetch_related('tags', 'ingredients').order_by('-id')
 
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        """Save a recipe, holding its row lock while the stats change."""
+        with transaction.atomic():
+            serializer.save()
+
+    def list(self, request, *args, **kwargs):
+        """List the user's recipes from their pre-rendered documents."""
+        parts = documents.fetch(
+            self.filter_queryset(self.get_queryset()), 'summary')
+        return documents.DocumentResponse(b'[' + b','.join(parts) + b']')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe's pre-rendered document."""
+        try:
+            recipes = self.get_queryset().filter(pk=kwargs['pk'])
+        except (TypeError, ValueError):
+            raise Http404
+        parts = documents.fetch(recipes, 'detail')
+        if not parts:
+            raise Http404
+        return documents.DocumentResponse(parts[0])
+
     def get_serializer_class(self):
         """Return the appropriate serializer class based on action."""
         if self.action == 'list':
             return RecipeSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'bulk_delete':
+            return RecipeBulkSerializer
+        elif self.action == 'bulk_link':
+            return RecipeBulkLinkSerializer
+        elif self.action == 'match':
+            return RecipeMatchSerializer
+        elif self.action == 'similar':
+            return RecipeSerializer
+        elif self.action == 'shopping_list':
+            return RecipeShoppingListSerializer
         return self.serializer_class
 
     @action(methods=['POST','PATCH'], detail = True, url_path ='upload_image')
@@ -59,6 +155,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _bulk_queryset(self, validated_data):
+        """Return the recipes selected by IDs and/or filter parameters."""
+        ids = validated_data.get('ids')
+        # Only a non-empty filter selects recipes; ?format= or ?tags= alone
+        # would otherwise match every recipe of the user.
+        filtered = any(
+            value for name in self.filterset_fields
+            for value in self.request.query_params.getlist(name))
+        if not ids and not filtered:
+            raise ValidationError(
+                {'ids': 'Provide recipe IDs or filter parameters.'})
+        queryset = self.filter_queryset(self.get_queryset())
+        if ids:
+            queryset = queryset.filter(id__in=ids)
+        return queryset
+
+    @action(methods=['POST'], detail=False, url_path='bulk_delete')
+    def bulk_delete(self, request):
+        """Delete many recipes in one set-based operation."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        counts = bulk.delete_recipes(
+            self._bulk_queryset(serializer.validated_data))
+        matching.invalidate(request.user.id)
+        return Response(counts, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='bulk_link')
+    def bulk_link(self, request):
+        """Attach or detach tags and ingredients on many recipes."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        recipes = self._bulk_queryset(data)
+        change = bulk.attach if data['action'] == 'attach' else bulk.detach
+
+        counts = {}
+        # Tags and ingredients change together or not at all.
+        with transaction.atomic():
+            for relation in bulk.LINK_TABLES:
+                if data.get(relation):
+                    counts[relation] = change(
+                        recipes, relation, data[relation])
+        if data.get('ingredients'):
+            matching.invalidate(request.user.id)
+        return Response(counts, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='shopping_list')
+    def shopping_list(self, request):
+        """Combine the ingredients, price and time of many recipes."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = Recipe.objects.filter(
+            user=request.user, id__in=set(serializer.validated_data['ids']))
+
+        totals = recipes.aggregate(
+            recipes=Count('id'),
+            total_price=Sum('price'),
+            total_time_minutes=Sum('time_minutes'),
+        )
+        links = Recipe.ingredients.through.objects.filter(recipe__in=recipes)
+        if partitioning.links_partitioned():
+            links = links.filter(user=request.user)
+        ingredients = links.values(
+            'ingredient_id', 'ingredient__name',
+        ).annotate(
+            recipes=Count('recipe_id'),
+        ).order_by('ingredient__name', 'ingredient_id')
+
+        return Response({
+            **totals,
+            'ingredients': [
+                {
+                    'id': row['ingredient_id'],
+                    'name': row['ingredient__name'],
+                    'recipes': row['recipes'],
+                }
+                for row in ingredients
+            ],
+        })
+
+    @action(methods=['GET'], detail=False, url_path='match')
+    def match(self, request):
+        """Rank recipes by how many of their ingredients are on hand."""
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        results = matching.match(
+            matching.get_index(request.user.id),
+            data['ingredients'],
+            data['min_coverage'],
+        )
+        page = results[:data['limit']]
+        titles = dict(Recipe.objects.filter(
+            user=request.user, id__in=[recipe_id for recipe_id, _, _ in page],
+        ).values_list('id', 'title'))
+        return Response({
+            'count': len(results),
+            'results': [
+                {
+                    'id': recipe_id,
+                    'title': titles[recipe_id],
+                    'coverage': round(coverage, 4),
+                    'missing': missing,
+                }
+                for recipe_id, coverage, missing in page
+                if recipe_id in titles
+            ],
+        })
+
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """List the recipes sharing the most tags and ingredients."""
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        scores = dict(similarity.similar(self.get_object(), max(limit, 1)))
+        recipes = sorted(
+            self.get_queryset().filter(id__in=scores),
+            key=lambda recipe: (-scores[recipe.id], recipe.id),
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return Response([
+            {**data, 'similarity': scores[data['id']]}
+            for data in serializer.data
+        ])
+
     # @action(detail=True, methods=['POST'])
     # def retrieve(self, request, pk=None):
     #     """Retrieve a specific recipe."""
@@ -66,7 +290,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     #     serializer = self.get_serializer(recipe)
     #     return Response(serializer.data, status=status.HTTP_200_OK)
 
-class TagViewSet(mixins.DestroyModelMixin,
+class TagViewSet(AutocompleteMixin,
+                 LinkedObjectMixin,
+                 mixins.DestroyModelMixin,
                  mixins.ListModelMixin,
                  mixins.CreateModelMixin,
                  viewsets.GenericViewSet):
@@ -75,6 +301,9 @@ class TagViewSet(mixins.DestroyModelMixin,
     queryset = Tag.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    tombstone_type = Tombstone.TAG
+    autocomplete_relation = 'tags'
+    linked_relation = 'tags'
 
     def get_queryset(self):
         """Retrieve the tags for the authenticated user."""
@@ -85,7 +314,9 @@ class TagViewSet(mixins.DestroyModelMixin,
         serializer.save(user=self.request.user)
 
 
-class IngredientViewSet(mixins.DestroyModelMixin,
+class IngredientViewSet(AutocompleteMixin,
+                        LinkedObjectMixin,
+                        mixins.DestroyModelMixin,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin,
                         viewsets.GenericViewSet):
@@ -94,6 +325,9 @@ class IngredientViewSet(mixins.DestroyModelMixin,
     queryset = Ingredient.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    tombstone_type = Tombstone.INGREDIENT
+    autocomplete_relation = 'ingredients'
+    linked_relation = 'ingredients'
 
     def get_queryset(self):
         """Retrieve the ingredients for the authenticated user."""
@@ -101,4 +335,45 @@ class IngredientViewSet(mixins.DestroyModelMixin,
 
     def perform_create(self, serializer):
         """Create a new ingredient."""
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+
+class ChangesView(APIView):
+    """List changes to the user's recipes, tags and ingredients.
+
+    Pass the cursor from the previous response as ``since`` to get only
+    what changed after it. Deleted objects are listed under ``deleted``;
+    a deleted tag or ingredient is also gone from every recipe that had it.
+    """
+    serializer_class = ChangesSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        limit = max(1, min(limit, settings.SYNC_MAX_PAGE_SIZE))
+        try:
+            changes, cursor, has_more = sync.changes(
+                request.user, request.query_params.get('since'), limit)
+        except sync.InvalidCursor:
+            raise ValidationError({'since': 'Invalid cursor.'})
+
+        return Response(ChangesSerializer({
+            **changes,
+            'cursor': cursor,
+            'has_more': has_more,
+        }).data)
+
+
+class StatsView(APIView):
+    """Summarise the user's recipe collection for the dashboard."""
+    serializer_class = StatsSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(StatsSerializer(stats.summary(request.user)).data)
@@ -0,0 +1,85 @@
+'''
+Query count and allocation budgets for the user API.
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.test.budgets import BudgetMixin
+
+CREATE_USER_URL = reverse('user:create')
+CREATE_TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class UserBudgetTests(BudgetMixin, TestCase):
+    """Test user endpoints keep constant queries as rows grow."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User',
+        )
+
+    def _create_recipes(self, size):
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=10,
+                   price=Decimal('5.00'))
+            for i in range(size)
+        )
+
+    def test_create_user(self):
+        """Test signing up does not depend on the number of users."""
+        password = make_password('testpass123')
+
+        def setup(size):
+            get_user_model().objects.bulk_create(
+                get_user_model()(email=f'user{i}@example.com',
+                                 password=password)
+                for i in range(size)
+            )
+            payload = {
+                'email': 'new@example.com',
+                'password': 'testpass123',
+                'name': 'New User',
+            }
+            return lambda: self.client.post(CREATE_USER_URL, payload)
+
+        self.assertWithinBudget(setup, max_queries=3, kib_per_row=1)
+
+    def test_create_token(self):
+        """Test obtaining a token does not depend on the user's data."""
+        def setup(size):
+            self._create_recipes(size)
+            payload = {'email': 'test@example.com', 'password': 'testpass123'}
+            return lambda: self.client.post(CREATE_TOKEN_URL, payload)
+
+        self.assertWithinBudget(setup, max_queries=6, kib_per_row=1)
+
+    def test_retrieve_me(self):
+        """Test retrieving the profile does not depend on the user's data."""
+        self.client.force_authenticate(user=self.user)
+
+        def setup(size):
+            self._create_recipes(size)
+            return lambda: self.client.get(ME_URL)
+
+        self.assertWithinBudget(setup, max_queries=1, kib_per_row=1)
+
+    def test_update_me(self):
+        """Test updating the profile does not depend on the user's data."""
+        self.client.force_authenticate(user=self.user)
+
+        def setup(size):
+            self._create_recipes(size)
+            return lambda: self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertWithinBudget(setup, max_queries=2, kib_per_row=1)
@@ -8,6 +8,8 @@ from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import PurgeJob
+
 CREATE_USER_URL = reverse('user:create')
 CREATE_TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -128,4 +130,13 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         user = get_user_model().objects.get(email=self.user['email'])
         self.assertTrue(user.check_password(payload['password']))
-        self.assertEqual(user.name, payload['name'])
\ No newline at end of file
+        self.assertEqual(user.name, payload['name'])
+
+    def test_delete_user_queues_purge(self):
+        """Test deleting the account deactivates it and queues a purge."""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        user = get_user_model().objects.get(email=self.user['email'])
+        self.assertFalse(user.is_active)
+        self.assertTrue(PurgeJob.objects.filter(user_id=user.id).exists())
@@ -4,6 +4,8 @@ Views for the User API
 from rest_framework import generics, authentication, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+
+from core.purge import enqueue_purge
 from user.serializers import UserSerializer, AuthenticationSerializer
 
 class CreateUserView(generics.CreateAPIView):
@@ -20,7 +22,7 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class UpdateUserView(generics.RetrieveUpdateAPIView):
+class UpdateUserView(generics.RetrieveUpdateDestroyAPIView):
     """View to updated the authenticated user details."""
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
@@ -30,3 +32,6 @@ class UpdateUserView(generics.RetrieveUpdateAPIView):
         """Retrieve and return the authenticated user."""
         return self.request.user
 
+    def perform_destroy(self, instance):
+        """Deactivate the user and purge its data in the background."""
+        enqueue_purge(instance)